@@ -0,0 +1,15 @@
+"""
+HTTP settings shared by the MCP server entry points (auth_mcp_stdio_v2 and
+the older auth_mcp_stdio). Kept import-light: the v2 server imports this at
+start-up, so the brotli probe runs on the first request, not here.
+"""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def accept_encoding() -> str:
+    """Ask for compressed /stream responses; httpx and requests decode them transparently,
+    and br is only offered when a brotli decoder is installed"""
+    import importlib.util
+    return ("br, gzip, deflate" if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi")
+            else "gzip, deflate")
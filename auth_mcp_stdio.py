@@ -17,6 +17,8 @@ import os
 import requests
 from pathlib import Path
 
+from auth_http import accept_encoding
+
 # Set up debug logging
 logging.basicConfig(
     level=logging.DEBUG,
@@ -225,12 +227,14 @@ class TeamCenterAuthSession:
         if self.auth_mode == "cookie":
             headers = {
                 "Cookie": f"codesess={self.session_cookie}",
-                "Content-Type": "application/json"
+                "Content-Type": "application/json",
+                "Accept-Encoding": accept_encoding()
             }
         else:  # mock mode
             headers = {
                 "Cookie": f"codesess={self.session_cookie}",
-                "Content-Type": "application/json"
+                "Content-Type": "application/json",
+                "Accept-Encoding": accept_encoding()
             }
         
         # Construct URL
@@ -1,9 +1,13 @@
 """
 MCP server for CodeSentinel API with Azure AD authentication
 Optimized for fast imports and real production use
+
+IDEs wait for the `initialize` response before the server is usable, so
+importing this module only defines the server and its tools: httpx, the
+brotli probe (auth_http) and the AuthSession are set up on first use, and logging is
+configured in main(). benchmarks/mcp_startup.py holds the start-up budget.
 """
 from fastmcp import FastMCP
-import httpx
 import json
 import asyncio
 from datetime import datetime, timedelta
@@ -12,16 +16,36 @@ import logging
 import sys
 import os
 
-# Set up debug logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stderr)  # Send logs to stderr so they don't interfere with STDIO MCP protocol
-    ]
-)
+from auth_http import accept_encoding
+
 logger = logging.getLogger(__name__)
 
+# TEAMCENTER_LOG_LEVEL=DEBUG for request-level detail
+LOG_LEVEL = os.getenv("TEAMCENTER_LOG_LEVEL", "INFO").upper()
+
+
+def api_host() -> str:
+    return os.getenv("TEAMCENTER_API_HOST", "http://127.0.0.1:8000")
+
+
+def auth_mode_for(base_url: str) -> str:
+    return "production" if "azurewebsites.net" in base_url else "mock"
+
+
+def configure_logging() -> None:
+    """Log to stderr so logs don't interfere with the STDIO MCP protocol"""
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stderr)]
+    )
+
+
+def http_client():
+    """httpx.AsyncClient, importing httpx on the first request rather than at start-up"""
+    import httpx
+    return httpx.AsyncClient()
+
 # Create MCP server instance with name
 mcp = FastMCP("teamcenter-mcp-server")
 mcp.version = "0.2.1"  # Set version as attribute
@@ -32,8 +56,8 @@ class AuthSession:
     def __init__(self):
         self.session_cookie: Optional[str] = None
         self.expires_at: Optional[datetime] = None
-        self.base_url = os.getenv("TEAMCENTER_API_HOST", "http://127.0.0.1:8000")
-        self.auth_mode = "production" if "azurewebsites.net" in self.base_url else "mock"
+        self.base_url = api_host()
+        self.auth_mode = auth_mode_for(self.base_url)
         
         # Azure AD config from environment (NO DEFAULTS!)
         self.client_id = os.getenv("AZURE_CLIENT_ID")
@@ -63,7 +87,7 @@ class AuthSession:
     async def _mock_authenticate(self) -> Optional[str]:
         """Mock authentication for local development"""
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_client() as client:
                 response = await client.post(
                     f"{self.base_url}/api/login",
                     headers={"Authorization": "Bearer mock_token"}
@@ -101,7 +125,7 @@ class AuthSession:
             return None
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with http_client() as client:
                 response = await client.post(
                     f"{self.base_url}/api/login",
                     headers={
@@ -138,8 +162,22 @@ class AuthSession:
             return {"Cookie": f"codesess={self.session_cookie}"}
         return {}
 
-# Global auth session
-auth_session = AuthSession()
+# Global auth session, created on first use
+_auth_session: Optional[AuthSession] = None
+
+
+def get_auth_session() -> AuthSession:
+    global _auth_session
+    if _auth_session is None:
+        _auth_session = AuthSession()
+    return _auth_session
+
+
+def __getattr__(name: str):
+    # Keeps `auth_mcp_stdio_v2.auth_session` working without creating it at import time
+    if name == "auth_session":
+        return get_auth_session()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 @mcp.tool()
 async def search(search_query: str, topNDocuments: int = 5) -> str:
@@ -153,6 +191,7 @@ async def search(search_query: str, topNDocuments: int = 5) -> str:
         Streaming response with search results and citations
     """
     logger.info(f"🔍 Search request: '{search_query}' (top {topNDocuments})")
+    auth_session = get_auth_session()
     
     # Ensure we're authenticated
     session_id = await auth_session.authenticate()
@@ -170,13 +209,14 @@ async def search(search_query: str, topNDocuments: int = 5) -> str:
             "topNDocuments": topNDocuments
         }
         
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             # Use event stream for real API, regular JSON for mock
             if auth_session.auth_mode == "production":
                 headers = auth_session.get_headers()
                 headers["Accept"] = "text/event-stream"
             else:
                 headers = auth_session.get_headers()
+            headers["Accept-Encoding"] = accept_encoding()
             
             response = await client.get(
                 url,
@@ -213,9 +253,10 @@ async def health_check() -> str:
         JSON with connection status and session information
     """
     logger.info("🏥 Health check requested")
+    auth_session = get_auth_session()
     
     try:
-        async with httpx.AsyncClient() as client:
+        async with http_client() as client:
             response = await client.get(
                 f"{auth_session.base_url}/health",
                 timeout=10.0
@@ -251,6 +292,7 @@ async def session_info() -> str:
         JSON with session details and authentication configuration
     """
     logger.info("🔐 Session info requested")
+    auth_session = get_auth_session()
     
     info = {
         "auth_mode": auth_session.auth_mode,
@@ -275,9 +317,12 @@ async def session_info() -> str:
 
 def main():
     """Main entry point for the MCP server"""
+    configure_logging()
+    # Read from the environment: the AuthSession itself is only created by the first tool call
+    base_url = api_host()
     logger.info(f"🚀 Starting Teamcenter MCP Server v{mcp.version}")
-    logger.info(f"📍 API Host: {auth_session.base_url}")
-    logger.info(f"🔧 Auth Mode: {auth_session.auth_mode}")
+    logger.info(f"📍 API Host: {base_url}")
+    logger.info(f"🔧 Auth Mode: {auth_mode_for(base_url)}")
     
     # Run with STDIO transport - VS Code will manage this process
     mcp.run(transport="stdio")
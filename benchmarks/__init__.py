@@ -0,0 +1,4 @@
+"""
+Benchmarks for the mock Teamcenter API (main.py)
+Run individual benchmarks with `python -m benchmarks.<name> --help`
+"""
@@ -0,0 +1,66 @@
+"""
+Request-logging overhead benchmark
+
+Runs main.py under each MOCK_ACCESS_LOG mode with server logs going to a
+real file, fires concurrent POST /add_rating calls and compares latency:
+
+    python -m benchmarks.access_log --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import login, print_report, running_server, summarize
+
+RATING = {"chat_id": "bench-chat", "search_query": "How to implement streaming in FastAPI", "rating": 4}
+
+
+async def hammer(base_url: str, requests: int, concurrency: int) -> Dict:
+    """Send `requests` ratings from `concurrency` workers; report latency in ms."""
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        headers = await login(client, base_url)
+        remaining = iter(range(requests))
+
+        async def worker() -> None:
+            for _ in remaining:
+                t0 = time.perf_counter()
+                response = await client.post(f"{base_url}/add_rating", json=RATING, headers=headers)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests_per_sec": round(requests / elapsed, 1),
+        "latency_ms": {k: round(v, 2) if k != "count" else v for k, v in summarize(latencies).items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Request-logging overhead benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sample-rate", default="1.0", help="MOCK_LOG_SAMPLE_RATE for the sampled mode")
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("verbose", "sampled", "off"):
+            env = {"MOCK_ACCESS_LOG": mode, "MOCK_LOG_SAMPLE_RATE": args.sample_rate}
+            log_path = os.path.join(tmp, f"{mode}.log")
+            with running_server(env=env, log_path=log_path) as base_url:
+                report[mode] = asyncio.run(hammer(base_url, args.requests, args.concurrency))
+            report[mode]["log_bytes"] = os.path.getsize(log_path)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
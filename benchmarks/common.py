@@ -0,0 +1,105 @@
+"""
+Shared helpers for the mock API benchmarks
+Starts servers in a subprocess so the load generator never shares a GIL with the app
+"""
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port on localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def running_server(app: str = "main:app",
+                   port: Optional[int] = None,
+                   env: Optional[Dict[str, str]] = None,
+                   extra_args: Sequence[str] = (),
+                   startup_timeout: float = 20.0,
+                   log_path: Optional[str] = None,
+                   serve_profile: Optional[str] = None) -> Iterator[str]:
+    """Run `uvicorn <app>` in a subprocess and yield its base URL once /health answers.
+
+    With `serve_profile` the server is started through mock_serve with that
+    named profile instead (`app` is then ignored). Server output is
+    discarded unless `log_path` names a file to append it to.
+    """
+    port = port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    if serve_profile:
+        launcher = [sys.executable, "-m", "mock_serve", "--profile", serve_profile]
+    else:
+        launcher = [sys.executable, "-m", "uvicorn", app]
+    cmd = [*launcher, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log",
+           *extra_args]
+    proc_env = dict(os.environ, **(env or {}))
+    output = open(log_path, "ab") if log_path else subprocess.DEVNULL
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=proc_env, stdout=output, stderr=output)
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Server exited early with code {proc.returncode}: {' '.join(cmd)}")
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server did not become healthy within {startup_timeout}s")
+            time.sleep(0.1)
+        yield base_url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        if log_path:
+            output.close()
+
+
+async def login(client: httpx.AsyncClient, base_url: str, token: str = "bench_token") -> Dict[str, str]:
+    """Log in against /api/login and return the Cookie header for later calls."""
+    response = await client.post(f"{base_url}/api/login", headers={"Authorization": f"Bearer {token}"})
+    response.raise_for_status()
+    return {"Cookie": f"codesess={response.json()['session_id']}"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; returns 0.0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99 of a latency sample (in the sample's own unit)."""
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def print_report(report: Dict) -> None:
+    """Print a benchmark report as indented JSON."""
+    print(json.dumps(report, indent=2))
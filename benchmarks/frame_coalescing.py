@@ -0,0 +1,110 @@
+"""
+/stream frame coalescing benchmark
+
+Part one replays each latency profile's pacing on a virtual clock through
+mock_frames.Coalescer and reports events (socket writes) and bytes per
+stream, plus how long tokens are held back. Part two runs main.py with the
+instant profile and measures stream throughput with and without coalescing,
+reading the achieved tokens-per-event back from /metrics:
+
+    python -m benchmarks.frame_coalescing --streams 200
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import login, percentile, print_report, running_server
+from main import synthetic_frames
+from mock_frames import Coalescer, is_response_frame
+from mock_latency import make_sampler
+
+QUERY = "How to implement streaming in FastAPI"
+CONFIGS = {"off": (0, 0), "20ms": (20, 0), "50ms": (50, 0), "100ms": (100, 0), "1KiB": (0, 1024),
+           "50ms+1KiB": (50, 1024)}
+
+
+def simulate(profile: str, window_ms: float, max_bytes: int, streams: int) -> Dict:
+    """Coalesce `streams` seeded streams on a virtual clock; no sleeping."""
+    events = size = 0
+    holds: List[float] = []
+    for seed in range(streams):
+        coalescer = Coalescer(window_ms / 1000.0, max_bytes)
+        now, produced = 0.0, []
+        for frame, delay in synthetic_frames(QUERY, 5, make_sampler(profile, seed)):
+            if is_response_frame(frame):
+                produced.append(now)
+            ready = coalescer.push(frame, delay, now) if coalescer.enabled else [frame]
+            if any(is_response_frame(out) for out in ready):
+                holds.extend(now - t for t in produced)
+                produced = []
+            events += len(ready)
+            size += sum(len(out) for out in ready)
+            now += delay
+        for out in coalescer.flush():
+            holds.extend(now - t for t in produced)
+            events += 1
+            size += len(out)
+    return {
+        "events_per_stream": round(events / streams, 1),
+        "bytes_per_stream": round(size / streams),
+        "hold_p50_ms": round(percentile(holds, 50) * 1000, 1),
+        "hold_max_ms": round(max(holds, default=0.0) * 1000, 1),
+    }
+
+
+async def throughput(base_url: str, params: Dict, concurrency: int, streams: int) -> Dict:
+    """Streams/sec for `streams` instant-profile streams, `concurrency` at a time."""
+    async with httpx.AsyncClient(timeout=60.0, limits=httpx.Limits(max_connections=concurrency)) as client:
+        headers = await login(client, base_url)
+        semaphore = asyncio.Semaphore(concurrency)
+        chunks = 0
+
+        async def one(i: int) -> None:
+            nonlocal chunks
+            async with semaphore:
+                async with client.stream("GET", f"{base_url}/stream", headers=headers,
+                                         params={"search_query": f"{QUERY} {i}", **params}) as response:
+                    async for _ in response.aiter_raw():
+                        chunks += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(streams)))
+        elapsed = time.perf_counter() - started
+        metrics = (await client.get(f"{base_url}/metrics")).text
+    values = {line.split()[0]: float(line.split()[1]) for line in metrics.splitlines()
+              if line.startswith("mock_stream_coalesced")}
+    tokens = values.get("mock_stream_coalesced_tokens_total", 0)
+    events = values.get("mock_stream_coalesced_events_total", 0)
+    return {
+        "streams_per_sec": round(streams / elapsed, 1),
+        "client_reads_per_stream": round(chunks / streams, 1),
+        "server_tokens_per_event": round(tokens / events, 1) if events else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="/stream frame coalescing benchmark")
+    parser.add_argument("--streams", type=int, default=200, help="Streams per configuration")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent live streams")
+    args = parser.parse_args()
+
+    report: Dict = {"simulated": {}}
+    for profile in ("legacy", "production", "degraded"):
+        report["simulated"][profile] = {name: simulate(profile, window, budget, args.streams)
+                                        for name, (window, budget) in CONFIGS.items()}
+
+    report["live_instant"] = {}
+    for name, params in {"off": {}, "1KiB": {"coalesce_bytes": 1024}}.items():
+        # A fresh server per configuration so the /metrics counters are this run's alone
+        with running_server(env={"MOCK_ACCESS_LOG": "off", "MOCK_COMPRESSION": "0"}) as base_url:
+            report["live_instant"][name] = asyncio.run(throughput(
+                base_url, {"latency_profile": "instant", "topNDocuments": 5, **params},
+                args.concurrency, args.streams))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
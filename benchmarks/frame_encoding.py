@@ -0,0 +1,75 @@
+"""
+SSE frame encoding microbenchmark (frames/sec on one core)
+
+Compares building every frame with json.dumps + f-string framing (the
+original event_generator) with the pre-encoded FRAME_CACHE in mock_frames:
+
+    python -m benchmarks.frame_encoding --seconds 2
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.common import print_report
+from mock_frames import FRAME_CACHE, LOREM
+
+QUERY = "How to implement streaming in FastAPI"
+
+
+def legacy_stream(search_query: str, topNDocuments: int) -> List[bytes]:
+    """One full stream the original way: a dict + json.dumps + str.encode per frame."""
+    metadata = {'type': 'metadata', 'data': {'query': search_query, 'citations_requested': topNDocuments}}
+    frames = [f"data: {json.dumps(metadata)}\n\n".encode()]
+    text = search_query + ". " + LOREM + search_query
+    for i in range(0, len(text), 6):
+        frames.append(f"data: {json.dumps({'type': 'response', 'data': text[i:i+6]})}\n\n".encode())
+    for i in range(min(topNDocuments, 20)):
+        frames.append(f"data: {json.dumps({'type': 'citation', 'data': f'Citation {i+1}: ' + str(i+1) * (i+1)})}\n\n".encode())
+    return frames
+
+
+def cached_stream(search_query: str, topNDocuments: int) -> List[bytes]:
+    """One full stream from the frame cache."""
+    frames = [FRAME_CACHE.metadata_frame(search_query, topNDocuments)]
+    frames.extend(FRAME_CACHE.response_frames(search_query))
+    frames.extend(FRAME_CACHE.citation_frames(topNDocuments))
+    return frames
+
+
+def run(build: Callable[[str, int], List[bytes]], seconds: float, top_n: int) -> Dict[str, float]:
+    """Build streams back to back for `seconds` and report frame and byte rates."""
+    streams = frames = size = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            out = build(QUERY, top_n)
+            frames += len(out)
+            size += sum(len(frame) for frame in out)
+        streams += 100
+    elapsed = time.perf_counter() - started
+    return {
+        "streams_per_sec": round(streams / elapsed, 1),
+        "frames_per_sec": round(frames / elapsed, 1),
+        "mb_per_sec": round(size / elapsed / 1e6, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE frame encoding microbenchmark")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Run time per implementation")
+    parser.add_argument("--top-n", type=int, default=5, help="topNDocuments per stream")
+    args = parser.parse_args()
+
+    legacy = run(legacy_stream, args.seconds, args.top_n)
+    cached = run(cached_stream, args.seconds, args.top_n)
+    print_report({
+        "json_dumps_per_frame": legacy,
+        "frame_cache": cached,
+        "speedup": round(cached["frames_per_sec"] / legacy["frames_per_sec"], 2),
+    })
+
+
+if __name__ == "__main__":
+    main()
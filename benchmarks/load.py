@@ -0,0 +1,243 @@
+"""
+Load generator for the mock API, with JSON baselines and regression checks
+
+Starts main.py locally, drives closed-loop workers against /api/login, /stream
+and /add_rating, and reports throughput, time-to-first-frame and p50/p95/p99:
+
+    python -m benchmarks.load --concurrency 50 --duration 10 --save baseline.json
+    python -m benchmarks.load --concurrency 50 --duration 10 --compare baseline.json
+
+Endpoints run one after another by default; --mixed runs them at the same
+time. With --compare the exit status is 1 if any metric regressed by more
+than --threshold percent.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import login, print_report, running_server, summarize
+
+ENDPOINTS = ("login", "stream", "rating")
+RATING = {"chat_id": "load-chat", "search_query": "How to implement streaming in FastAPI", "rating": 4}
+
+# Metric -> True if bigger is better; every other reported number is informational
+COMPARED = {
+    "throughput_rps": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "ttff_ms.p50": False,
+    "ttff_ms.p95": False,
+    "ttff_ms.p99": False,
+}
+
+
+class Recorder:
+    """Latency, TTFF and error samples for one endpoint."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttff: List[float] = []
+        self.errors = 0
+
+    def report(self, elapsed: float) -> Dict:
+        def rounded(values: List[float]) -> Dict:
+            return {k: round(v, 2) if k != "count" else v for k, v in summarize(values).items()}
+
+        report = {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(self.latencies) / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": rounded(self.latencies),
+        }
+        if self.ttff:
+            report["ttff_ms"] = rounded(self.ttff)
+        return report
+
+
+async def do_login(client: httpx.AsyncClient, base_url: str, headers: Dict, rec: Recorder, n: int) -> None:
+    started = time.perf_counter()
+    response = await client.post(f"{base_url}/api/login", headers={"Authorization": f"Bearer load_token_{n}"})
+    if response.status_code != 200:
+        rec.errors += 1
+        return
+    rec.latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def do_stream(client: httpx.AsyncClient, base_url: str, headers: Dict, rec: Recorder, n: int,
+                    params: Optional[Dict] = None) -> None:
+    started = time.perf_counter()
+    first: Optional[float] = None
+    async with client.stream("GET", f"{base_url}/stream", params=params, headers=headers) as response:
+        if response.status_code != 200:
+            await response.aread()
+            rec.errors += 1
+            return
+        async for line in response.aiter_lines():
+            if first is None and line.startswith("data: "):
+                first = time.perf_counter()
+    now = time.perf_counter()
+    if first is not None:
+        rec.ttff.append((first - started) * 1000)
+    rec.latencies.append((now - started) * 1000)
+
+
+async def do_rating(client: httpx.AsyncClient, base_url: str, headers: Dict, rec: Recorder, n: int) -> None:
+    started = time.perf_counter()
+    response = await client.post(f"{base_url}/add_rating", json=RATING, headers=headers)
+    if response.status_code != 200:
+        rec.errors += 1
+        return
+    rec.latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def drive(client: httpx.AsyncClient, base_url: str, headers: Dict, action: Callable, concurrency: int,
+                duration: float, requests: Optional[int]) -> Dict:
+    """Run `concurrency` closed-loop workers until `duration` elapses or `requests` are sent."""
+    rec = Recorder()
+    deadline = time.perf_counter() + duration
+    issued = 0
+
+    async def worker() -> None:
+        nonlocal issued
+        while time.perf_counter() < deadline and (requests is None or issued < requests):
+            issued += 1
+            try:
+                await action(client, base_url, headers, rec, issued)
+            except httpx.HTTPError:
+                rec.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return rec.report(time.perf_counter() - started)
+
+
+async def run_load(base_url: str, endpoints: List[str], concurrency: int, duration: float,
+                   requests: Optional[int], stream_params: Dict, mixed: bool) -> Dict:
+    actions = {
+        "login": do_login,
+        "stream": lambda *args: do_stream(*args, params=stream_params),
+        "rating": do_rating,
+    }
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60.0)) as client:
+        headers = await login(client, base_url)
+        if mixed:
+            reports = await asyncio.gather(*(drive(client, base_url, headers, actions[name], concurrency,
+                                                   duration, requests) for name in endpoints))
+            return dict(zip(endpoints, reports))
+        return {name: await drive(client, base_url, headers, actions[name], concurrency, duration, requests)
+                for name in endpoints}
+
+
+def _lookup(report: Dict, dotted: str) -> Optional[float]:
+    value = report
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[Dict]:
+    """
+    Compare two result sets endpoint by endpoint.
+
+    Returns one row per metric present in both, with its percentage change
+    and whether it got worse by more than `threshold` percent.
+    """
+    rows = []
+    for endpoint, report in current.items():
+        base = baseline.get(endpoint)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = _lookup(base, metric), _lookup(report, metric)
+            if old is None or new is None or old == 0:
+                continue
+            change = (new - old) / old * 100.0
+            worse = -change if higher_is_better else change
+            rows.append({
+                "endpoint": endpoint,
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change_pct": round(change, 1),
+                "regression": worse > threshold,
+            })
+    return rows
+
+
+def print_comparison(rows: List[Dict], threshold: float) -> None:
+    print(f"\n{'endpoint':<8} {'metric':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['endpoint']:<8} {row['metric']:<16} {row['baseline']:>10} {row['current']:>10} "
+              f"{row['change_pct']:>+7.1f}%{flag}")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"\n{regressions} regression(s) beyond {threshold}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load generator for the mock API")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help=f"Comma-separated subset of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--concurrency", type=int, default=50, help="Workers per endpoint")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint")
+    parser.add_argument("--requests", type=int, default=None, help="Stop each endpoint after this many requests")
+    parser.add_argument("--mixed", action="store_true", help="Drive all endpoints at the same time")
+    parser.add_argument("--latency-profile", default="instant", help="latency_profile for /stream")
+    parser.add_argument("--top-n", type=int, default=5, help="topNDocuments for /stream")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the server (repeatable)")
+    parser.add_argument("--save", metavar="PATH", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    env = {"MOCK_ACCESS_LOG": "off"}
+    env.update(item.split("=", 1) for item in args.env)
+    stream_params = {"search_query": "How to implement streaming in FastAPI", "topNDocuments": args.top_n,
+                     "latency_profile": args.latency_profile}
+
+    with running_server(env=env) as base_url:
+        results = asyncio.run(run_load(base_url, endpoints, args.concurrency, args.duration, args.requests,
+                                       stream_params, args.mixed))
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("save", "compare")},
+        },
+        "results": results,
+    }
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(baseline["results"], results, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
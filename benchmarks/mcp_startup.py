@@ -0,0 +1,129 @@
+"""
+teamcenter-mcp-server cold-start benchmark
+
+IDEs spawn the MCP server per window and wait for its `initialize` response
+before anything else works. This spawns the server repeatedly, sends
+`initialize` straight away and times the response (time-to-initialize), then
+times `import auth_mcp_stdio_v2` and breaks it down with `python -X importtime`
+into the most expensive modules. Both are checked against a budget; the exit
+status is 1 when either is over it, so the run can gate CI:
+
+    python -m benchmarks.mcp_startup --runs 10
+    python -m benchmarks.mcp_startup --command "uvx teamcenter-mcp-server" --budget-initialize-ms 3000
+"""
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from typing import Dict, List, Sequence
+
+from benchmarks.common import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE = "auth_mcp_stdio_v2"
+
+# Regression budget, in milliseconds, for a warm (bytecode-compiled) start on a developer machine
+BUDGET_INITIALIZE_MS = 2500.0   # p50 spawn -> initialize response
+BUDGET_IMPORT_MS = 2000.0       # best of 3 `import auth_mcp_stdio_v2`
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+               "clientInfo": {"name": "mcp-startup-benchmark", "version": "1.0"}},
+}
+
+
+def server_env() -> Dict[str, str]:
+    """The server's environment: mock auth against an address nothing listens on (startup must not call it)."""
+    return {**os.environ, "TEAMCENTER_API_HOST": "http://127.0.0.1:9", "PYTHONPATH": ROOT}
+
+
+def time_to_initialize(command: Sequence[str], timeout: float = 30.0) -> float:
+    """Seconds from spawning `command` to reading its initialize response."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=server_env(), stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        # Written before the server is up, as IDEs do; it waits in the pipe
+        process.stdin.write((json.dumps(INITIALIZE) + "\n").encode())
+        process.stdin.flush()
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            line = process.stdout.readline()
+            if not line:
+                raise RuntimeError(f"Server exited with {process.wait()} before answering initialize")
+            message = json.loads(line)
+            if message.get("id") == 1:
+                if "result" not in message:
+                    raise RuntimeError(f"initialize failed: {message}")
+                return time.perf_counter() - started
+        raise TimeoutError("No initialize response")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def import_time() -> float:
+    """Seconds to import the module in a fresh interpreter (no -X importtime overhead)."""
+    code = f"import time; t = time.perf_counter(); import {MODULE}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=server_env(), capture_output=True,
+                            text=True, check=True)
+    return float(result.stdout.split()[-1])
+
+
+def import_profile(top: int) -> Dict:
+    """The module's own import time and its `top` costliest top-level imports, from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULE}"], cwd=ROOT,
+                            env=server_env(), capture_output=True, text=True, check=True)
+    rows: List[Dict] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "self_ms": int(own) / 1000, "cumulative_ms": int(cumulative) / 1000})
+    module = next(row for row in rows if row["module"] == MODULE)
+    # Top-level modules only: each row's cumulative time includes its nested imports
+    heaviest = sorted((row for row in rows if row["module"].split(".")[0] == row["module"]
+                       and row["module"] != MODULE), key=lambda row: row["cumulative_ms"], reverse=True)
+    return {
+        "module_self_ms": round(module["self_ms"], 1),
+        "heaviest": {row["module"]: round(row["cumulative_ms"], 1) for row in heaviest[:top]},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="teamcenter-mcp-server cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Server spawns to time")
+    parser.add_argument("--command", default=f"{shlex.quote(sys.executable)} -m {MODULE}",
+                        help="Command that starts the server")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports to list")
+    parser.add_argument("--budget-initialize-ms", type=float, default=BUDGET_INITIALIZE_MS,
+                        help="Budget for p50 time-to-initialize")
+    parser.add_argument("--budget-import-ms", type=float, default=BUDGET_IMPORT_MS, help="Budget for the import")
+    args = parser.parse_args()
+
+    command = shlex.split(args.command)
+    time_to_initialize(command)  # Warm-up: bytecode compilation and the OS file cache
+    samples = [time_to_initialize(command) * 1000 for _ in range(args.runs)]
+    initialize = {key: round(value, 1) for key, value in summarize(samples).items()}
+    imports = {"import_ms": round(min(import_time() for _ in range(3)) * 1000, 1), **import_profile(args.top)}
+    over = [name for name, value, budget in (
+        ("time_to_initialize_p50", initialize["p50"], args.budget_initialize_ms),
+        ("import", imports["import_ms"], args.budget_import_ms),
+    ) if value > budget]
+
+    print(json.dumps({
+        "command": args.command,
+        "time_to_initialize_ms": initialize,
+        "imports": imports,
+        "budget_ms": {"time_to_initialize_p50": args.budget_initialize_ms, "import": args.budget_import_ms},
+        "over_budget": over,
+    }, indent=2))
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Per-session rate limiter benchmark
+
+Measures what the limiter adds to require_auth: the route lookup for an
+unlimited path, take() on one hot bucket and across many sessions, and
+take() throughput from several threads. Then starts main.py without and
+with MOCK_RATE_LIMIT_STREAM and lets one runaway session hammer /stream
+with --runaway concurrent loops while a polite session issues one /stream
+every --polite-interval seconds (within the budget); reports the polite
+session's latency and what the runaway got:
+
+    python -m benchmarks.rate_limit --sessions 100000 --runaway 50 --duration 10 --stream-limit 5/10
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import login, print_report, running_server, summarize
+from mock_ratelimit import RateLimiter, RouteLimit, parse_budget
+
+PARAMS = {"search_query": "rate limit benchmark", "topNDocuments": 2, "latency_profile": "instant"}
+
+
+def per_call_ns(fn, calls: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(calls):
+        fn()
+    return round((time.perf_counter_ns() - started) / calls, 1)
+
+
+def threaded_takes(limit: RouteLimit, ids: List[str], threads: int, calls: int) -> float:
+    """take() calls/sec with `threads` threads charging random sessions at once."""
+    per_thread = calls // threads
+    samples = [random.Random(i).choices(ids, k=per_thread) for i in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(sample: List[str]) -> None:
+        barrier.wait()
+        for session_id in sample:
+            limit.take(session_id)
+
+    workers = [threading.Thread(target=worker, args=(sample,)) for sample in samples]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return round(per_thread * threads / (time.perf_counter() - started), 1)
+
+
+def hot_path(sessions: int, calls: int, threads: int) -> Dict:
+    """Nanoseconds the limiter adds per authenticated call."""
+    # A bucket too deep to empty and too slow to refill: every call takes a token and none is pruned
+    limiter = RateLimiter({"stream": (1e-9, 1_000_000_000)})
+    limit = limiter.for_path("/stream")
+    ids = [uuid.uuid4().hex for _ in range(sessions)]
+    for session_id in ids:
+        limit.take(session_id)
+    sample = iter(random.Random(7).choices(ids, k=calls))
+    return {
+        "unlimited_path_ns": per_call_ns(lambda: limiter.for_path("/ratings/stats"), calls),
+        "take_hot_bucket_ns": per_call_ns(lambda: limit.take(ids[0]), calls),
+        "take_random_session_ns": per_call_ns(lambda: limit.take(next(sample)), calls),
+        "buckets": len(limit),
+        "threaded_takes_per_sec": threaded_takes(limit, ids, threads, calls),
+    }
+
+
+async def contention(base_url: str, runaway: int, duration: float, polite_interval: float) -> Dict:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0)) as client:
+        runaway_cookie = await login(client, base_url, "runaway")
+        polite_cookie = await login(client, base_url, "polite")
+        deadline = time.monotonic() + duration
+        statuses: Dict[int, int] = {}
+        polite_ms: List[float] = []
+
+        async def hammer() -> None:
+            while time.monotonic() < deadline:
+                response = await client.get(f"{base_url}/stream", params=PARAMS, headers=runaway_cookie)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 429:
+                    await asyncio.sleep(0.01)
+
+        async def polite() -> None:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                (await client.get(f"{base_url}/stream", params=PARAMS, headers=polite_cookie)).raise_for_status()
+                polite_ms.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(polite_interval)
+
+        await asyncio.gather(polite(), *(hammer() for _ in range(runaway)))
+
+    summary = summarize(polite_ms)
+    return {
+        "polite_streams": len(polite_ms),
+        "polite_stream_ms": {key: round(summary[key], 1) for key in ("mean", "p50", "p99")},
+        "runaway_completed": statuses.get(200, 0),
+        "runaway_throttled": statuses.get(429, 0),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-session rate limiter benchmark")
+    parser.add_argument("--sessions", type=int, default=100_000, help="Sessions holding buckets in the hot-path run")
+    parser.add_argument("--calls", type=int, default=200_000, help="take() calls per hot-path measurement")
+    parser.add_argument("--threads", type=int, default=8, help="Threads for the contended take() run")
+    parser.add_argument("--runaway", type=int, default=50, help="Concurrent /stream loops of the runaway session")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per contention run")
+    parser.add_argument("--polite-interval", type=float, default=0.5, help="Seconds between the polite session's calls")
+    parser.add_argument("--stream-limit", default="5/10", help="MOCK_RATE_LIMIT_STREAM for the limited run")
+    args = parser.parse_args()
+    parse_budget(args.stream_limit)
+
+    report = {"hot_path": hot_path(args.sessions, args.calls, args.threads)}
+    for name, stream_limit in (("unlimited", "0"), (f"limited_{args.stream_limit}", args.stream_limit)):
+        env = {"MOCK_ACCESS_LOG": "off", "MOCK_RATE_LIMIT_STREAM": stream_limit}
+        with running_server(env=env) as base_url:
+            report[name] = asyncio.run(contention(base_url, args.runaway, args.duration, args.polite_interval))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
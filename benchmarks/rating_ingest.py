@@ -0,0 +1,95 @@
+"""
+Bulk rating ingestion benchmark
+
+Loads the same ratings into main.py once as individual POST /add_rating calls
+and once as NDJSON batches on POST /add_ratings, and compares throughput:
+
+    python -m benchmarks.rating_ingest --ratings 20000 --batch-size 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import login, print_report, running_server, summarize
+
+
+def make_ratings(count: int) -> List[Dict]:
+    return [{"chat_id": f"bench-chat-{i}", "search_query": f"query {i % 1000}", "rating": 1 + i % 5}
+            for i in range(count)]
+
+
+async def single(base_url: str, ratings: List[Dict], concurrency: int) -> Dict:
+    """One request per rating from `concurrency` workers."""
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        headers = await login(client, base_url)
+        remaining = iter(ratings)
+
+        async def worker() -> None:
+            for rating in remaining:
+                t0 = time.perf_counter()
+                response = await client.post(f"{base_url}/add_rating", json=rating, headers=headers)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "ratings_per_sec": round(len(ratings) / elapsed, 1),
+        "requests": len(ratings),
+        "latency_ms": {k: round(v, 2) if k != "count" else v for k, v in summarize(latencies).items()},
+    }
+
+
+async def bulk(base_url: str, ratings: List[Dict], batch_size: int) -> Dict:
+    """Sequential NDJSON batches of `batch_size` ratings."""
+    latencies: List[float] = []
+    bodies = ["\n".join(json.dumps(r) for r in ratings[i:i + batch_size]).encode()
+              for i in range(0, len(ratings), batch_size)]
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        headers = {**await login(client, base_url), "Content-Type": "application/x-ndjson"}
+        started = time.perf_counter()
+        for body in bodies:
+            t0 = time.perf_counter()
+            response = await client.post(f"{base_url}/add_ratings", content=body, headers=headers)
+            response.raise_for_status()
+            assert response.json()["rejected"] == 0
+            latencies.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - started
+    return {
+        "ratings_per_sec": round(len(ratings) / elapsed, 1),
+        "requests": len(bodies),
+        "latency_ms": {k: round(v, 2) if k != "count" else v for k, v in summarize(latencies).items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk rating ingestion benchmark")
+    parser.add_argument("--ratings", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50, help="Workers for the one-per-request run")
+    args = parser.parse_args()
+
+    ratings = make_ratings(args.ratings)
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("single", "bulk"):
+            env = {"MOCK_ACCESS_LOG": "off", "MOCK_RATINGS_DB": os.path.join(tmp, f"{name}.db")}
+            with running_server(env=env) as base_url:
+                if name == "single":
+                    report[name] = asyncio.run(single(base_url, ratings, args.concurrency))
+                else:
+                    report[name] = asyncio.run(bulk(base_url, ratings, args.batch_size))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Rating store throughput benchmark
+
+Compares a synchronous SQLite insert + commit per rating with the
+write-behind mock_ratings.RatingStore, reporting per-call latency seen by
+the request (including the incremental /ratings/stats update), end-to-end
+persisted ratings/sec and the cost of a stats snapshot:
+
+    python -m benchmarks.rating_store --ratings 50000 --threads 8
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.common import print_report, summarize
+from mock_ratings import RatingStore
+
+QUERIES = 1000  # Distinct search queries the ratings are spread over
+
+
+def run_threads(add: Callable[[str, str, float], None], ratings: int, threads: int) -> List[float]:
+    """Call `add` `ratings` times across `threads` threads; returns per-call latency in us."""
+    latencies: List[float] = []
+    per_thread = ratings // threads
+
+    def worker(n: int) -> None:
+        local = []
+        for i in range(per_thread):
+            t0 = time.perf_counter_ns()
+            add(f"chat-{n}-{i}", f"query {i % QUERIES}", 1 + (i * 7 + n) % 5)
+            local.append((time.perf_counter_ns() - t0) / 1000)
+        latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies
+
+
+def sync_inserts(path: str, ratings: int, threads: int) -> Dict:
+    """Baseline: every request writes and commits its own row."""
+    local = threading.local()
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE ratings (chat_id TEXT, search_query TEXT, rating REAL,"
+                     " PRIMARY KEY (chat_id, search_query))")
+
+    def add(chat_id: str, search_query: str, rating: float) -> None:
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = sqlite3.connect(path, timeout=30.0)
+            conn.execute("PRAGMA synchronous=FULL")
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO ratings VALUES (?, ?, ?)", (chat_id, search_query, rating))
+
+    started = time.perf_counter()
+    latencies = run_threads(add, ratings, threads)
+    elapsed = time.perf_counter() - started
+    return {
+        "persisted_per_sec": round(len(latencies) / elapsed, 1),
+        "add_latency_us": {k: round(v, 2) if k != "count" else v for k, v in summarize(latencies).items()},
+    }
+
+
+def write_behind(path: str, ratings: int, threads: int) -> Dict:
+    """RatingStore: requests only buffer, the flusher persists in batches."""
+    store = RatingStore(path)
+    store.start()
+    started = time.perf_counter()
+    latencies = run_threads(store.add, ratings, threads)
+    accepted = time.perf_counter() - started
+    store.close()
+    persisted = time.perf_counter() - started
+    t0 = time.perf_counter()
+    store.snapshot(top_k=10)
+    snapshot_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    store.snapshot(top_k=10)
+    cached_us = (time.perf_counter() - t0) * 1e6
+    return {
+        "accepted_per_sec": round(len(latencies) / accepted, 1),
+        "persisted_per_sec": round(len(latencies) / persisted, 1),
+        "flush_batches": store.batches,
+        "stats_snapshot_ms": round(snapshot_ms, 3),
+        "stats_cached_snapshot_us": round(cached_us, 2),
+        "add_latency_us": {k: round(v, 2) if k != "count" else v for k, v in summarize(latencies).items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rating store throughput benchmark")
+    parser.add_argument("--ratings", type=int, default=50_000)
+    parser.add_argument("--sync-ratings", type=int, default=5_000,
+                        help="Ratings for the synchronous baseline (it is fsync-bound)")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print_report({
+            "sync_insert_per_request": sync_inserts(os.path.join(tmp, "sync.db"), args.sync_ratings, args.threads),
+            "write_behind": write_behind(os.path.join(tmp, "wb.db"), args.ratings, args.threads),
+        })
+
+
+if __name__ == "__main__":
+    main()
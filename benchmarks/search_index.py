@@ -0,0 +1,111 @@
+"""
+BM25 citation index benchmark
+
+Indexes a documents directory (replicated --copies times to emulate a larger
+corpus) and reports build time, index size against the raw text, mmap load
+time, and per-query latency for the in-memory and the memory-mapped index
+over seeded random queries drawn from the corpus vocabulary. Part two runs
+main.py with and without MOCK_DOCS_DIR and compares /stream throughput:
+
+    python -m benchmarks.search_index --dir docs --copies 20 --queries 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import login, print_report, running_server, summarize
+from mock_search import SearchIndex
+
+
+def replicate(source: str, target: str, copies: int) -> int:
+    """Copy `source` into `copies` subdirectories of `target`; the raw corpus size in bytes."""
+    for copy in range(copies):
+        shutil.copytree(source, os.path.join(target, f"copy{copy}"))
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(target) for name in files)
+
+
+def query_latency(index: SearchIndex, queries: List[str], k: int) -> Dict:
+    """Microsecond latency summary of index.search over `queries`."""
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, k)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return {key: round(value, 1) for key, value in summarize(samples).items()}
+
+
+async def stream_throughput(base_url: str, queries: List[str], concurrency: int) -> Dict:
+    """Streams/sec for instant-profile /stream requests, `concurrency` at a time."""
+    async with httpx.AsyncClient(timeout=60.0, limits=httpx.Limits(max_connections=concurrency)) as client:
+        headers = await login(client, base_url)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(query: str) -> None:
+            async with semaphore:
+                response = await client.get(f"{base_url}/stream", headers=headers, params={
+                    "search_query": query, "topNDocuments": 5, "latency_profile": "instant"})
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(query) for query in queries))
+    return {"streams_per_sec": round(len(queries) / (time.perf_counter() - started), 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BM25 citation index benchmark")
+    parser.add_argument("--dir", default="docs", help="Documents directory")
+    parser.add_argument("--copies", type=int, default=10, help="Times to replicate the corpus")
+    parser.add_argument("--queries", type=int, default=1000, help="Random queries per measurement")
+    parser.add_argument("--terms", type=int, default=4, help="Terms per query")
+    parser.add_argument("--top-n", type=int, default=5, help="Hits per query")
+    parser.add_argument("--streams", type=int, default=200, help="Live /stream requests per configuration")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent live streams")
+    parser.add_argument("--seed", type=int, default=1, help="Query sampling seed")
+    args = parser.parse_args()
+
+    report: Dict = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus = os.path.join(workdir, "corpus")
+        raw_bytes = replicate(args.dir, corpus, args.copies)
+
+        started = time.perf_counter()
+        built = SearchIndex.build(corpus)
+        build_ms = (time.perf_counter() - started) * 1000
+        path = os.path.join(workdir, "corpus.bm25")
+        built.save(path)
+        started = time.perf_counter()
+        mapped = SearchIndex.load(path)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        postings = len(built.doc_ids)
+        report["index"] = {
+            "files": len(built.sources), "passages": len(built), "terms": len(built.terms), "postings": postings,
+            "raw_corpus_bytes": raw_bytes, "index_file_bytes": os.path.getsize(path),
+            "posting_bytes": postings * (built.doc_ids.itemsize + built.tfs.itemsize),
+            "build_ms": round(build_ms, 1), "mmap_load_ms": round(load_ms, 1),
+        }
+
+        rng = random.Random(args.seed)
+        vocabulary = sorted(built.terms)
+        queries = [" ".join(rng.sample(vocabulary, args.terms)) for _ in range(args.queries)]
+        report["query_us"] = {"in_memory": query_latency(built, queries, args.top_n),
+                              "mmapped": query_latency(mapped, queries, args.top_n)}
+
+        report["live_instant"] = {}
+        for name, env in {"synthetic": {}, "indexed": {"MOCK_DOCS_DIR": corpus}}.items():
+            with running_server(env={"MOCK_ACCESS_LOG": "off", **env}) as base_url:
+                report["live_instant"][name] = asyncio.run(
+                    stream_throughput(base_url, queries[:args.streams], args.concurrency))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Server profile comparison
+
+Starts the mock API through mock_serve once per named profile and drives the
+same closed-loop load (benchmarks.load) against each, so loop/parser/worker
+choices can be compared on one machine:
+
+    python -m benchmarks.serve_profiles --concurrency 50 --duration 5
+    python -m benchmarks.serve_profiles --profiles compat,throughput --workers 4
+
+Profiles whose loop or parser is not installed fall back as in mock_serve
+("auto" -> asyncio/h11); the resolved settings are printed with the results.
+"""
+import argparse
+import asyncio
+from typing import Dict
+
+from benchmarks.common import print_report, running_server
+from benchmarks.load import ENDPOINTS, run_load
+from mock_serve import PROFILES, build_profile, uvicorn_options
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare mock_serve profiles under the same load")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profile names")
+    parser.add_argument("--workers", type=int, default=None, help="Override every profile's worker count")
+    parser.add_argument("--endpoints", default="login,stream", help=f"Subset of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--concurrency", type=int, default=50, help="Workers per endpoint")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per endpoint")
+    parser.add_argument("--latency-profile", default="instant", help="latency_profile for /stream")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    stream_params = {"search_query": "How to implement streaming in FastAPI", "topNDocuments": 5,
+                     "latency_profile": args.latency_profile}
+    extra_args = ["--workers", str(args.workers)] if args.workers is not None else []
+
+    report: Dict = {}
+    for name in names:
+        settings = uvicorn_options(build_profile(name, workers=args.workers, access_log=False))
+        # The app's own access log is off everywhere so only the server settings differ
+        with running_server(env={"MOCK_ACCESS_LOG": "off"}, serve_profile=name, extra_args=extra_args) as base_url:
+            results = asyncio.run(run_load(base_url, endpoints, args.concurrency, args.duration, None,
+                                           stream_params, mixed=False))
+        report[name] = {"settings": settings, "results": results}
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Session store memory and lookup-latency benchmark
+
+Creates N sessions in the legacy store (plain dict of datetime-based
+objects) and in each mock_sessions backend, then reports the traced
+memory per session, single-thread lookup latency and multi-thread lookup
+throughput. Signed sessions store nothing, so only their issue and
+verify costs are reported. A login storm (--logins logins cycling over
+--tokens access tokens) compares creating a session per login with
+reusing the token's session:
+
+    python -m benchmarks.session_store --sessions 1000000 --threads 8 --logins 200000 --tokens 100
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.common import print_report, summarize
+from mock_sessions import SessionStore, SignedSessionStore, SQLiteSessionStore, StripedSessionStore
+
+
+class LegacySessionInfo:
+    """The original per-instance-dict session object, kept as the baseline."""
+
+    def __init__(self, session_id: str, access_token: str, expires_at: datetime):
+        self.session_id = session_id
+        self.access_token = access_token
+        self.expires_at = expires_at
+        self.created_at = datetime.now()
+
+
+class LegacyStore:
+    """The original dict store and get_session() logic."""
+
+    def __init__(self):
+        self.sessions: Dict[str, LegacySessionInfo] = {}
+
+    def create(self, session_id: str, access_token: str) -> None:
+        self.sessions[session_id] = LegacySessionInfo(session_id, access_token,
+                                                      datetime.now() + timedelta(minutes=55))
+
+    def get(self, session_id: str) -> Optional[LegacySessionInfo]:
+        session_info = self.sessions.get(session_id)
+        if session_info and datetime.now() < session_info.expires_at:
+            return session_info
+        elif session_info:
+            del self.sessions[session_id]
+        return None
+
+
+def threaded_lookups(store, ids: List[str], threads: int, lookups: int) -> float:
+    """Lookups/sec with `threads` threads hammering the store at once."""
+    per_thread = lookups // threads
+    samples = [random.Random(i).choices(ids, k=per_thread) for i in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(sample: List[str]) -> None:
+        barrier.wait()
+        for session_id in sample:
+            store.get(session_id)
+
+    workers = [threading.Thread(target=worker, args=(sample,)) for sample in samples]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def measure(factory: Callable, ids: List[str], lookups: int, threads: int) -> Dict:
+    """Fill a store with `ids`, then time random lookups one by one."""
+    gc.collect()
+    tracemalloc.start()
+    store = factory()
+    started = time.perf_counter()
+    for session_id in ids:
+        store.create(session_id, "bench_token")
+    create_seconds = time.perf_counter() - started
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "sessions": len(ids),
+        "threaded_lookups_per_sec": round(threaded_lookups(store, ids, threads, lookups), 1),
+        "memory_mb": round(traced / 1e6, 1),
+        "bytes_per_session": round(traced / len(ids), 1),
+        "creates_per_sec": round(len(ids) / create_seconds, 1),
+        "lookup_us": time_lookups(store, ids, lookups),
+    }
+
+
+def time_lookups(store, ids: List[str], lookups: int) -> Dict:
+    """Latency summary (microseconds) of random single-thread lookups."""
+    sample = random.Random(7).choices(ids, k=lookups)
+    timings_us = []
+    get = store.get
+    for session_id in sample:
+        t0 = time.perf_counter_ns()
+        get(session_id)
+        timings_us.append((time.perf_counter_ns() - t0) / 1000)
+    return {k: round(v, 3) if k != "count" else v for k, v in summarize(timings_us).items()}
+
+
+def measure_signed(ids: List[str], lookups: int, threads: int) -> Dict:
+    """Issue a signed token per ID, then time verifying them."""
+    store = SignedSessionStore("bench-secret")
+    started = time.perf_counter()
+    tokens = [store.create(session_id, "bench_token").session_id for session_id in ids]
+    create_seconds = time.perf_counter() - started
+    return {
+        "sessions": len(ids),
+        "threaded_lookups_per_sec": round(threaded_lookups(store, tokens, threads, lookups), 1),
+        "memory_mb": 0.0,
+        "bytes_per_session": 0.0,
+        "creates_per_sec": round(len(ids) / create_seconds, 1),
+        "lookup_us": time_lookups(store, tokens, lookups),
+    }
+
+
+def measure_login_storm(logins: int, tokens: int, reuse: bool) -> Dict:
+    """`logins` logins round-robin over `tokens` tokens: latency and the sessions left stored."""
+    gc.collect()
+    tracemalloc.start()
+    store = StripedSessionStore(max_sessions=None)
+    names = [f"bench_token_{i}" for i in range(tokens)]
+    login = store.login if reuse else lambda token, new_id: store.create(new_id(), token)
+    new_id = lambda: uuid.uuid4().hex  # noqa: E731
+    timings_us = []
+    for i in range(logins):
+        t0 = time.perf_counter_ns()
+        login(names[i % tokens], new_id)
+        timings_us.append((time.perf_counter_ns() - t0) / 1000)
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    summary = summarize(timings_us)
+    return {
+        "sessions_stored": len(store),
+        "memory_mb": round(traced / 1e6, 1),
+        "logins_per_sec": round(1e6 / summary["mean"], 1),
+        "login_us": {key: round(summary[key], 3) for key in ("mean", "p50", "p99")},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Session store memory and lookup benchmark")
+    parser.add_argument("--sessions", type=int, default=1_000_000, help="Sessions to create")
+    parser.add_argument("--sqlite-sessions", type=int, default=100_000,
+                        help="Sessions to create in the SQLite backend (it is disk-bound)")
+    parser.add_argument("--lookups", type=int, default=200_000, help="Random lookups to time")
+    parser.add_argument("--threads", type=int, default=8, help="Threads for the contended lookup run")
+    parser.add_argument("--logins", type=int, default=200_000, help="Logins in the login storm")
+    parser.add_argument("--tokens", type=int, default=100, help="Distinct access tokens in the login storm")
+    args = parser.parse_args()
+
+    # Session IDs are shared by all stores so only the store overhead differs
+    ids = [uuid.uuid4().hex for _ in range(args.sessions)]
+    report = {
+        "legacy_dict": measure(LegacyStore, ids, args.lookups, args.threads),
+        "single_lock": measure(lambda: SessionStore(max_sessions=None), ids, args.lookups, args.threads),
+        "striped": measure(lambda: StripedSessionStore(max_sessions=None), ids, args.lookups, args.threads),
+        "signed": measure_signed(ids, args.lookups, args.threads),
+        "login_storm": {
+            "create_per_login": measure_login_storm(args.logins, args.tokens, reuse=False),
+            "reuse_by_token": measure_login_storm(args.logins, args.tokens, reuse=True),
+        },
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.db")
+        report["sqlite_wal"] = measure(lambda: SQLiteSessionStore(path, max_sessions=None),
+                                       ids[:args.sqlite_sessions], args.lookups // 10, args.threads)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+SSE compression benchmark
+
+Part one compresses the frames of typical /stream responses in-process with
+each codec, flushing after every event as the middleware does, and reports
+bytes per stream and compressor CPU per stream. Part two starts main.py and
+counts the bytes actually on the wire for each Accept-Encoding:
+
+    python -m benchmarks.sse_compression --streams 500
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import login, print_report, running_server
+from mock_compression import SUPPORTED, Encoder
+from mock_frames import FRAME_CACHE
+
+QUERIES = ["How to implement streaming in FastAPI", "Teamcenter BOM revision rules", "Configure PLM workflow"]
+
+
+def stream_frames(search_query: str, topNDocuments: int) -> List[bytes]:
+    return ([FRAME_CACHE.metadata_frame(search_query, topNDocuments)]
+            + list(FRAME_CACHE.response_frames(search_query))
+            + list(FRAME_CACHE.citation_frames(topNDocuments)))
+
+
+def measure_codec(encoding: str, level: int, streams: List[List[bytes]], flush: bool = True) -> Dict:
+    """Compress every stream with a fresh encoder; report mean output size and CPU per stream."""
+    total = 0
+    started = time.process_time()
+    for frames in streams:
+        encoder = Encoder(encoding, level)
+        if flush:
+            total += sum(len(encoder.compress(frame)) for frame in frames) + len(encoder.finish())
+        else:
+            total += len(encoder.finish(b"".join(frames)))
+    cpu = time.process_time() - started
+    return {"bytes_per_stream": round(total / len(streams)), "cpu_us_per_stream": round(cpu / len(streams) * 1e6, 1)}
+
+
+async def wire_bytes(base_url: str, encodings: List[str], requests: int, topNDocuments: int) -> Dict:
+    """Raw (still-encoded) response bytes per /stream request for each Accept-Encoding."""
+    report = {}
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        headers = await login(client, base_url)
+        for accept in encodings:
+            raw = 0
+            for i in range(requests):
+                params = {"search_query": QUERIES[i % len(QUERIES)], "topNDocuments": topNDocuments,
+                          "latency_profile": "instant"}
+                async with client.stream("GET", f"{base_url}/stream", params=params,
+                                         headers={**headers, "Accept-Encoding": accept}) as response:
+                    async for chunk in response.aiter_raw():
+                        raw += len(chunk)
+            report[accept] = {"wire_bytes_per_stream": round(raw / requests)}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE compression benchmark")
+    parser.add_argument("--streams", type=int, default=500, help="Streams compressed per codec")
+    parser.add_argument("--top-n", type=int, default=20, help="topNDocuments (citations are the most repetitive part)")
+    parser.add_argument("--wire-requests", type=int, default=20, help="Live /stream requests per encoding")
+    args = parser.parse_args()
+
+    streams = [stream_frames(QUERIES[i % len(QUERIES)], args.top_n) for i in range(args.streams)]
+    identity = sum(len(frame) for frame in streams[0])
+    codecs = {"gzip-1": ("gzip", 1), "gzip-6": ("gzip", 6), "gzip-9": ("gzip", 9), "deflate-6": ("deflate", 6)}
+    if "br" in SUPPORTED:
+        codecs.update({"br-4": ("br", 5), "br-6": ("br", 7)})
+    report: Dict = {"identity": {"bytes_per_stream": identity, "frames_per_stream": len(streams[0])}}
+    for name, (encoding, level) in codecs.items():
+        report[name] = measure_codec(encoding, level, streams)
+        report[name]["ratio"] = round(report[name]["bytes_per_stream"] / identity, 3)
+    report["gzip-6-unflushed"] = measure_codec("gzip", 6, streams, flush=False)
+
+    with running_server(env={"MOCK_ACCESS_LOG": "off"}) as base_url:
+        report["wire"] = asyncio.run(wire_bytes(base_url, ["identity", *SUPPORTED], args.wire_requests, args.top_n))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
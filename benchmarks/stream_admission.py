@@ -0,0 +1,83 @@
+"""
+/stream admission-control benchmark
+
+Starts main.py with MOCK_STREAM_LIMIT set, then opens more concurrent streams
+than the limit plus queue can hold: one "heavy" session opens most of them and
+several "light" sessions open a few each. Reports how fast overflow is refused
+with 429 and how long each kind of session waited for its first frame:
+
+    python -m benchmarks.stream_admission --limit 50 --queue 100 --heavy 300 --light 10x5
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import login, print_report, running_server, summarize
+
+
+async def open_stream(client: httpx.AsyncClient, base_url: str, headers: Dict, stats: Dict, profile: str) -> None:
+    started = time.perf_counter()
+    params = {"search_query": "admission benchmark", "topNDocuments": 2, "latency_profile": profile}
+    async with client.stream("GET", f"{base_url}/stream", params=params, headers=headers) as response:
+        if response.status_code == 429:
+            await response.aread()
+            stats["rejected_ms"].append((time.perf_counter() - started) * 1000)
+            stats["retry_after"].add(response.headers.get("retry-after"))
+            return
+        first = True
+        async for line in response.aiter_lines():
+            if first and line.startswith("data: "):
+                stats["ttff_ms"].append((time.perf_counter() - started) * 1000)
+                first = False
+
+
+async def run(base_url: str, heavy: int, light_sessions: int, light_streams: int, profile: str) -> Dict:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0)) as client:
+        groups = {"heavy": [(await login(client, base_url, "heavy"), heavy)]}
+        groups["light"] = [(await login(client, base_url, f"light{i}"), light_streams) for i in range(light_sessions)]
+        stats = {name: {"ttff_ms": [], "rejected_ms": [], "retry_after": set()} for name in groups}
+        tasks = []
+        for name, sessions in groups.items():
+            for headers, count in sessions:
+                tasks += [open_stream(client, base_url, headers, stats[name], profile) for _ in range(count)]
+        started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    def rounded(values: List[float]) -> Dict:
+        return {k: round(v, 1) if k != "count" else v for k, v in summarize(values).items()}
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        **{name: {
+            "admitted_ttff_ms": rounded(s["ttff_ms"]),
+            "rejected_latency_ms": rounded(s["rejected_ms"]),
+            "retry_after_values": sorted(v for v in s["retry_after"] if v),
+        } for name, s in stats.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="/stream admission-control benchmark")
+    parser.add_argument("--limit", type=int, default=50, help="MOCK_STREAM_LIMIT")
+    parser.add_argument("--queue", type=int, default=100, help="MOCK_STREAM_QUEUE")
+    parser.add_argument("--queue-timeout", type=float, default=30.0, help="MOCK_STREAM_QUEUE_TIMEOUT")
+    parser.add_argument("--heavy", type=int, default=300, help="Streams opened by the heavy session")
+    parser.add_argument("--light", default="10x5", help="<sessions>x<streams> for the light sessions")
+    parser.add_argument("--latency-profile", default="legacy")
+    args = parser.parse_args()
+
+    light_sessions, light_streams = (int(n) for n in args.light.split("x"))
+    env = {"MOCK_ACCESS_LOG": "off", "MOCK_STREAM_LIMIT": str(args.limit), "MOCK_STREAM_QUEUE": str(args.queue),
+           "MOCK_STREAM_QUEUE_TIMEOUT": str(args.queue_timeout)}
+    with running_server(env=env) as base_url:
+        report = asyncio.run(run(base_url, args.heavy, light_sessions, light_streams, args.latency_profile))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+/stream/batch versus one /stream per query
+
+Runs the same set of related queries three ways against main.py: one
+/stream after another (what an agent does by default), all /stream requests
+at once, and one POST /stream/batch. Reports the wall time until every
+answer is complete and the number of HTTP requests used:
+
+    python -m benchmarks.stream_batch --queries 5 --latency-profile production --rounds 3
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import login, print_report, running_server, summarize
+
+QUERY = "How to implement streaming in FastAPI"
+
+
+async def run(base_url: str, queries: List[Dict], params: Dict, rounds: int) -> Dict:
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        cookie = await login(client, base_url)
+
+        async def one(query: Dict) -> None:
+            (await client.get(f"{base_url}/stream", params={**query, **params}, headers=cookie)).raise_for_status()
+
+        async def sequential() -> None:
+            for query in queries:
+                await one(query)
+
+        async def concurrent() -> None:
+            await asyncio.gather(*(one(query) for query in queries))
+
+        async def batch() -> None:
+            response = await client.post(f"{base_url}/stream/batch", json=queries, params=params, headers=cookie)
+            response.raise_for_status()
+
+        report = {}
+        for name, mode, requests in (("sequential", sequential, len(queries)),
+                                     ("concurrent", concurrent, len(queries)), ("batch", batch, 1)):
+            timings = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                await mode()
+                timings.append(time.perf_counter() - started)
+            summary = summarize(timings)
+            report[name] = {"http_requests": requests, "wall_s_mean": round(summary["mean"], 3),
+                            "wall_s_max": round(summary["max"], 3)}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="/stream/batch versus one /stream per query")
+    parser.add_argument("--queries", type=int, default=5, help="Queries per batch")
+    parser.add_argument("--latency-profile", default="production", help="latency_profile for every query")
+    parser.add_argument("--rounds", type=int, default=3, help="Repetitions per mode")
+    args = parser.parse_args()
+
+    queries = [{"search_query": f"{QUERY} {i}", "topNDocuments": 5} for i in range(args.queries)]
+    with running_server(env={"MOCK_ACCESS_LOG": "off"}) as base_url:
+        report = asyncio.run(run(base_url, queries, {"latency_profile": args.latency_profile}, args.rounds))
+    print_report({"queries": args.queries, "latency_profile": args.latency_profile, **report})
+
+
+if __name__ == "__main__":
+    main()
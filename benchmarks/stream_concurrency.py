@@ -0,0 +1,118 @@
+"""
+Concurrent /stream capacity and inter-frame jitter benchmark
+
+Compares the legacy threadpool engine (sync generator + time.sleep, reproduced
+below as `legacy_app`) with the asyncio engine in main.py:
+
+    python -m benchmarks.stream_concurrency --streams 1000 --duration 5
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Query
+from fastapi.responses import StreamingResponse
+
+from benchmarks.common import login, percentile, print_report, running_server, summarize
+
+FRAME_DELAY = 0.1  # Nominal pause between frames in both engines
+
+# --- Legacy engine (pre-asyncio main.py), kept only as the "before" baseline ---
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/health")
+def legacy_health():
+    return {"status": "OK"}
+
+
+@legacy_app.get("/stream")
+def legacy_stream(search_query: str = Query(...), topNDocuments: int = Query(5)):
+    def event_generator():
+        yield f"data: {json.dumps({'type': 'metadata', 'data': {'query': search_query}})}\n\n"
+        time.sleep(FRAME_DELAY)
+        text = search_query + ". Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8
+        for i in range(0, len(text), 6):
+            yield f"data: {json.dumps({'type': 'response', 'data': text[i:i+6]})}\n\n"
+            time.sleep(FRAME_DELAY)
+        for i in range(min(topNDocuments, 20)):
+            yield f"data: {json.dumps({'type': 'citation', 'data': f'Citation {i+1}'})}\n\n"
+            time.sleep(FRAME_DELAY)
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+async def _consume(client: httpx.AsyncClient, url: str, headers: Dict[str, str], stats: Dict, index: int) -> None:
+    """Read one stream, recording time-to-first-frame and inter-frame gaps."""
+    started = time.monotonic()
+    last: Optional[float] = None
+    frames = 0
+    params = {"search_query": "benchmark query", "topNDocuments": 5, "latency_profile": "legacy"}
+    try:
+        async with client.stream("GET", url, params=params, headers=headers) as response:
+            if response.status_code != 200:
+                stats["errors"] += 1
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                now = time.monotonic()
+                if last is None:
+                    stats["first_frame"].append(now - started)
+                else:
+                    stats["gaps"].append(now - last)
+                last = now
+                frames += 1
+                stats["frames"][index] = frames
+    except httpx.HTTPError:
+        stats["errors"] += 1
+
+
+async def measure(base_url: str, streams: int, duration: float, authenticate: bool) -> Dict:
+    """Open `streams` concurrent streams, read for `duration` seconds, then report."""
+    stats: Dict = {"first_frame": [], "gaps": [], "frames": [0] * streams, "errors": 0}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(None)) as client:
+        headers = await login(client, base_url) if authenticate else {}
+        tasks = [asyncio.create_task(_consume(client, f"{base_url}/stream", headers, stats, i))
+                 for i in range(streams)]
+        await asyncio.wait(tasks, timeout=duration)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # A stream "keeps pace" when it received at least half the frames a lone client would have
+    on_pace = sum(1 for count in stats["frames"] if count >= 0.5 * duration / FRAME_DELAY)
+    jitter_ms: List[float] = [abs(gap - FRAME_DELAY) * 1000 for gap in stats["gaps"]]
+    return {
+        "streams_requested": streams,
+        "streams_on_pace": on_pace,
+        "errors": stats["errors"],
+        "frames_per_second": round(sum(stats["frames"]) / duration, 1),
+        "time_to_first_frame_ms": {k: round(v * 1000, 2) if k != "count" else v
+                                   for k, v in summarize(stats["first_frame"]).items()},
+        "p99_jitter_ms": round(percentile(jitter_ms, 99), 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent /stream capacity benchmark")
+    parser.add_argument("--streams", type=int, default=500, help="Concurrent streams to open")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to read before stopping")
+    parser.add_argument("--engine", choices=["legacy", "async", "both"], default="both")
+    args = parser.parse_args()
+
+    report = {}
+    if args.engine in ("legacy", "both"):
+        with running_server("benchmarks.stream_concurrency:legacy_app") as base_url:
+            report["legacy_threadpool"] = asyncio.run(measure(base_url, args.streams, args.duration, False))
+    if args.engine in ("async", "both"):
+        with running_server("main:app") as base_url:
+            report["asyncio"] = asyncio.run(measure(base_url, args.streams, args.duration, True))
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+/stream over HTTP versus multiplexed over /stream/ws
+
+Issues the same bursts of searches (--burst concurrent queries, --bursts
+times) three ways against main.py with the instant latency profile: one
+HTTP request per query on a fresh connection, HTTP requests over a pooled
+keep-alive client, and all queries on one WebSocket. Reports wall time per
+burst and queries/sec:
+
+    python -m benchmarks.ws_multiplex --burst 10 --bursts 50
+
+Needs the `websockets` package (in the `serve` extra), which uvicorn also
+uses to serve the WebSocket.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from typing import Dict, List
+
+import httpx
+from websockets.asyncio.client import connect
+
+from benchmarks.common import login, print_report, running_server, summarize
+
+QUERY = "How to implement streaming in FastAPI"
+PARAMS = {"topNDocuments": 5, "latency_profile": "instant"}
+
+
+def report(burst_seconds: List[float], queries: int) -> Dict:
+    summary = summarize([seconds * 1000 for seconds in burst_seconds])
+    return {
+        "queries_per_sec": round(queries / sum(burst_seconds), 1),
+        "burst_ms": {key: round(summary[key], 2) for key in ("mean", "p50", "p99")},
+    }
+
+
+async def http_bursts(base_url: str, cookie: Dict[str, str], burst: int, bursts: int, pooled: bool) -> Dict:
+    """One GET /stream per query, each on its own connection unless `pooled`."""
+    pool = httpx.AsyncClient(timeout=60.0) if pooled else None
+
+    async def one(i: int) -> None:
+        params = {"search_query": f"{QUERY} {i}", **PARAMS}
+        if pool is not None:
+            (await pool.get(f"{base_url}/stream", params=params, headers=cookie)).raise_for_status()
+        else:
+            async with httpx.AsyncClient(timeout=60.0) as client:
+                (await client.get(f"{base_url}/stream", params=params, headers=cookie)).raise_for_status()
+
+    timings = []
+    try:
+        for _ in range(bursts):
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(burst)))
+            timings.append(time.perf_counter() - started)
+    finally:
+        if pool is not None:
+            await pool.aclose()
+    return report(timings, burst * bursts)
+
+
+async def ws_bursts(base_url: str, cookie: Dict[str, str], burst: int, bursts: int) -> Dict:
+    """Every query of every burst on one /stream/ws connection."""
+    ids = itertools.count()
+    timings = []
+    async with connect(base_url.replace("http", "ws", 1) + "/stream/ws", additional_headers=cookie,
+                       max_size=None) as ws:
+        for _ in range(bursts):
+            started = time.perf_counter()
+            pending = set()
+            for i in range(burst):
+                query_id = str(next(ids))
+                pending.add(query_id)
+                await ws.send(json.dumps({"type": "query", "id": query_id, "search_query": f"{QUERY} {i}", **PARAMS}))
+            while pending:
+                message = json.loads(await ws.recv())
+                if message["type"] == "error":
+                    raise RuntimeError(message)
+                if message["type"] == "done":
+                    pending.discard(message["id"])
+            timings.append(time.perf_counter() - started)
+    return report(timings, burst * bursts)
+
+
+async def run(base_url: str, burst: int, bursts: int) -> Dict:
+    async with httpx.AsyncClient() as client:
+        cookie = await login(client, base_url)
+    return {
+        "http_new_connection": await http_bursts(base_url, cookie, burst, bursts, pooled=False),
+        "http_keep_alive": await http_bursts(base_url, cookie, burst, bursts, pooled=True),
+        "websocket": await ws_bursts(base_url, cookie, burst, bursts),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="/stream over HTTP versus /stream/ws")
+    parser.add_argument("--burst", type=int, default=10, help="Concurrent queries per burst")
+    parser.add_argument("--bursts", type=int, default=50, help="Bursts per transport")
+    args = parser.parse_args()
+
+    with running_server(env={"MOCK_ACCESS_LOG": "off", "MOCK_COMPRESSION": "0"}) as base_url:
+        print_report({"burst": args.burst, **asyncio.run(run(base_url, args.burst, args.bursts))})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,36 @@
+import asyncio
 import json
 import time
 import uuid
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 from enum import Enum
-from typing import Optional, Dict
-from fastapi import FastAPI, Query, Body, Header, HTTPException, Depends, Request, Cookie
-from fastapi.responses import StreamingResponse, HTMLResponse, Response
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from fastapi import FastAPI, Query, Body, Header, HTTPException, Depends, Request, WebSocket
+from fastapi.responses import HTMLResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 import logging
 
+from mock_admission import (STREAM_BATCH_LIMIT, AdmissionRejected, AdmittedStreamingResponse, StreamAdmission,
+                            StreamPermit)
+from mock_access_log import ACCESS_LOG_MODE, AccessLogMiddleware, start_access_log
+from mock_compression import COMPRESSION_ENABLED, CompressionMiddleware
+from mock_faults import FaultMiddleware, make_injector, parse_rules
+from mock_frames import (COALESCE_BYTES, COALESCE_WINDOW_MS, FRAME_CACHE, MAX_CITATIONS, Coalescer, encode_frame,
+                         tag_frame)
+from mock_latency import LatencySampler, make_sampler
+from mock_metrics import (CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_ENABLED, REGISTRY, STREAM_COALESCED_EVENTS,
+                          STREAM_COALESCED_TOKENS, STREAM_FIRST_FRAME, STREAM_FIRST_TOKEN, STREAM_FRAMES, STREAMS,
+                          STREAMS_ACTIVE, MetricsMiddleware)
+from mock_multiplex import QueryMessage, QueryMux
+from mock_ratelimit import RATE_LIMITED, RouteLimit, make_rate_limiter
+from mock_ratings import BULK_LIMIT, RatingStore
+from mock_replay import REPLAY_FALLBACK, Transcript, make_library
+from mock_search import make_index
+from mock_sessions import SESSION_REUSE, SessionInfo, make_session_store, run_sweeper
+from mock_streams import CANCELLED, StreamHandle, StreamRegistry
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -62,11 +82,40 @@ class RatingRequest(BaseModel):
         }
 
 
+class BatchQuery(BaseModel):
+    """One query of a /stream/batch request."""
+    search_query: str = Field(
+        ...,
+        description="The search query text to process and stream back as tokens.",
+        example="How to implement streaming in FastAPI"
+    )
+    topNDocuments: int = Field(
+        5,
+        description="Number of citations to include."
+    )
+
+
 # --- FastAPI App ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background housekeeping for the lifetime of the app."""
+    listener = start_access_log() if ACCESS_LOG_MODE == "sampled" else None
+    sweeper = asyncio.create_task(run_sweeper(session_store))
+    rating_store.start()
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        await asyncio.to_thread(rating_store.close)
+        if listener:
+            listener.stop()
+
+
 app = FastAPI(
     title="Streaming API with Enhanced Documentation",
     description="API providing streaming responses with configurable options.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware to handle browser requests
@@ -78,8 +127,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add request logging middleware
-@app.middleware("http")
+# Fault injection (MOCK_FAULTS / MOCK_FAULT_SEED, or /admin/faults at runtime). Innermost but for
+# CORS, so injected errors are compressed, logged and timed like real ones
+fault_injector = make_injector()
+app.add_middleware(FaultMiddleware, injector=fault_injector)
+
+# Negotiated br/gzip/deflate, flushed per SSE event (MOCK_COMPRESSION=0 disables it).
+# Added before the logging/metrics middleware so they see the bytes actually sent
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Request logging middleware (verbose mode: full headers and body of every request)
 async def log_requests(request: Request, call_next):
     start_time = time.time()
     
@@ -103,19 +161,62 @@ async def log_requests(request: Request, call_next):
     
     return response
 
+# MOCK_ACCESS_LOG: "sampled" (default) logs one queued JSON line per sampled request,
+# "verbose" restores the full per-request dump above, "off" disables request logging
+if ACCESS_LOG_MODE == "verbose":
+    app.middleware("http")(log_requests)
+elif ACCESS_LOG_MODE == "sampled":
+    app.add_middleware(AccessLogMiddleware)
+
+# Per-route latency histograms for /metrics (MOCK_METRICS=0 disables them)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Security scheme
 security = HTTPBearer()
 
-# Session storage (in-memory for mock)
-class SessionInfo:
-    def __init__(self, session_id: str, access_token: str, expires_at: datetime):
-        self.session_id = session_id
-        self.access_token = access_token
-        self.expires_at = expires_at
-        self.created_at = datetime.now()
-
-# Global session store (sessionId -> SessionInfo)
-session_store: Dict[str, SessionInfo] = {}
+# Session storage (MOCK_SESSION_BACKEND: per-worker "memory" or shared "sqlite")
+session_store = make_session_store()
+
+# Rating storage (write-behind to MOCK_RATINGS_DB)
+rating_store = RatingStore()
+
+# Recorded /stream transcripts (MOCK_REPLAY_DIR); None when replay is off
+replay_library = make_library()
+
+# BM25 index over MOCK_DOCS_DIR for /stream citations; None keeps the synthetic ones
+search_index = make_index()
+
+# Admission control for /stream (MOCK_STREAM_LIMIT concurrent streams per worker, 0 = unlimited)
+stream_admission = StreamAdmission()
+
+# Open /stream responses by id, for POST /stream/{id}/cancel
+stream_registry = StreamRegistry()
+
+# Per-session token buckets for /stream and /add_rating (MOCK_RATE_LIMIT_STREAM / _RATING, 0 = unlimited)
+rate_limiter = make_rate_limiter()
+
+# Store-level metrics are read from the stores' own counters at scrape time
+REGISTRY.callback("mock_sessions", "Sessions held by this worker's session store.", "gauge",
+                  lambda: len(session_store))
+REGISTRY.callback("mock_session_evictions_total", "Sessions dropped by the session store size cap.", "counter",
+                  lambda: session_store.evictions)
+REGISTRY.callback("mock_session_expirations_total", "Sessions dropped because they expired.", "counter",
+                  lambda: session_store.expirations)
+REGISTRY.callback("mock_session_logins_reused_total", "Logins answered with the token's existing session.",
+                  "counter", lambda: session_store.reused)
+REGISTRY.callback("mock_ratings_received_total", "Ratings accepted by /add_rating and /add_ratings.", "counter",
+                  lambda: rating_store.received)
+REGISTRY.callback("mock_ratings_flushed_total", "Ratings written to the ratings database.", "counter",
+                  lambda: rating_store.flushed)
+REGISTRY.callback("mock_ratings_pending", "Ratings buffered in memory awaiting a flush.", "gauge",
+                  lambda: rating_store.pending)
+REGISTRY.callback("mock_stream_admission_active", "Stream slots held under MOCK_STREAM_LIMIT.", "gauge",
+                  lambda: stream_admission.active)
+REGISTRY.callback("mock_stream_admission_queued", "Streams waiting for a slot.", "gauge",
+                  lambda: stream_admission.queued)
+REGISTRY.callback("mock_stream_admission_rejected_total", "Streams refused with 429 (queue full or wait timed out).",
+                  "counter", lambda: stream_admission.rejected + stream_admission.timed_out)
 
 def generate_session_id() -> str:
     """Generate a unique session ID."""
@@ -123,21 +224,17 @@ def generate_session_id() -> str:
 
 def create_session(access_token: str) -> SessionInfo:
     """Create a new session with 55-minute expiry."""
-    session_id = generate_session_id()
-    expires_at = datetime.now() + timedelta(minutes=55)  # Match Azure AD token lifetime
-    session_info = SessionInfo(session_id, access_token, expires_at)
-    session_store[session_id] = session_info
-    return session_info
+    return session_store.create(generate_session_id(), access_token)
+
+def login_session(access_token: str) -> SessionInfo:
+    """The live session for this token (extended if past half its lifetime), or a new one."""
+    if SESSION_REUSE:
+        return session_store.login(access_token, generate_session_id)
+    return create_session(access_token)
 
 def get_session(session_id: str) -> Optional[SessionInfo]:
-    """Get session info by session ID."""
-    session_info = session_store.get(session_id)
-    if session_info and datetime.now() < session_info.expires_at:
-        return session_info
-    elif session_info:
-        # Session expired, remove it
-        del session_store[session_id]
-    return None
+    """Get session info by session ID (expired sessions are dropped)."""
+    return session_store.get(session_id)
 
 def parse_codesess_cookie(cookie_header: str) -> Optional[str]:
     """Parse codesess session ID from cookie header."""
@@ -152,7 +249,7 @@ def parse_codesess_cookie(cookie_header: str) -> Optional[str]:
     return None
 
 def require_auth(request: Request) -> SessionInfo:
-    """Dependency to require valid authentication."""
+    """Dependency to require valid authentication, charged to the session's rate limit for the route."""
     cookie_header = request.headers.get('cookie')
     if not cookie_header:
         raise HTTPException(status_code=401, detail="Authentication required")
@@ -165,8 +262,215 @@ def require_auth(request: Request) -> SessionInfo:
     if not session_info:
         raise HTTPException(status_code=401, detail="Session expired or invalid")
     
+    charge_rate_limit(rate_limiter.for_path(request.scope["path"]), session_info.session_id)
+    
     return session_info
 
+def charge_rate_limit(limit: Optional[RouteLimit], session_id: str, cost: int = 1) -> None:
+    """Take `cost` tokens from the session's bucket, or raise HTTPException 429 with RateLimit-* headers."""
+    if limit is None:
+        return
+    allowed, tokens = limit.take(session_id, cost)
+    if not allowed:
+        RATE_LIMITED.inc(1, (limit.name,))
+        raise HTTPException(status_code=429, detail=f"Rate limit for {limit.name} exceeded",
+                            headers=limit.headers(tokens, cost))
+
+# --- Streaming engine ---
+def synthetic_frames(search_query: str,
+                     topNDocuments: int,
+                     latency: LatencySampler,
+                     citations: Optional[List[bytes]] = None) -> Iterator[Tuple[bytes, float]]:
+    """(frame, delay after it) pairs for the synthetic lorem-ipsum answer."""
+    yield FRAME_CACHE.metadata_frame(search_query, topNDocuments), latency.first_token()  # Time-to-first-token
+
+    # Simulated LLM answer ("<query>. <lorem><query>"), streamed every 6 characters
+    for index, frame in enumerate(FRAME_CACHE.response_frames(search_query)):
+        yield frame, latency.token(index)  # pause to mimic streaming
+
+    # Citations based on the topNDocuments parameter (capped at 20), from the search index when there is one
+    for frame in FRAME_CACHE.citation_frames(topNDocuments) if citations is None else citations:
+        yield frame, latency.citation()
+
+
+async def event_generator(search_query: str,
+                          topNDocuments: int,
+                          latency: Optional[LatencySampler] = None,
+                          started: Optional[float] = None,
+                          transcript: Optional[Transcript] = None,
+                          coalescer: Optional[Coalescer] = None,
+                          handle: Optional[StreamHandle] = None,
+                          citations: Optional[List[bytes]] = None) -> AsyncIterator[bytes]:
+    """
+    Generate the SSE frames for a search query.
+
+    Delays are awaited rather than slept, so an open stream never holds a
+    threadpool thread and a single worker can serve thousands of streams.
+    Frames and delays come from a recorded `transcript` when one is given
+    (see mock_replay), otherwise from synthetic_frames(): pre-encoded
+    FRAME_CACHE frames paced by `latency` (see mock_latency.PROFILES),
+    with `citations` (see mock_search) in place of the synthetic ones.
+
+    With a `coalescer`, consecutive response tokens are merged into fewer
+    events (see mock_frames.Coalescer); the delays are still awaited per
+    token, so only the framing and the number of writes change.
+
+    `started` (perf_counter) is when the request was handled, for the
+    time-to-first-frame/token histograms. Frame counts are published once
+    per stream rather than per frame, with the outcome: completed,
+    disconnected or cancelled (from the stream's `handle`), or aborted.
+    """
+    if transcript is not None:
+        source = transcript.frames()
+    else:
+        source = synthetic_frames(search_query, topNDocuments, latency or make_sampler(), citations)
+    started = time.perf_counter() if started is None else started
+    frames = 0
+    outcome = "aborted"
+    STREAMS_ACTIVE.inc()
+    try:
+        for frame, delay in source:
+            for ready in coalescer.push(frame, delay) if coalescer is not None else (frame,):
+                yield ready
+                frames += 1
+                if frames == 1:
+                    STREAM_FIRST_FRAME.observe(time.perf_counter() - started)
+                elif frames == 2:
+                    # Streams open with a metadata frame; the next one is the first token
+                    STREAM_FIRST_TOKEN.observe(time.perf_counter() - started)
+            await asyncio.sleep(delay)
+        if coalescer is not None:
+            for ready in coalescer.flush():
+                yield ready
+                frames += 1
+        outcome = "completed"
+    finally:
+        if outcome == "aborted" and handle is not None and handle.reason:
+            outcome = handle.reason
+        STREAMS_ACTIVE.dec()
+        STREAM_FRAMES.inc(frames)
+        STREAMS.inc(1, (outcome,))
+        if coalescer is not None:
+            STREAM_COALESCED_TOKENS.inc(coalescer.tokens)
+            STREAM_COALESCED_EVENTS.inc(coalescer.events)
+
+
+async def plan_stream(search_query: str,
+                      topNDocuments: int,
+                      latency_profile: Optional[str],
+                      latency_seed: Optional[int],
+                      coalesce_ms: float,
+                      coalesce_bytes: int) -> Callable[[Optional[StreamHandle]], AsyncIterator[bytes]]:
+    """
+    Validate a stream's parameters and look up its transcript or indexed
+    citations, raising HTTPException (400/404, or 500 for an unreadable
+    transcript) if it cannot run. Returns a
+    function that starts event_generator() for the stream's handle once
+    the stream has been admitted.
+    """
+    started = time.perf_counter()
+    try:
+        latency = make_sampler(latency_profile, latency_seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    transcript = None
+    if replay_library is not None:
+        try:
+            transcript = await asyncio.to_thread(replay_library.find, search_query, topNDocuments)
+        except ValueError as e:
+            # A corrupt fixture falls back like a missing one; with the 404 fallback, say what went wrong
+            logger.warning(f"⚠️ Unreadable replay transcript for {search_query!r}: {e}")
+            if REPLAY_FALLBACK == "404":
+                raise HTTPException(status_code=500, detail="The recorded transcript for this query is unreadable")
+        else:
+            if transcript is None and REPLAY_FALLBACK == "404":
+                raise HTTPException(status_code=404, detail="No recorded transcript for this query")
+
+    citations = None
+    if transcript is None and search_index is not None:
+        citations = await asyncio.to_thread(search_index.citation_frames, search_query,
+                                            min(topNDocuments, MAX_CITATIONS))
+
+    coalescer = Coalescer(coalesce_ms / 1000.0, coalesce_bytes)
+    return lambda handle: event_generator(search_query, topNDocuments, latency, started, transcript,
+                                          coalescer if coalescer.enabled else None, handle, citations)
+
+
+async def admit_stream(session_id: str) -> StreamPermit:
+    """A stream slot under MOCK_STREAM_LIMIT, or HTTPException 429 with Retry-After."""
+    try:
+        return await stream_admission.acquire(session_id)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+
+async def admitted_frames(frames: Callable[[Optional[StreamHandle]], AsyncIterator[bytes]], handle: StreamHandle,
+                          permit: Optional[StreamPermit] = None) -> AsyncIterator[bytes]:
+    """One /stream/batch query's frames under its own stream slot, waiting for one unless `permit` is given."""
+    if permit is None:
+        permit = await admit_stream(handle.session_id)
+    try:
+        async for frame in frames(handle):
+            yield frame
+    finally:
+        permit.release()
+
+
+async def multiplexed_frames(query: QueryMessage, handle: StreamHandle) -> AsyncIterator[bytes]:
+    """The frames of one /stream/ws query, charged to the session's stream rate limit and holding a stream slot."""
+    frames = await plan_stream(query.search_query, query.topNDocuments, query.latency_profile,
+                               query.latency_seed, query.coalesce_ms, query.coalesce_bytes)
+    charge_rate_limit(rate_limiter.limits.get("stream"), handle.session_id)  # Only once the query is valid
+    permit = await admit_stream(handle.session_id)
+    try:
+        async for frame in frames(handle):
+            yield frame
+    finally:
+        permit.release()
+
+
+async def interleaved_frames(sources: List[AsyncIterator[bytes]]) -> AsyncIterator[bytes]:
+    """
+    Run several frame generators concurrently and yield their frames as they
+    are produced, each tagged with its generator's index, followed by a
+    {"index": i, "type": "done"} frame when that generator finishes, or
+    {"index": i, "type": "error", "status": ..., "detail": ...} if it raised
+    HTTPException (e.g. a 429 from admission) instead.
+
+    The generators feed a small shared queue, so a slow client holds them
+    all back; when the consumer stops (disconnect, cancel) they are cancelled
+    with it. Any other exception in one generator ends the whole stream.
+    """
+    queue: asyncio.Queue = asyncio.Queue(4 * len(sources))
+
+    async def pump(index: int, source: AsyncIterator[bytes]) -> None:
+        members = b'"index": %d' % index
+        try:
+            async for frame in source:
+                await queue.put((tag_frame(frame, members), False))
+            await queue.put((encode_frame({"index": index, "type": "done"}), True))
+        except HTTPException as e:
+            error = {"index": index, "type": "error", "status": e.status_code, "detail": e.detail}
+            await queue.put((encode_frame(error), True))
+        except Exception as e:
+            await queue.put((e, True))
+
+    tasks = [asyncio.create_task(pump(index, source)) for index, source in enumerate(sources)]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            frame, last = await queue.get()
+            if isinstance(frame, Exception):
+                raise frame
+            remaining -= last
+            yield frame
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
 # --- MCP Integration (commented out - requires standalone server) ---
 # The FastMCP framework is designed to run as a standalone server
 # For single-port deployment, we'd need to implement MCP protocol manually
@@ -183,6 +487,45 @@ def health_check():
     return {"status": "OK"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus text-format metrics for this worker: per-route latency,
+    active streams, time-to-first-frame/token, session store size and
+    evictions, and rating ingestion counters.
+    """
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/admin/faults", include_in_schema=False)
+def get_faults():
+    """Current fault-injection rules, seed and counts of injected faults."""
+    return fault_injector.snapshot()
+
+
+@app.put("/admin/faults", include_in_schema=False)
+def put_faults(config: Dict[str, Any] = Body(...)):
+    """
+    Replace the fault-injection rules, e.g.
+    {"seed": 42, "routes": {"/stream": {"disconnect": 0.1}, "*": {"error": 0.01}}}.
+    The RNG restarts from the seed, so the same request sequence sees the same faults.
+    """
+    try:
+        rules = parse_rules(config.get("routes", {}))
+        seed = config.get("seed")
+        fault_injector.configure(rules, None if seed is None else int(seed))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return fault_injector.snapshot()
+
+
+@app.delete("/admin/faults", include_in_schema=False)
+def delete_faults():
+    """Turn fault injection off."""
+    fault_injector.configure({})
+    return fault_injector.snapshot()
+
+
 @app.get("/")
 def login():
     """
@@ -227,6 +570,9 @@ def api_login(
     2. Server validates token (mocked - we accept any Bearer token)
     3. Server creates session and returns codesess cookie
     4. Client uses codesess cookie for subsequent API calls
+
+    Logging in again with the same token returns the session already issued
+    for it (set MOCK_SESSION_REUSE=0 to always create a new one).
     """
     # Mock authentication - accept any Bearer token
     if not authorization.startswith("Bearer "):
@@ -235,18 +581,19 @@ def api_login(
     # Extract the Bearer token (in real implementation, this would be validated with Azure AD)
     bearer_token = authorization.split(" ", 1)[1]
     
-    # Create a new session
-    session_info = create_session(bearer_token)
+    # Reuse the token's live session, or create a new one
+    session_info = login_session(bearer_token)
     
     # Set the codesess cookie in the response (exactly what the client expects)
-    cookie_value = f"codesess={session_info.session_id}; HttpOnly; Path=/; Max-Age=3300; SameSite=Lax"
+    max_age = round(session_info.expires_at - time.monotonic())
+    cookie_value = f"codesess={session_info.session_id}; HttpOnly; Path=/; Max-Age={max_age}; SameSite=Lax"
     response.headers["Set-Cookie"] = cookie_value
     
     # Also return JSON response (though client primarily uses the cookie)
     return {
         "message": "Authentication successful",
         "session_id": session_info.session_id,
-        "expires_at": session_info.expires_at.isoformat(),
+        "expires_at": session_info.expires_at_datetime().isoformat(),
         "token_type": "session"
     }
 
@@ -274,7 +621,7 @@ def token(
                 "and sends them in a Server-Sent Event style, with citations appended at the end.",
     response_description="A text/event-stream containing generated content chunks and citations."
 )
-def stream(
+async def stream(
     search_query: str = Query(
         ...,    # Required parameter (no default)
         description="The search query text to process and stream back as tokens."
@@ -283,6 +630,33 @@ def stream(
         5,      # Default value
         description="Number of citations to include."
     ),
+    latency_profile: Optional[str] = Query(
+        None,
+        description="Latency profile (legacy, instant, production, degraded). "
+                    "Defaults to the MOCK_LATENCY_PROFILE environment variable."
+    ),
+    latency_seed: Optional[int] = Query(
+        None,
+        description="Seed for the latency profile's random delays, for repeatable runs."
+    ),
+    coalesce_ms: float = Query(
+        COALESCE_WINDOW_MS,
+        ge=0,
+        description="Merge response tokens produced within this many milliseconds into one event "
+                    "(0 = no time window). Defaults to MOCK_COALESCE_WINDOW_MS."
+    ),
+    coalesce_bytes: int = Query(
+        COALESCE_BYTES,
+        ge=0,
+        description="Emit a merged response event once it reaches this many bytes "
+                    "(0 = no budget). Defaults to MOCK_COALESCE_BYTES."
+    ),
+    stream_id: Optional[str] = Query(
+        None,
+        max_length=64,
+        description="Id to register the stream under for POST /stream/{stream_id}/cancel. "
+                    "Generated when omitted; returned in the X-Stream-Id header either way."
+    ),
     session: SessionInfo = Depends(require_auth)  # Require valid authentication
 ):
     """
@@ -293,47 +667,167 @@ def stream(
     Parameters:
     - **search_query**: (string, required) The text to process and stream back
     - **topNDocuments**: (integer, default=5) Number of citation entries
+    - **latency_profile**: (string, optional) Named delay model for the stream
+    - **latency_seed**: (integer, optional) Seed for repeatable delays
+    - **coalesce_ms** / **coalesce_bytes**: (optional) Batch tokens into fewer events
+    - **stream_id**: (string, optional) Id for cancelling the stream from another connection
+
+    Returns a streaming response with tokens and citations. When the
+    worker is at its stream limit the request waits its turn (fairly
+    across sessions); if the wait queue is full, or the wait times out,
+    it gets 429 with a Retry-After header. A session over its
+    MOCK_RATE_LIMIT_STREAM budget gets 429 with RateLimit-* headers.
+
+    With MOCK_REPLAY_DIR set, a transcript recorded for the same query and
+    topNDocuments is replayed with its original pacing instead. With
+    MOCK_DOCS_DIR set, citations are the best BM25 passages from those
+    documents rather than placeholders.
+
+    Generation stops as soon as the client disconnects, or when the stream
+    is cancelled through POST /stream/{stream_id}/cancel.
+    """
+    frames = await plan_stream(search_query, topNDocuments, latency_profile, latency_seed,
+                               coalesce_ms, coalesce_bytes)
+
+    try:
+        handle = stream_registry.open(session.session_id, stream_id)
+    except KeyError:
+        raise HTTPException(status_code=409, detail="A stream with this id is already open")
+
+    try:
+        permit = await admit_stream(session.session_id)
+    except BaseException:
+        handle.close()
+        raise
+
+    # The permit is released and the handle closed when the response finishes, however it ends
+    return AdmittedStreamingResponse(
+        permit,
+        handle,
+        frames(handle),
+        media_type="text/event-stream",
+        headers={"X-Stream-Id": handle.stream_id},
+    )
 
-    Returns a streaming response with tokens and citations.
+
+@app.post(
+    "/stream/batch",
+    summary="Stream several queries interleaved on one response",
+    description="Runs a list of queries concurrently and streams all of their events on one SSE response, "
+                "each event tagged with the query's index in the list.",
+    response_description="A text/event-stream of index-tagged events; each query ends with a `done` event."
+)
+async def stream_batch(
+    queries: List[BatchQuery] = Body(..., min_length=1),
+    latency_profile: Optional[str] = Query(
+        None,
+        description="Latency profile for every query. Defaults to the MOCK_LATENCY_PROFILE environment variable."
+    ),
+    latency_seed: Optional[int] = Query(
+        None,
+        description="Seed for the latency profile's random delays (query i uses seed + i)."
+    ),
+    coalesce_ms: float = Query(COALESCE_WINDOW_MS, ge=0, description="As for /stream, per query."),
+    coalesce_bytes: int = Query(COALESCE_BYTES, ge=0, description="As for /stream, per query."),
+    stream_id: Optional[str] = Query(
+        None,
+        max_length=64,
+        description="Id for POST /stream/{stream_id}/cancel, which cancels the whole batch."
+    ),
+    session: SessionInfo = Depends(require_auth)
+):
+    """
+    Batch streaming endpoint: /stream for several queries at once.
+
+    Events are the /stream events with an "index" member naming the query
+    (its position in the list), interleaved as they are produced, so the
+    response takes about as long as the slowest query rather than the sum.
+    Each query ends with {"index": i, "type": "done"}.
+
+    Every query is validated before anything is streamed: one bad query
+    fails the whole batch with its /stream status. A batch may have at most
+    MOCK_STREAM_BATCH_LIMIT queries (413) and is charged one
+    MOCK_RATE_LIMIT_STREAM token per query, so no more queries than the
+    limit's burst (413). Each query holds its own stream
+    slot under MOCK_STREAM_LIMIT, like a separate /stream request: the
+    first is admitted before the response starts (429 if it cannot be),
+    the rest wait for theirs while the batch streams, and a query refused
+    a slot ends with an index-tagged error event.
     """
+    if len(queries) > STREAM_BATCH_LIMIT:
+        raise HTTPException(status_code=413,
+                            detail=f"Batch of {len(queries)} queries exceeds the limit of {STREAM_BATCH_LIMIT}")
+    limit = rate_limiter.limits.get("stream")
+    if limit is not None and len(queries) > limit.burst:
+        raise HTTPException(status_code=413,
+                            detail=f"Batch of {len(queries)} queries exceeds the stream rate limit's burst of {limit.burst}")
+    plans = [await plan_stream(query.search_query, query.topNDocuments, latency_profile,
+                               None if latency_seed is None else latency_seed + index, coalesce_ms, coalesce_bytes)
+             for index, query in enumerate(queries)]
+
+    try:
+        handle = stream_registry.open(session.session_id, stream_id)
+    except KeyError:
+        raise HTTPException(status_code=409, detail="A stream with this id is already open")
+
+    try:
+        # Charged only for a batch that was accepted, before it waits for a stream slot
+        charge_rate_limit(limit, session.session_id, len(queries))
+        permit = await admit_stream(session.session_id)
+    except BaseException:
+        handle.close()
+        raise
+
+    sources = [admitted_frames(frames, handle, permit if index == 0 else None) for index, frames in enumerate(plans)]
+    return AdmittedStreamingResponse(
+        permit,
+        handle,
+        interleaved_frames(sources),
+        media_type="text/event-stream",
+        headers={"X-Stream-Id": handle.stream_id},
+    )
 
-    def event_generator():
-        # Log the parameters received (optional, for debugging)
-        metadata = {
-            "type": "metadata",
-            "data": {
-                "query": search_query,
-                "citations_requested": topNDocuments
-            }
-        }
-        yield f"data: {json.dumps(metadata)}\n\n"
-        time.sleep(0.1)  # Small delay to separate metadata from content
 
-        # Make the esond request to the LLM (simulated here)
-        search_response = search_query + ". " + """
-Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla pariatur. Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id est laborum.
-""" + search_query  # Simulated response
+@app.websocket("/stream/ws")
+async def stream_ws(websocket: WebSocket):
+    """
+    Multiplexed /stream: many concurrent queries over one WebSocket.
 
-        # Split query into tokens (every 6 characters)
-        tokens = [search_response[i:i+6] for i in range(0, len(search_response), 6)]
+    The codesess cookie is checked once, on the handshake (a missing or
+    expired session refuses it with 403); queries then skip the per-request
+    connection and auth overhead. Each query is admitted and rate limited
+    like a /stream request, its events come back tagged with the query id, and it can be
+    cancelled on its own. See mock_multiplex for the message protocol.
+    """
+    session_id = parse_codesess_cookie(websocket.headers.get("cookie", ""))
+    session = get_session(session_id) if session_id else None
+    if session is None:
+        await websocket.close(code=1008)  # Before accept(): the handshake is refused with 403
+        return
+    await websocket.accept()
+    await QueryMux(websocket, session.session_id, multiplexed_frames).serve()
 
-        # Simulate streaming each token as type: response
-        for token in tokens:
-            chunk = {"type": "response", "data": token}
-            yield f"data: {json.dumps(chunk)}\n\n"
-            time.sleep(0.1)  # quick pause to mimic streaming
 
-        # Generate citations based on the topNDocuments parameter
-        citation_count = min(topNDocuments, 20)
-        citations_data = [
-            {"type": "citation", "data": f"Citation {i+1}: " + str(i+1) * (i+1)}
-            for i in range(citation_count)
-        ]
+@app.post(
+    "/stream/{stream_id}/cancel",
+    summary="Cancel an open stream",
+    description="Stops an open /stream response of the same session from another connection. "
+                "The stream ends with a final `cancelled` event.",
+    response_description="Whether the stream was still running and has been cancelled."
+)
+async def cancel_stream(stream_id: str, session: SessionInfo = Depends(require_auth)):
+    """
+    Cancel a stream by the id from its X-Stream-Id header. Async so that
+    the stream's task is cancelled on the event loop, not a worker thread.
 
-        for citation in citations_data:
-            yield f"data: {json.dumps(citation)}\n\n"
-            time.sleep(0.1)
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    Streams are tracked per worker, so with several workers the cancel must
+    reach the worker serving the stream; other sessions' streams are not
+    visible (404).
+    """
+    handle = stream_registry.get(stream_id)
+    if handle is None or handle.session_id != session.session_id:
+        raise HTTPException(status_code=404, detail="No open stream with this id")
+    return {"stream_id": stream_id, "cancelled": handle.cancel(CANCELLED)}
 
 
 @app.post(
@@ -363,12 +857,155 @@ def add_rating(
     - **search_query**: (string, required) The search query that was rated
     - **rating**: (float, required) Rating on a scale of 1-5
 
-    Returns a success confirmation message.
+    Returns a success confirmation message, or 429 once the session is over
+    its MOCK_RATE_LIMIT_RATING budget.
     """
-    # In a real implementation, you would store this rating in a database
-    print(f"Received rating: {req.rating}/5 for query '{req.search_query}' in chat {req.chat_id}")
+    # Buffered in memory and written behind to SQLite; a retry of the same
+    # (chat_id, search_query) replaces the earlier rating instead of adding one
+    rating_store.add(req.chat_id, req.search_query, req.rating, session.session_id)
 
     # Return only the message field
     return {
         "message": "Rating added successfully"
-    }
\ No newline at end of file
+    }
+
+
+def parse_rating_batch(body: bytes, ndjson: bool) -> List[Any]:
+    """
+    Split a bulk rating body into raw items.
+
+    NDJSON yields one item per non-blank line, keeping lines that are not
+    valid JSON as their raw text so they are rejected individually. A JSON
+    body must be an array; anything else fails the whole batch.
+    """
+    if ndjson:
+        items: List[Any] = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(line.decode("utf-8", "replace"))
+        return items
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of ratings or an NDJSON body")
+    return items
+
+
+def ingest_rating_batch(body: bytes, ndjson: bool, session_id: str) -> Dict[str, Any]:
+    """Parse and validate every item in one pass, then buffer the valid ones with a single store call."""
+    items = parse_rating_batch(body, ndjson)
+    if len(items) > BULK_LIMIT:
+        raise HTTPException(status_code=413, detail=f"Batch of {len(items)} ratings exceeds the limit of {BULK_LIMIT}")
+
+    results: List[Dict[str, Any]] = []
+    accepted = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({"index": index, "status": "rejected",
+                            "errors": [{"field": None, "message": "Expected a JSON object"}]})
+            continue
+        try:
+            req = RatingRequest(**item)
+        except ValidationError as e:
+            results.append({"index": index, "status": "rejected",
+                            "errors": [{"field": ".".join(str(part) for part in err["loc"]) or None,
+                                        "message": err["msg"]} for err in e.errors()]})
+            continue
+        accepted.append((req.chat_id, req.search_query, req.rating))
+        results.append({"index": index, "status": "accepted"})
+
+    rating_store.add_many(accepted, session_id)
+    return {
+        "accepted": len(accepted),
+        "rejected": len(items) - len(accepted),
+        "results": results,
+    }
+
+
+@app.post(
+    "/add_ratings",
+    summary="Record a batch of ratings",
+    description="Bulk variant of /add_rating. Accepts an NDJSON body (one rating per line, "
+                "Content-Type application/x-ndjson) or a JSON array of ratings, authenticated once "
+                "for the whole batch.",
+    response_description="Accepted/rejected counts and the status of every item, in request order."
+)
+async def add_ratings(
+    request: Request,
+    session: SessionInfo = Depends(require_auth)
+):
+    """
+    Records many user ratings in one request.
+
+    This endpoint requires authentication via codesess session cookie.
+
+    Each item has the same fields as /add_rating (chat_id, search_query,
+    rating). Invalid items are rejected individually and never fail the
+    rest of the batch; later items for the same (chat_id, search_query)
+    replace earlier ones. Items are indexed from 0 in request order, with
+    blank NDJSON lines skipped. An application/json body must be an array
+    (400 otherwise); without a Content-Type the format is taken from the
+    body, an array if it starts with '['.
+
+    Returns accepted/rejected counts and per-item results.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        ndjson = True
+    elif content_type:
+        ndjson = False
+    else:
+        ndjson = not body.lstrip().startswith(b"[")
+
+    # Parsing and validation are CPU-bound; keep them off the event loop so
+    # large batches don't stall concurrent streams
+    return await asyncio.to_thread(ingest_rating_batch, body, ndjson, session.session_id)
+
+
+@app.get(
+    "/ratings/stats",
+    summary="Aggregate statistics for recorded ratings",
+    description="Returns global count, mean, 1-5 histogram and quantiles of all ratings, plus the best and "
+                "worst rated queries. Aggregates are maintained incrementally as ratings arrive.",
+    response_description="Global rating summary, top/bottom queries and optionally one query's summary."
+)
+def ratings_stats(
+    top_k: int = Query(
+        5,
+        ge=1,
+        le=100,
+        description="Number of best and worst rated queries to return."
+    ),
+    min_count: int = Query(
+        1,
+        ge=1,
+        description="Only rank queries with at least this many ratings."
+    ),
+    search_query: Optional[str] = Query(
+        None,
+        description="Also return the count, mean, histogram and quantiles for this query."
+    ),
+    session: SessionInfo = Depends(require_auth)
+):
+    """
+    Rating statistics for dashboards.
+
+    This endpoint requires authentication via codesess session cookie.
+    Statistics cover the ratings seen by this worker plus those persisted
+    before it started.
+
+    Parameters:
+    - **top_k**: (integer, default=5) Size of the best/worst query lists
+    - **min_count**: (integer, default=1) Minimum ratings for a query to be ranked
+    - **search_query**: (string, optional) Query to summarize individually
+
+    Returns the global summary, the number of distinct queries and the rankings.
+    """
+    return rating_store.snapshot(top_k, min_count, search_query)
\ No newline at end of file
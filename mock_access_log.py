@@ -0,0 +1,134 @@
+"""
+Structured, sampled access logging for the mock API
+A pure ASGI middleware that writes one JSON line per sampled request through a
+queue, so formatting and I/O happen on a listener thread instead of the hot path
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Iterable, List, Optional
+
+ACCESS_LOG_MODE = os.getenv("MOCK_ACCESS_LOG", "sampled")           # sampled | verbose | off
+SAMPLE_RATE = float(os.getenv("MOCK_LOG_SAMPLE_RATE", "1.0"))       # Fraction of requests logged
+HEADER_ALLOWLIST = [h.strip().lower() for h in
+                    os.getenv("MOCK_LOG_HEADERS", "user-agent,content-type,accept").split(",") if h.strip()]
+LOG_BODIES = os.getenv("MOCK_LOG_BODIES", "0") == "1"               # Request bodies are never logged by default
+BODY_LIMIT = 1024                                                   # Max body bytes kept per request
+QUEUE_SIZE = 10000                                                  # Records beyond this are dropped, not blocked on
+
+access_logger = logging.getLogger("mock_api.access")
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Serialises dict messages (access log entries) as one JSON line; other messages pass through."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if isinstance(record.msg, dict):
+            return json.dumps(record.msg)
+        return record.getMessage()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that counts and drops records when the queue is full instead of blocking."""
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Entries are queued as raw dicts; the listener's JsonLineFormatter serialises them
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def start_access_log(stream=None) -> logging.handlers.QueueListener:
+    """Route access_logger through a bounded queue to a listener thread; returns the started listener."""
+    log_queue: "queue.Queue" = queue.Queue(QUEUE_SIZE)
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonLineFormatter())
+    access_logger.handlers = [DroppingQueueHandler(log_queue)]
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    return listener
+
+
+class AccessLogMiddleware:
+    """
+    Logs one structured line per sampled HTTP request, written when the
+    response finishes (so streams report their full duration).
+
+    Unsampled requests go straight to the app. Sampled ones only wrap
+    `send` to note the status, time-to-first-byte and response size.
+    The request body is captured as the app reads it, and only when
+    `log_bodies` is set.
+    """
+
+    def __init__(self, app,
+                 sample_rate: float = SAMPLE_RATE,
+                 header_allowlist: Iterable[str] = HEADER_ALLOWLIST,
+                 log_bodies: bool = LOG_BODIES,
+                 logger: Optional[logging.Logger] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header_allowlist = frozenset(h.lower().encode("latin-1") for h in header_allowlist)
+        self.log_bodies = log_bodies
+        self.logger = logger or access_logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 0
+        ttfb: Optional[float] = None
+        sent = 0
+        body: Optional[List[bytes]] = [] if self.log_bodies else None
+
+        async def send_wrapper(message):
+            nonlocal status, ttfb, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                ttfb = time.perf_counter() - started
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request" and sum(map(len, body)) < BODY_LIMIT:
+                body.append(message.get("body", b""))
+            return message
+
+        try:
+            await self.app(scope, receive_wrapper if body is not None else receive, send_wrapper)
+        finally:
+            entry = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status or 500,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                "ttfb_ms": round(ttfb * 1000, 2) if ttfb is not None else None,
+                "bytes": sent,
+                "client": scope["client"][0] if scope.get("client") else None,
+            }
+            headers = {k.decode("latin-1"): v.decode("latin-1")
+                       for k, v in scope["headers"] if k in self.header_allowlist}
+            if headers:
+                entry["headers"] = headers
+            if body:
+                entry["body"] = b"".join(body)[:BODY_LIMIT].decode("utf-8", "replace")
+            # Serialised by the listener thread's JsonLineFormatter, off the event loop
+            self.logger.info(entry)
@@ -0,0 +1,175 @@
+"""
+Admission control for the mock /stream endpoint
+Caps concurrent streams per worker, queues the overflow with start-time fair
+queueing per session, and rejects with a fast 429 + Retry-After once the queue is full
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from mock_streams import CancellableStreamingResponse, StreamHandle
+
+STREAM_LIMIT = int(os.getenv("MOCK_STREAM_LIMIT", "0"))                        # Concurrent streams per worker; 0 = unlimited
+STREAM_QUEUE = int(os.getenv("MOCK_STREAM_QUEUE", "100"))                      # Streams allowed to wait for a slot
+STREAM_QUEUE_TIMEOUT = float(os.getenv("MOCK_STREAM_QUEUE_TIMEOUT", "30"))     # Max seconds a stream waits before a 429
+STREAM_BATCH_LIMIT = int(os.getenv("MOCK_STREAM_BATCH_LIMIT", "16"))           # Max queries in one /stream/batch (one slot each)
+HOLD_SMOOTHING = 0.2                                                            # EWMA weight of the latest stream duration
+
+
+class AdmissionRejected(Exception):
+    """The stream was not admitted; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class StreamPermit:
+    """A held stream slot; release() is idempotent."""
+    __slots__ = ("admission", "started", "released")
+
+    def __init__(self, admission: Optional["StreamAdmission"]):
+        self.admission = admission
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            if self.admission is not None:
+                self.admission._release(time.monotonic() - self.started)
+
+
+class StreamAdmission:
+    """
+    Concurrency limit with a bounded, weighted-fair wait queue.
+
+    Waiters are ordered by start-time fair queueing: each request gets a
+    virtual finish tag of max(virtual time, its session's last tag) +
+    1/weight, and a freed slot goes to the smallest tag. A session that
+    queues many streams therefore gets interleaved with everyone else
+    instead of draining first. Weights default to 1 (equal shares).
+
+    When the queue is full, a request from a session with fewer waiters
+    pushes out the newest waiter of the session with the most, so a heavy
+    session cannot hold every queue position either.
+
+    Used from a single event loop, so no locking is needed. A freed slot is
+    handed straight to the next waiter; `active` never dips in between.
+    """
+
+    def __init__(self, limit: int = STREAM_LIMIT, queue_size: int = STREAM_QUEUE,
+                 queue_timeout: float = STREAM_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._heap: List[Tuple[float, int, str, asyncio.Future]] = []
+        self._tags: Dict[str, float] = {}
+        self._waiting: Dict[str, int] = {}  # Queued streams per session
+        self._vtime = 0.0
+        self._seq = itertools.count()
+        self._avg_hold = 1.0
+        self.admitted = 0   # Streams given a slot
+        self.rejected = 0   # 429s because the queue was full (including pushed-out waiters)
+        self.timed_out = 0  # 429s because the wait exceeded queue_timeout
+
+    def retry_after(self) -> int:
+        """Whole seconds until a new request would likely get a slot."""
+        return max(1, math.ceil(self._avg_hold * (self.queued + 1) / max(self.limit, 1)))
+
+    async def acquire(self, key: str, weight: float = 1.0) -> StreamPermit:
+        """Wait for a slot for session `key`; raises AdmissionRejected on overflow or timeout."""
+        if self.limit <= 0:
+            return StreamPermit(None)
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            return StreamPermit(self)
+        if self.queued >= self.queue_size and not self._push_out(key):
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after(), "Too many concurrent streams, queue is full")
+
+        if not self.queued:
+            # Nothing is waiting, so earlier tags no longer matter
+            self._heap.clear()
+            self._tags.clear()
+            self._vtime = 0.0
+        tag = max(self._vtime, self._tags.get(key, 0.0)) + 1.0 / weight
+        self._tags[key] = tag
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (tag, next(self._seq), key, waiter))
+        self.queued += 1
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except AdmissionRejected:
+            raise  # Pushed out by another session; already dequeued and counted
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if not waiter.done() or waiter.cancelled():
+                self._dequeued(key)
+            elif waiter.exception() is None:
+                # The slot was handed over just as the wait ended; give it back
+                self._release(0.0, record=False)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise AdmissionRejected(self.retry_after(), "Timed out waiting for a stream slot") from None
+        self.admitted += 1
+        return StreamPermit(self)
+
+    def _dequeued(self, key: str) -> None:
+        self.queued -= 1
+        left = self._waiting[key] - 1
+        if left:
+            self._waiting[key] = left
+        else:
+            del self._waiting[key]
+
+    def _push_out(self, key: str) -> bool:
+        """Reject the newest waiter of the most-queued session if it has more waiters than `key` would."""
+        if not self._waiting:
+            return False
+        heaviest = max(self._waiting, key=self._waiting.__getitem__)
+        if self._waiting[heaviest] <= self._waiting.get(key, 0) + 1:
+            return False
+        victim = max((entry for entry in self._heap if entry[2] == heaviest and not entry[3].done()),
+                     key=lambda entry: entry[0])
+        self._dequeued(heaviest)
+        self.rejected += 1
+        reason = "Pushed out of the stream queue by other sessions"
+        victim[3].set_exception(AdmissionRejected(self.retry_after(), reason))
+        return True
+
+    def _release(self, held: float, record: bool = True) -> None:
+        if record:
+            self._avg_hold += HOLD_SMOOTHING * (held - self._avg_hold)
+        while self._heap:
+            tag, _, key, waiter = heapq.heappop(self._heap)
+            if waiter.done():
+                continue  # Timed out, cancelled or pushed out while queued
+            self._dequeued(key)
+            self._vtime = tag
+            waiter.set_result(None)
+            return
+        self.active -= 1
+
+
+class AdmittedStreamingResponse(CancellableStreamingResponse):
+    """Cancellable stream that gives its admission slot back however the response ends."""
+
+    def __init__(self, permit: StreamPermit, handle: Optional[StreamHandle], *args, **kwargs):
+        super().__init__(handle, *args, **kwargs)
+        self.permit = permit
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.permit.release()
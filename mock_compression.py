@@ -0,0 +1,153 @@
+"""
+Negotiated response compression for the mock API
+A pure ASGI middleware that picks br/gzip/deflate from Accept-Encoding and, for
+streamed responses, sync-flushes the compressor after every body chunk so each
+SSE event reaches the client as soon as it is produced
+"""
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Optional; br is simply not offered without it
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("MOCK_COMPRESSION", "1") == "1"
+COMPRESSION_LEVEL = int(os.getenv("MOCK_COMPRESSION_LEVEL", "6"))  # zlib level (1-9); brotli quality is derived
+MINIMUM_SIZE = 500                                                 # Smaller one-shot bodies are sent as-is
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+# Server preference when the client accepts several equally
+SUPPORTED = ("br", "gzip", "deflate") if brotli is not None else ("gzip", "deflate")
+
+
+class Encoder:
+    """Incremental compressor; compress(flush=True) returns bytes the client can decode immediately."""
+
+    def __init__(self, encoding: str, level: int = COMPRESSION_LEVEL):
+        self.encoding = encoding
+        if encoding == "br":
+            # Brotli qualities run 0-11; map zlib's 1-9 onto the cheaper half, which suits streaming
+            self._brotli = brotli.Compressor(quality=max(0, min(11, level - 1)), mode=brotli.MODE_TEXT)
+            self._zlib = None
+        else:
+            wbits = 16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, wbits)
+            self._brotli = None
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        if self._zlib is not None:
+            out = self._zlib.compress(data)
+            return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+        out = self._brotli.process(data)
+        return out + self._brotli.flush() if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._zlib is not None:
+            return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+        return self._brotli.process(data) + self._brotli.finish()
+
+
+def choose_encoding(accept_encoding: str, supported: Iterable[str] = SUPPORTED) -> Optional[str]:
+    """Best supported coding allowed by an Accept-Encoding header (q-values honoured), or None."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compresses compressible responses when the client asks for it.
+
+    Streamed bodies (more_body=True) are compressed chunk by chunk with a
+    sync flush after each, so an SSE frame is never held back waiting for
+    the compressor's window to fill. One-shot bodies under `minimum_size`
+    are left alone.
+    """
+
+    def __init__(self, app, level: int = COMPRESSION_LEVEL, minimum_size: int = MINIMUM_SIZE,
+                 supported: Iterable[str] = SUPPORTED):
+        self.app = app
+        self.level = level
+        self.minimum_size = minimum_size
+        self.supported = tuple(supported)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept, self.supported) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        encoder: Optional[Encoder] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers: List[Tuple[bytes, bytes]] = message.get("headers", [])
+                content_type = b""
+                for name, value in headers:
+                    if name == b"content-encoding":
+                        passthrough = True
+                    elif name == b"content-type":
+                        content_type = value
+                if not content_type.decode("latin-1").lower().startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message  # Held until the first body chunk shows whether it is worth it
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers = [(n, v) for n, v in start.get("headers", []) if n != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                await send(dict(start, headers=headers))
+                start = None
+                encoder = Encoder(encoding, self.level)
+
+            if more_body and not body:
+                return  # A sync flush with nothing new would only add an empty block
+            data = encoder.compress(body) if more_body else encoder.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,203 @@
+"""
+Fault injection for the mock API
+Per-route probabilities of 5xx responses, 401s on valid sessions, slow headers,
+stalled streams and mid-stream disconnects, drawn from one seedable RNG so a
+load test can be replayed fault for fault.
+
+Configure at startup with MOCK_FAULTS (JSON, route path -> rule, "*" for any
+other route) and MOCK_FAULT_SEED, or at runtime through /admin/faults:
+
+    MOCK_FAULTS='{"/stream": {"disconnect": 0.1, "stall": 0.05}, "*": {"error": 0.01}}'
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Optional
+
+from mock_metrics import REGISTRY
+
+FAULTS = os.getenv("MOCK_FAULTS", "")                                   # JSON rules; unset injects nothing
+FAULT_SEED = os.getenv("MOCK_FAULT_SEED")                               # Seed for reproducible fault sequences
+ADMIN_PREFIX = "/admin/"                                                # Never faulted, so faults can be switched off
+
+FAULTS_INJECTED = REGISTRY.counter("mock_faults_injected_total", "Faults injected by kind.", ("fault",))
+PROBABILITIES = ("error", "unauthorized", "slow_headers", "stall", "disconnect")
+
+
+@dataclass(frozen=True)
+class FaultRule:
+    """Fault probabilities (0-1) for one route, with the shape of each fault."""
+    error: float = 0.0              # Answer with `error_status` instead of running the handler
+    error_status: int = 503
+    unauthorized: float = 0.0       # Answer 401 although the request carries a session cookie
+    slow_headers: float = 0.0       # Hold the response headers back for `header_delay`
+    header_delay: float = 5.0
+    stall: float = 0.0              # Pause the body for `stall_seconds` partway through
+    stall_seconds: float = 30.0
+    disconnect: float = 0.0         # Drop the connection partway through the body
+    max_frames: int = 20            # Stalls/disconnects happen after 1..max_frames body chunks
+
+    def __post_init__(self):
+        for name in PROBABILITIES:
+            if not 0.0 <= getattr(self, name) <= 1.0:
+                raise ValueError(f"Fault probability '{name}' must be between 0 and 1")
+        if not 500 <= self.error_status <= 599:
+            raise ValueError("error_status must be a 5xx status")
+        if self.max_frames < 1:
+            raise ValueError("max_frames must be at least 1")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FaultRule":
+        unknown = set(data) - {f.name for f in fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown fault settings: {sorted(unknown)}")
+        return cls(**data)
+
+
+@dataclass(frozen=True)
+class FaultPlan:
+    """What happens to one request; chunk positions are 1-based, 0 = never."""
+    status: int = 0
+    header_delay: float = 0.0
+    stall_at: int = 0
+    stall_seconds: float = 0.0
+    disconnect_at: int = 0
+
+
+def parse_rules(config: Dict[str, Any]) -> Dict[str, FaultRule]:
+    """{route path or "*": {setting: value}} -> rules; raises ValueError on bad input."""
+    if not isinstance(config, dict):
+        raise ValueError("Fault rules must be an object keyed by route path")
+    rules = {}
+    for route, settings in config.items():
+        if not isinstance(settings, dict):
+            raise ValueError(f"Rule for '{route}' must be an object")
+        try:
+            rules[route] = FaultRule.from_dict(settings)
+        except TypeError as e:
+            raise ValueError(f"Rule for '{route}': {e}")
+    return rules
+
+
+class FaultInjector:
+    """
+    Decides per request which faults to inject.
+
+    Every request on a faulted route consumes the same number of random
+    draws whatever the outcome, so with a fixed seed and request order the
+    fault sequence is identical between runs.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, FaultRule]] = None, seed: Optional[int] = None):
+        self._lock = threading.Lock()
+        self.configure(rules or {}, seed)
+
+    def configure(self, rules: Dict[str, FaultRule], seed: Optional[int] = None) -> None:
+        """Replace the rules and restart the RNG from `seed`."""
+        with self._lock:
+            self.rules = dict(rules)
+            self.seed = seed
+            self._rng = random.Random(seed)
+
+    def plan(self, path: str, has_session: bool) -> Optional[FaultPlan]:
+        """The faults for one request to `path`, or None when it runs normally."""
+        rule = self.rules.get(path) or self.rules.get("*")
+        if rule is None or path.startswith(ADMIN_PREFIX):
+            return None
+        with self._lock:
+            rng = self._rng
+            error, unauthorized, slow, stall, disconnect = (rng.random() for _ in range(5))
+            stall_at = rng.randint(1, rule.max_frames)
+            disconnect_at = rng.randint(1, rule.max_frames)
+
+        if error < rule.error:
+            FAULTS_INJECTED.inc(1, ("error",))
+            return FaultPlan(status=rule.error_status)
+        if has_session and unauthorized < rule.unauthorized:
+            FAULTS_INJECTED.inc(1, ("unauthorized",))
+            return FaultPlan(status=401)
+        plan = FaultPlan(
+            header_delay=rule.header_delay if slow < rule.slow_headers else 0.0,
+            stall_at=stall_at if stall < rule.stall else 0,
+            stall_seconds=rule.stall_seconds,
+            disconnect_at=disconnect_at if disconnect < rule.disconnect else 0,
+        )
+        if not (plan.header_delay or plan.stall_at or plan.disconnect_at):
+            return None
+        return plan
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "seed": self.seed,
+            "routes": {route: asdict(rule) for route, rule in self.rules.items()},
+            "injected": {kind: int(FAULTS_INJECTED.value((kind,))) for kind in PROBABILITIES},
+        }
+
+
+def make_injector(config: str = FAULTS, seed: Optional[str] = FAULT_SEED) -> FaultInjector:
+    """The injector described by MOCK_FAULTS / MOCK_FAULT_SEED (empty when unset)."""
+    rules = parse_rules(json.loads(config)) if config else {}
+    return FaultInjector(rules, int(seed) if seed else None)
+
+
+class _Disconnect(Exception):
+    """Raised out of send() to unwind the app when a disconnect is injected."""
+
+
+class FaultMiddleware:
+    """
+    Applies the injector's plan to each request.
+
+    Errors and 401s are answered without running the handler. A disconnect
+    stops forwarding the body and returns without completing the response,
+    which makes the server drop the connection mid-body (uvicorn logs it
+    once) and lets the stream generator run its cleanup.
+    """
+
+    def __init__(self, app, injector: FaultInjector):
+        self.app = app
+        self.injector = injector
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.injector.rules:
+            await self.app(scope, receive, send)
+            return
+        has_session = any(name == b"cookie" and b"codesess=" in value for name, value in scope["headers"])
+        plan = self.injector.plan(scope["path"], has_session)
+        if plan is None:
+            await self.app(scope, receive, send)
+            return
+        if plan.status:
+            detail = "Session expired or invalid" if plan.status == 401 else "Injected fault"
+            body = json.dumps({"detail": detail}).encode()
+            await send({"type": "http.response.start", "status": plan.status,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        chunks = 0
+
+        async def send_wrapper(message):
+            nonlocal chunks
+            if message["type"] == "http.response.start":
+                if plan.header_delay:
+                    FAULTS_INJECTED.inc(1, ("slow_headers",))
+                    await asyncio.sleep(plan.header_delay)
+            elif message["type"] == "http.response.body" and message.get("body"):
+                chunks += 1
+                if chunks == plan.disconnect_at:
+                    FAULTS_INJECTED.inc(1, ("disconnect",))
+                    raise _Disconnect()
+                if chunks == plan.stall_at:
+                    FAULTS_INJECTED.inc(1, ("stall",))
+                    await asyncio.sleep(plan.stall_seconds)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except _Disconnect:
+            pass
@@ -0,0 +1,188 @@
+"""
+Pre-encoded SSE frames for the mock /stream endpoint
+Static frames are built once at import; only query-derived fragments are escaped per request
+"""
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+TOKEN_SIZE = 6       # Characters per streamed response token
+MAX_CITATIONS = 20   # Upper bound on topNDocuments
+
+# Default /stream coalescing; both 0 = one event per token
+COALESCE_WINDOW_MS = float(os.getenv("MOCK_COALESCE_WINDOW_MS", "0"))  # Merge tokens produced within this window
+COALESCE_BYTES = int(os.getenv("MOCK_COALESCE_BYTES", "0"))            # Emit once a merged event reaches this size
+
+# Simulated LLM answer; the query is prepended ("<query>. ") and appended around it
+LOREM = (
+    "\n"
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore "
+    "magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo "
+    "consequat. Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla "
+    "pariatur. Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id "
+    "est laborum."
+    "\n"
+)
+
+# Byte framing shared by every frame, matching json.dumps' default separators
+_RESPONSE_PREFIX = b'data: {"type": "response", "data": '
+_METADATA_PREFIX = b'data: {"type": "metadata", "data": {"query": '
+_METADATA_MIDDLE = b', "citations_requested": '
+_FRAME_END = b"}\n\n"
+_METADATA_END = b"}}\n\n"
+_STRING_END = b'"' + _FRAME_END
+
+Frame = Union[bytes, memoryview]
+
+
+def encode_frame(payload: Dict) -> bytes:
+    """Encode an arbitrary event as one SSE frame."""
+    return f"data: {json.dumps(payload)}\n\n".encode()
+
+
+def tag_frame(frame: Frame, members: bytes) -> bytes:
+    """
+    Splice leading JSON members (e.g. b'"index": 0') into an event frame
+    without re-parsing it. Frames that are not one JSON object (e.g. a
+    replayed non-JSON event) are wrapped as {"type": "raw", "data": <text>}.
+    """
+    frame = bytes(frame)
+    if not (frame.startswith(b"data: {") and frame.endswith(_FRAME_END)):
+        frame = encode_frame({"type": "raw", "data": frame.decode(errors="replace")})
+    return b"data: {" + members + b", " + frame[7:]
+
+
+def citation_text(index: int) -> str:
+    """Synthetic citation body for 1-based `index`."""
+    return f"Citation {index}: " + str(index) * index
+
+
+class FrameCache:
+    """
+    Byte frames for the static parts of every stream.
+
+    The lorem body is split into tokens relative to the end of the query
+    prefix, so its token boundaries depend only on len(prefix) % TOKEN_SIZE;
+    one pre-encoded copy is kept for each of the TOKEN_SIZE alignments.
+    """
+
+    def __init__(self, body: str = LOREM, max_citations: int = MAX_CITATIONS):
+        self.body = body
+        self.max_citations = max_citations
+        # alignment -> (body frames, leftover body text that joins the query suffix)
+        self._bodies: List[Tuple[Tuple[bytes, ...], str]] = []
+        for offset in range(TOKEN_SIZE):
+            lead = (TOKEN_SIZE - offset) % TOKEN_SIZE
+            middle = body[lead:]
+            whole = len(middle) - len(middle) % TOKEN_SIZE
+            frames = tuple(self.response_frame(middle[i:i + TOKEN_SIZE]) for i in range(0, whole, TOKEN_SIZE))
+            self._bodies.append((frames, middle[whole:]))
+
+        citations = [encode_frame({"type": "citation", "data": citation_text(i + 1)})
+                     for i in range(max_citations)]
+        self._citations = tuple(tuple(citations[:n]) for n in range(max_citations + 1))
+
+    @staticmethod
+    def response_frame(token: str) -> bytes:
+        """Frame a single response token; the only per-token work is string escaping."""
+        return _RESPONSE_PREFIX + json.dumps(token).encode() + _FRAME_END
+
+    def metadata_frame(self, search_query: str, topNDocuments: int) -> bytes:
+        """Frame the metadata event that opens every stream."""
+        return (_METADATA_PREFIX + json.dumps(search_query).encode()
+                + _METADATA_MIDDLE + str(topNDocuments).encode() + _METADATA_END)
+
+    def response_frames(self, search_query: str) -> Iterator[bytes]:
+        """Yield the response frames for `<query>. <body><query>` in TOKEN_SIZE chunks."""
+        head = search_query + ". "
+        offset = len(head) % TOKEN_SIZE
+        whole = len(head) - offset
+        for i in range(0, whole, TOKEN_SIZE):
+            yield self.response_frame(head[i:i + TOKEN_SIZE])
+
+        body_frames, leftover = self._bodies[offset]
+        if offset:
+            yield self.response_frame(head[whole:] + self.body[:TOKEN_SIZE - offset])
+        yield from body_frames
+
+        tail = leftover + search_query
+        for i in range(0, len(tail), TOKEN_SIZE):
+            yield self.response_frame(tail[i:i + TOKEN_SIZE])
+
+    def citation_frames(self, topNDocuments: int) -> Tuple[bytes, ...]:
+        """The first `topNDocuments` citation frames (clamped to 0..max_citations)."""
+        return self._citations[max(0, min(topNDocuments, self.max_citations))]
+
+
+# Built once at import so request handlers only ever read from it
+FRAME_CACHE = FrameCache()
+
+
+def is_response_frame(frame: Frame) -> bool:
+    """True for a single-token response frame in FrameCache.response_frame's exact byte layout."""
+    return (frame[:len(_RESPONSE_PREFIX) + 1] == _RESPONSE_PREFIX + b'"'
+            and frame[-len(_STRING_END):] == _STRING_END)
+
+
+def merge_response_frames(frames: List[Frame]) -> bytes:
+    """
+    Join response frames into one event carrying the concatenated text.
+
+    JSON string escapes never span tokens, so the escaped bodies can be
+    spliced together without decoding them.
+    """
+    if len(frames) == 1:
+        return bytes(frames[0])
+    start, end = len(_RESPONSE_PREFIX) + 1, -len(_STRING_END)
+    return _RESPONSE_PREFIX + b'"' + b"".join(frame[start:end] for frame in frames) + _STRING_END
+
+
+class Coalescer:
+    """
+    Batches consecutive response frames of one stream into fewer, larger events.
+
+    A batch is emitted when it reaches `max_bytes`, when the next token would
+    arrive after `window` seconds from the batch's first token (known from the
+    pacing delay, so nothing waits on a timer), or when any other frame
+    (metadata, citation) comes along. A zero window or budget disables that
+    limit; with both zero every frame passes straight through.
+    """
+
+    def __init__(self, window: float = COALESCE_WINDOW_MS / 1000.0, max_bytes: int = COALESCE_BYTES):
+        self.window = window
+        self.max_bytes = max_bytes
+        self.tokens = 0     # Response frames taken in
+        self.events = 0     # Response events emitted for them
+        self._pending: List[Frame] = []
+        self._size = 0
+        self._deadline = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 or self.max_bytes > 0
+
+    def push(self, frame: Frame, delay: float, now: Optional[float] = None) -> List[Frame]:
+        """Take the next frame and the pause before the one after; return frames ready to send."""
+        if not is_response_frame(frame):
+            return self.flush() + [frame]
+        now = time.perf_counter() if now is None else now
+        if not self._pending:
+            self._deadline = now + self.window
+        self._pending.append(frame)
+        self._size += len(frame)
+        self.tokens += 1
+        if ((self.max_bytes and self._size >= self.max_bytes)
+                or (self.window and now + delay >= self._deadline)):
+            return self.flush()
+        return []
+
+    def flush(self) -> List[Frame]:
+        """Emit whatever is pending as one event."""
+        if not self._pending:
+            return []
+        merged = merge_response_frames(self._pending)
+        self._pending = []
+        self._size = 0
+        self.events += 1
+        return [merged]
@@ -0,0 +1,104 @@
+"""
+Latency profiles for the mock /stream endpoint
+Named, seedable delay models so load tests see production-like pacing
+"""
+import math
+import os
+import random
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Delay model for one stream (all times in seconds)."""
+    name: str
+    time_to_first_token: float      # Pause between the metadata frame and the first token
+    token_delay: float              # Mean pause between tokens
+    token_distribution: str = "constant"
+    burst_size: int = 0             # Tokens per burst; 0 disables bursting
+    burst_pause: float = 0.0        # Extra pause after each burst
+    citation_delay: float = 0.1     # Pause after each citation
+    jitter: float = 0.0             # +/- fraction applied to every delay
+
+    def __post_init__(self):
+        if self.token_distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{self.token_distribution}', expected one of {DISTRIBUTIONS}")
+
+
+PROFILES: Dict[str, LatencyProfile] = {
+    # Historic behaviour: a flat 0.1s after every frame
+    "legacy": LatencyProfile("legacy", time_to_first_token=0.1, token_delay=0.1, citation_delay=0.1),
+    # No delays at all, for functional tests and CPU-bound benchmarks
+    "instant": LatencyProfile("instant", time_to_first_token=0.0, token_delay=0.0, citation_delay=0.0),
+    # Slow retrieval up front, then bursty generation like the production LLM
+    "production": LatencyProfile(
+        "production", time_to_first_token=1.8, token_delay=0.02, token_distribution="lognormal",
+        burst_size=8, burst_pause=0.12, citation_delay=0.01, jitter=0.25,
+    ),
+    # Overloaded upstream: long TTFT and sluggish, noisy tokens
+    "degraded": LatencyProfile(
+        "degraded", time_to_first_token=6.0, token_delay=0.15, token_distribution="exponential",
+        burst_size=4, burst_pause=0.5, citation_delay=0.2, jitter=0.5,
+    ),
+}
+
+DEFAULT_PROFILE = "legacy"
+
+
+class LatencySampler:
+    """Draws the delays for a single stream from a profile using its own RNG."""
+
+    def __init__(self, profile: LatencyProfile, seed: Optional[int] = None):
+        self.profile = profile
+        self.rng = random.Random(seed)
+
+    def _jitter(self, delay: float) -> float:
+        if self.profile.jitter and delay:
+            delay *= 1.0 + self.rng.uniform(-self.profile.jitter, self.profile.jitter)
+        return max(0.0, delay)
+
+    def first_token(self) -> float:
+        """Delay after the metadata frame (time-to-first-token)."""
+        return self._jitter(self.profile.time_to_first_token)
+
+    def token(self, index: int) -> float:
+        """Delay after the token at `index` (0-based)."""
+        profile = self.profile
+        mean = profile.token_delay
+        if mean <= 0:
+            delay = 0.0
+        elif profile.token_distribution == "uniform":
+            delay = self.rng.uniform(0.0, 2.0 * mean)
+        elif profile.token_distribution == "exponential":
+            delay = self.rng.expovariate(1.0 / mean)
+        elif profile.token_distribution == "lognormal":
+            sigma = 0.6
+            delay = self.rng.lognormvariate(math.log(mean) - sigma * sigma / 2.0, sigma)
+        else:
+            delay = mean
+        if profile.burst_size and (index + 1) % profile.burst_size == 0:
+            delay += profile.burst_pause
+        return self._jitter(delay)
+
+    def citation(self) -> float:
+        """Delay after each citation frame."""
+        return self._jitter(self.profile.citation_delay)
+
+
+def get_profile(name: Optional[str] = None) -> LatencyProfile:
+    """Look up a profile by name, falling back to MOCK_LATENCY_PROFILE and then 'legacy'."""
+    name = name or os.getenv("MOCK_LATENCY_PROFILE", DEFAULT_PROFILE)
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown latency profile '{name}', expected one of {sorted(PROFILES)}") from None
+
+
+def make_sampler(name: Optional[str] = None, seed: Optional[int] = None) -> LatencySampler:
+    """Build a sampler for one stream; the seed falls back to MOCK_LATENCY_SEED (unseeded if unset)."""
+    if seed is None and os.getenv("MOCK_LATENCY_SEED"):
+        seed = int(os.environ["MOCK_LATENCY_SEED"])
+    return LatencySampler(get_profile(name), seed)
@@ -0,0 +1,241 @@
+"""
+Prometheus-style metrics for the mock API
+A small dependency-free registry of counters, gauges and histograms rendered in
+the text exposition format, plus a pure ASGI middleware that times every route
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("MOCK_METRICS", "1") == "1"  # Time every request per route
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; wide enough for full /stream responses under the slow latency profiles
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+class Metric(ABC):
+    """Base class: a named family of samples keyed by label values."""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, Labels, Sequence[str], float]]:
+        """(sample name, label names, label values, value) for every series."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labelnames, labelvalues, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing value per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, labels: Labels = ()) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, self.labelnames, labels, value) for labels, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, labels: Labels = ()) -> None:
+        self.inc(-amount, labels)
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class CallbackMetric(Metric):
+    """Counter or gauge read from `func` at scrape time, for values another object already tracks."""
+
+    def __init__(self, name: str, documentation: str, kind: str, func: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self.func = func
+
+    def samples(self):
+        return [(self.name, (), (), self.func())]
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram per label set, with _sum and _count series."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        out = []
+        bucket_labels = self.labelnames + ("le",)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                out.append((self.name + "_bucket", bucket_labels, labels + (_format_value(bound),), cumulative))
+            out.append((self.name + "_sum", self.labelnames, labels, total))
+            out.append((self.name + "_count", self.labelnames, labels, count))
+        return out
+
+
+class Registry:
+    """Ordered collection of metrics rendered together for /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, kind: str, func: Callable[[], float]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, kind, func))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; with several uvicorn workers each one exposes its own
+REGISTRY = Registry()
+
+HTTP_LATENCY = REGISTRY.histogram(
+    "mock_http_request_duration_seconds",
+    "Time from request start to the last response byte, by route template.",
+    ("method", "route"),
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "mock_http_requests_total", "Completed HTTP requests by route template and status.", ("method", "route", "status")
+)
+STREAMS_ACTIVE = REGISTRY.gauge("mock_streams_active", "/stream generators currently running.")
+STREAMS = REGISTRY.counter("mock_streams_total", "Finished /stream generators by outcome.", ("outcome",))
+STREAM_FRAMES = REGISTRY.counter("mock_stream_frames_total", "SSE frames handed to the server by /stream.")
+# tokens / events is the coalescing factor achieved by streams that asked for it
+STREAM_COALESCED_TOKENS = REGISTRY.counter(
+    "mock_stream_coalesced_tokens_total", "Response tokens produced by coalescing /stream generators."
+)
+STREAM_COALESCED_EVENTS = REGISTRY.counter(
+    "mock_stream_coalesced_events_total", "Response events those tokens were merged into."
+)
+STREAM_FIRST_FRAME = REGISTRY.histogram(
+    "mock_stream_first_frame_seconds", "Time from the /stream handler to its first (metadata) frame."
+)
+STREAM_FIRST_TOKEN = REGISTRY.histogram(
+    "mock_stream_first_token_seconds", "Time from the /stream handler to its first response token frame."
+)
+
+
+class MetricsMiddleware:
+    """
+    Records HTTP_LATENCY and HTTP_REQUESTS for every HTTP request.
+
+    Requests are labelled with the matched route's path template (e.g.
+    "/stream"), never the raw URL, so label cardinality stays bounded;
+    anything that matched no route is counted as "unmatched".
+    """
+
+    def __init__(self, app, latency: Histogram = HTTP_LATENCY, requests: Counter = HTTP_REQUESTS):
+        self.app = app
+        self.latency = latency
+        self.requests = requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 0
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.latency.observe(time.perf_counter() - started, (scope["method"], route))
+            self.requests.inc(1, (scope["method"], route, str(status or 500)))
@@ -0,0 +1,173 @@
+"""
+Multiplexed /stream queries over one WebSocket
+A connection to /stream/ws is authenticated once, from the codesess cookie on
+its handshake, and then carries any number of concurrent queries. Client
+messages are JSON text:
+
+    {"type": "query", "id": "q1", "search_query": "...", "topNDocuments": 5}
+    {"type": "cancel", "id": "q1"}
+
+Queries take the /stream parameters. Every /stream event comes back as one
+text message with the query id spliced in ({"id": "q1", "type": "response",
+"data": "..."}), and each query ends with {"id": "q1", "type": "done",
+"outcome": "completed" | "cancelled"} or, if it never started,
+{"id": "q1", "type": "error", "status": 429, "detail": "..."} (500 if it
+failed part way). Errors about a message whose id is not a string carry
+"id": null.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import os
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from fastapi import HTTPException, WebSocket
+from pydantic import BaseModel, Field, ValidationError
+
+from mock_frames import COALESCE_BYTES, COALESCE_WINDOW_MS, Frame, tag_frame as tag_sse_frame
+from mock_metrics import REGISTRY
+from mock_streams import CANCELLED, DISCONNECTED, StreamHandle
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERIES = int(os.getenv("MOCK_WS_MAX_QUERIES", "32"))     # Concurrent queries per connection
+SEND_QUEUE = 256                                              # Messages buffered per connection before queries wait
+
+WS_CONNECTIONS = REGISTRY.gauge("mock_ws_connections", "Open /stream/ws connections.")
+WS_QUERIES = REGISTRY.counter("mock_ws_queries_total", "Queries received on /stream/ws, by result.", ("result",))
+
+
+class QueryMessage(BaseModel):
+    """A {"type": "query"} message: an id plus the /stream parameters."""
+    id: str = Field(..., min_length=1, max_length=64)
+    search_query: str
+    topNDocuments: int = 5
+    latency_profile: Optional[str] = None
+    latency_seed: Optional[int] = None
+    coalesce_ms: float = Field(COALESCE_WINDOW_MS, ge=0)
+    coalesce_bytes: int = Field(COALESCE_BYTES, ge=0)
+
+
+def tag_frame(frame: Frame, tag: bytes) -> str:
+    """
+    b'data: {"type": ...}\\n\\n' -> '{"id": <tag>, "type": ...}', where `tag` is
+    the JSON-encoded query id (see mock_frames.tag_frame).
+    """
+    return tag_sse_frame(frame, b'"id": ' + tag)[6:-2].decode()
+
+
+# Runs one query: frames from plan to finish, raising HTTPException if it cannot start
+FrameSource = Callable[[QueryMessage, StreamHandle], AsyncIterator[bytes]]
+
+
+class QueryMux:
+    """
+    One WebSocket's queries. The reader dispatches client messages, each
+    query runs as its own task, and a single writer task sends their
+    messages in order of production through a bounded queue, so a slow
+    client holds the generators back instead of buffering without limit.
+    """
+
+    def __init__(self, websocket: WebSocket, session_id: str, frames: FrameSource, max_queries: int = MAX_QUERIES):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.frames = frames
+        self.max_queries = max_queries
+        self.queries: Dict[str, StreamHandle] = {}
+        self.outgoing: asyncio.Queue = asyncio.Queue(SEND_QUEUE)
+
+    async def serve(self) -> None:
+        """Run until the client disconnects; open queries are then cancelled."""
+        writer = asyncio.create_task(self._write())
+        WS_CONNECTIONS.inc()
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                await self._dispatch(message.get("text") or message.get("bytes") or "")
+        finally:
+            WS_CONNECTIONS.dec()
+            tasks = [handle._task for handle in self.queries.values()]
+            for handle in list(self.queries.values()):
+                handle.cancel(DISCONNECTED)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.cancel()
+            await asyncio.gather(writer, return_exceptions=True)
+
+    async def _error(self, query_id: Optional[str], status: int, detail) -> None:
+        WS_QUERIES.inc(1, (str(status),))
+        await self.outgoing.put(json.dumps({"id": query_id, "type": "error", "status": status, "detail": detail}))
+
+    async def _dispatch(self, raw) -> None:
+        try:
+            message = json.loads(raw)
+            kind, query_id = message.get("type"), message.get("id")
+        except (ValueError, AttributeError):
+            await self._error(None, 400, "Messages must be JSON objects")
+            return
+        if query_id is not None and not isinstance(query_id, str):
+            await self._error(None, 400, "Message ids must be strings")
+            return
+        if kind == "cancel":
+            handle = self.queries.get(query_id)
+            if handle is None:
+                await self._error(query_id, 404, "No open query with this id")
+                return
+            started = inspect.getcoroutinestate(handle._task.get_coro()) != inspect.CORO_CREATED
+            if handle.cancel(CANCELLED) and not started:
+                # Cancelled before its first step, _run never gets to report the outcome
+                await self._done(query_id, CANCELLED)
+        elif kind == "query":
+            try:
+                query = QueryMessage.model_validate(message)
+            except ValidationError as e:
+                await self._error(query_id, 422, json.loads(e.json(include_url=False, include_input=False)))
+                return
+            if query.id in self.queries:
+                await self._error(query.id, 409, "A query with this id is already open")
+            elif len(self.queries) >= self.max_queries:
+                await self._error(query.id, 429, f"At most {self.max_queries} concurrent queries per connection")
+            else:
+                handle = self.queries[query.id] = StreamHandle(query.id, self.session_id)
+                handle._task = asyncio.create_task(self._run(query, handle))
+                handle._task.add_done_callback(lambda _: self._forget(handle))
+        else:
+            await self._error(query_id, 400, "Unknown message type (expected 'query' or 'cancel')")
+
+    async def _run(self, query: QueryMessage, handle: StreamHandle) -> None:
+        tag = json.dumps(query.id).encode()
+        try:
+            async for frame in self.frames(query, handle):
+                await self.outgoing.put(tag_frame(frame, tag))
+            outcome = "completed"
+        except asyncio.CancelledError:
+            if handle.reason is None:
+                raise
+            outcome = handle.reason
+        except HTTPException as e:
+            await self._error(query.id, e.status_code, e.detail)
+            return
+        except Exception:
+            # Only this query fails; the connection and its other queries carry on
+            logger.exception(f"/stream/ws query {query.id!r} failed")
+            await self._error(query.id, 500, "The query failed while streaming")
+            return
+        finally:
+            self._forget(handle)
+        await self._done(query.id, outcome)
+
+    def _forget(self, handle: StreamHandle) -> None:
+        """Free the query's id; also run as the task's done callback, for a task cancelled before it started."""
+        if self.queries.get(handle.stream_id) is handle:
+            del self.queries[handle.stream_id]
+
+    async def _done(self, query_id: str, outcome: str) -> None:
+        WS_QUERIES.inc(1, (outcome,))
+        if outcome != DISCONNECTED:
+            await self.outgoing.put(json.dumps({"id": query_id, "type": "done", "outcome": outcome}))
+
+    async def _write(self) -> None:
+        while True:
+            await self.websocket.send_text(await self.outgoing.get())
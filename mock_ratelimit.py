@@ -0,0 +1,131 @@
+"""
+Per-session rate limiting for the mock API
+require_auth charges each authenticated call to a token bucket held for its
+session and route: a bucket of `burst` tokens refilled at `rate` per second,
+one token per call. A call that finds its bucket empty gets 429 with
+Retry-After and RateLimit-* headers. Budgets are set per route, as
+RATE[/BURST] (calls per second, bucket size; BURST defaults to one second's
+worth); 0 turns a route's limit off:
+
+    MOCK_RATE_LIMIT_STREAM=2/10 MOCK_RATE_LIMIT_RATING=50/100 uvicorn main:app
+"""
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from mock_metrics import REGISTRY
+
+RATE_LIMIT_STREAM = os.getenv("MOCK_RATE_LIMIT_STREAM", "0")   # /stream queries, however sent; 0 = unlimited
+RATE_LIMIT_RATING = os.getenv("MOCK_RATE_LIMIT_RATING", "0")   # /add_rating and /add_ratings; 0 = unlimited
+
+# Request path -> budget name, charged one token by require_auth; other paths are not limited there.
+# /stream/batch (one token per query, at most the burst per batch) and /stream/ws queries are charged to "stream" by main.py itself.
+ROUTES = {
+    "/stream": "stream",
+    "/add_rating": "rating",
+    "/add_ratings": "rating",
+}
+
+RATE_LIMITED = REGISTRY.counter("mock_rate_limited_total", "Calls refused with 429 by the per-session rate limit.",
+                                ("route",))
+
+
+def parse_budget(spec: str) -> Optional[Tuple[float, int]]:
+    """'RATE[/BURST]' -> (rate, burst), or None for an unlimited '0' or ''."""
+    rate_text, _, burst_text = spec.strip().partition("/")
+    rate = float(rate_text or 0)
+    if rate < 0:
+        raise ValueError(f"Rate limit '{spec}' must not be negative")
+    if rate == 0:
+        return None
+    burst = int(burst_text) if burst_text else max(1, math.ceil(rate))
+    if burst < 1:
+        raise ValueError(f"Rate limit '{spec}' needs a burst of at least 1")
+    return rate, burst
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RouteLimit:
+    """
+    One budget's token buckets, keyed by session ID and refilled lazily on
+    use, so an idle session costs nothing. Buckets that have refilled to
+    `burst` are indistinguishable from new ones and are dropped once the
+    table has doubled since the last prune.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.policy = f"{burst};w={math.ceil(burst / rate)}"
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+        self._prune_at = 1024
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, session_id: str, cost: int = 1, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        Charge `cost` tokens; returns (allowed, tokens left) with `now` in
+        monotonic seconds. A cost above the burst is never allowed.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(session_id)
+            if bucket is None:
+                if len(self._buckets) >= self._prune_at:
+                    self._prune(now)
+                bucket = self._buckets[session_id] = _Bucket(self.burst, now)
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+            if bucket.tokens < cost:
+                return False, bucket.tokens
+            bucket.tokens -= cost
+            return True, bucket.tokens
+
+    def _prune(self, now: float) -> None:
+        full = [session_id for session_id, bucket in self._buckets.items()
+                if bucket.tokens + (now - bucket.updated) * self.rate >= self.burst]
+        for session_id in full:
+            del self._buckets[session_id]
+        self._prune_at = max(1024, 2 * len(self._buckets))
+
+    def headers(self, tokens: float, cost: int = 1) -> Dict[str, str]:
+        """RateLimit-* headers for a bucket holding `tokens`, plus Retry-After when it cannot pay `cost`."""
+        headers = {
+            "RateLimit-Limit": str(self.burst),
+            "RateLimit-Remaining": str(int(tokens)),
+            "RateLimit-Reset": str(math.ceil((self.burst - tokens) / self.rate)),
+            "RateLimit-Policy": self.policy,
+        }
+        if tokens < cost:
+            headers["Retry-After"] = str(math.ceil((cost - tokens) / self.rate))
+        return headers
+
+
+class RateLimiter:
+    """Maps request paths to their RouteLimit; paths without a budget are free."""
+
+    def __init__(self, budgets: Dict[str, Optional[Tuple[float, int]]], routes: Dict[str, str] = ROUTES):
+        limits = {name: RouteLimit(name, *budget) for name, budget in budgets.items() if budget is not None}
+        self.limits = limits
+        self._by_path = {path: limits[name] for path, name in routes.items() if name in limits}
+
+    def for_path(self, path: str) -> Optional[RouteLimit]:
+        return self._by_path.get(path)
+
+
+def make_rate_limiter(stream: str = RATE_LIMIT_STREAM, rating: str = RATE_LIMIT_RATING) -> RateLimiter:
+    """Build the limiter from MOCK_RATE_LIMIT_STREAM / MOCK_RATE_LIMIT_RATING."""
+    return RateLimiter({"stream": parse_budget(stream), "rating": parse_budget(rating)})
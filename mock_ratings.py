@@ -0,0 +1,342 @@
+"""
+Durable rating storage for the mock API
+Write-behind buffer in front of an append-friendly SQLite WAL table: requests only
+touch memory, a flusher thread batches idempotent upserts to disk. Aggregates for
+/ratings/stats are maintained incrementally as ratings arrive
+"""
+import heapq
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RATINGS_DB = os.getenv("MOCK_RATINGS_DB", "mock_ratings.db")                        # SQLite file shared by all workers
+FLUSH_INTERVAL = float(os.getenv("MOCK_RATINGS_FLUSH_INTERVAL", "0.5"))             # Max seconds a rating waits in memory
+BATCH_SIZE = int(os.getenv("MOCK_RATINGS_BATCH", "1000"))                           # Pending ratings that trigger an early flush
+CHECKPOINT_INTERVAL = float(os.getenv("MOCK_RATINGS_FSYNC_INTERVAL", "5"))          # Seconds between WAL checkpoints (fsync)
+BULK_LIMIT = int(os.getenv("MOCK_RATINGS_BULK_LIMIT", "10000"))                     # Max items accepted by one /add_ratings call
+
+RatingKey = Tuple[str, str]  # (chat_id, search_query)
+
+QUANTILE_SCALE = 100  # Quantiles are exact to 0.01 of a rating point
+
+
+class RatingRecord(NamedTuple):
+    """One rating as persisted; (chat_id, search_query) identifies it."""
+    chat_id: str
+    search_query: str
+    rating: float
+    session_id: str
+    updated_at: float  # time.time() of the latest write
+
+
+class RatingAggregate:
+    """
+    Count, sum, 1-5 histogram and a quantile sketch for a set of ratings.
+
+    The sketch counts ratings rounded to 1/QUANTILE_SCALE. Ratings are
+    bounded to 1-5, so it never holds more than 401 keys and, unlike P² or
+    t-digest, a rating can be removed again when a retry replaces it.
+    """
+    __slots__ = ("count", "total", "histogram", "sketch")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.histogram = [0, 0, 0, 0, 0]  # Buckets [1,2) [2,3) [3,4) [4,5) [5]
+        self.sketch: Counter = Counter()
+
+    @staticmethod
+    def _bucket(rating: float) -> int:
+        return min(4, max(0, int(math.floor(rating)) - 1))
+
+    def add(self, rating: float) -> None:
+        self.count += 1
+        self.total += rating
+        self.histogram[self._bucket(rating)] += 1
+        self.sketch[int(round(rating * QUANTILE_SCALE))] += 1
+
+    def remove(self, rating: float) -> None:
+        self.count -= 1
+        self.total -= rating
+        self.histogram[self._bucket(rating)] -= 1
+        key = int(round(rating * QUANTILE_SCALE))
+        self.sketch[key] -= 1
+        if not self.sketch[key]:
+            del self.sketch[key]
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantiles(self, points: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, float]:
+        """Nearest-rank quantiles from the sketch (cost bounded by its 401 keys)."""
+        result = {}
+        if not self.count:
+            return {f"p{int(q * 100)}": 0.0 for q in points}
+        ordered = sorted(self.sketch.items())
+        for q in points:
+            rank = max(1, math.ceil(q * self.count))
+            seen = 0
+            for key, n in ordered:
+                seen += n
+                if seen >= rank:
+                    result[f"p{int(q * 100)}"] = key / QUANTILE_SCALE
+                    break
+        return result
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 4),
+            "histogram": {str(i + 1): n for i, n in enumerate(self.histogram)},
+            "quantiles": self.quantiles(),
+        }
+
+
+class RatingStats:
+    """
+    Global and per-query aggregates, updated in O(1) per rating.
+
+    `current` remembers each (chat_id, search_query)'s latest rating so a
+    replacement moves the aggregates instead of double counting. Snapshots
+    are cached until the next rating arrives, so a dashboard polling with
+    no new ratings costs nothing; ranking the top-k queries touches the
+    queries, never the individual ratings.
+    """
+
+    def __init__(self):
+        self.overall = RatingAggregate()
+        self.by_query: Dict[str, RatingAggregate] = {}
+        self.current: Dict[RatingKey, float] = {}
+        self.version = 0
+        self._cache: Dict[Tuple[int, int, int], Dict] = {}
+
+    def record(self, key: RatingKey, rating: float) -> None:
+        """Apply a new or replacing rating for `key` (caller holds the store lock)."""
+        aggregate = self.by_query.get(key[1])
+        if aggregate is None:
+            aggregate = self.by_query[key[1]] = RatingAggregate()
+        previous = self.current.get(key)
+        if previous is not None:
+            self.overall.remove(previous)
+            aggregate.remove(previous)
+        self.overall.add(rating)
+        aggregate.add(rating)
+        self.current[key] = rating
+        self.version += 1
+
+    def query_summary(self, search_query: str) -> Optional[Dict]:
+        aggregate = self.by_query.get(search_query)
+        return aggregate.summary() if aggregate else None
+
+    def snapshot(self, top_k: int = 5, min_count: int = 1) -> Dict:
+        """Global summary plus the top-k best and worst rated queries."""
+        cache_key = (self.version, top_k, min_count)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        eligible = [(q, a) for q, a in self.by_query.items() if a.count >= min_count]
+        best = heapq.nlargest(top_k, eligible, key=lambda item: (item[1].mean, item[1].count))
+        worst = heapq.nsmallest(top_k, eligible, key=lambda item: (item[1].mean, -item[1].count))
+        result = {
+            "global": self.overall.summary(),
+            "queries": len(self.by_query),
+            "top": [{"search_query": q, "count": a.count, "mean": round(a.mean, 4)} for q, a in best],
+            "bottom": [{"search_query": q, "count": a.count, "mean": round(a.mean, 4)} for q, a in worst],
+        }
+        self._cache = {cache_key: result}
+        return result
+
+
+class RatingStore:
+    """
+    Write-behind rating store.
+
+    add() records the rating in a pending dict keyed by (chat_id,
+    search_query), so a client retry before the next flush simply
+    overwrites its first attempt. The flusher thread swaps the dict out and
+    writes it with one executemany upsert per batch, which keeps retries
+    idempotent on disk too. Commits run with synchronous=NORMAL; the WAL is
+    fsynced by a checkpoint every `checkpoint_interval` seconds and on close.
+    """
+
+    def __init__(self, path: str = RATINGS_DB,
+                 flush_interval: float = FLUSH_INTERVAL,
+                 batch_size: int = BATCH_SIZE,
+                 checkpoint_interval: float = CHECKPOINT_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.checkpoint_interval = checkpoint_interval
+        self._pending: Dict[RatingKey, RatingRecord] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_lock = threading.Lock()
+        self.stats = RatingStats()
+        self.received = 0   # add() calls
+        self.flushed = 0    # Rows written by flushes
+        self.batches = 0    # Flushes that wrote at least one row
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ratings ("
+                " chat_id TEXT NOT NULL,"
+                " search_query TEXT NOT NULL,"
+                " rating REAL NOT NULL,"
+                " session_id TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (chat_id, search_query))"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, chat_id: str, search_query: str, rating: float, session_id: str = "") -> RatingRecord:
+        """Buffer a rating; never touches disk."""
+        record = RatingRecord(chat_id, search_query, rating, session_id, time.time())
+        with self._lock:
+            self._pending[(chat_id, search_query)] = record
+            self.stats.record((chat_id, search_query), rating)
+            self.received += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+        return record
+
+    def add_many(self, ratings: Iterable[Tuple[str, str, float]], session_id: str = "") -> int:
+        """Buffer a batch of (chat_id, search_query, rating) under a single lock acquisition."""
+        now = time.time()
+        added = 0
+        with self._lock:
+            for chat_id, search_query, rating in ratings:
+                self._pending[(chat_id, search_query)] = RatingRecord(chat_id, search_query, rating, session_id, now)
+                self.stats.record((chat_id, search_query), rating)
+                added += 1
+            self.received += added
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+        return added
+
+    def flush(self) -> int:
+        """Write every pending rating in one transaction; returns rows written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+        rows: List[RatingRecord] = list(batch.values())
+        try:
+            with self._conn_lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO ratings (chat_id, search_query, rating, session_id, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?)"
+                        " ON CONFLICT (chat_id, search_query) DO UPDATE SET"
+                        " rating = excluded.rating, session_id = excluded.session_id, updated_at = excluded.updated_at"
+                        " WHERE excluded.updated_at >= ratings.updated_at",
+                        rows,
+                    )
+        except sqlite3.Error:
+            # Put the batch back (newer ratings for the same key win) so nothing is lost
+            with self._lock:
+                for key, record in batch.items():
+                    self._pending.setdefault(key, record)
+            raise
+        self.flushed += len(rows)
+        self.batches += 1
+        return len(rows)
+
+    def checkpoint(self) -> None:
+        """fsync the WAL into the database file."""
+        with self._conn_lock:
+            self._connect().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def _run(self) -> None:
+        last_checkpoint = time.monotonic()
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                    self.checkpoint()
+                    last_checkpoint = time.monotonic()
+            except sqlite3.Error as e:
+                # Keep the flusher alive; the batch is retried on the next pass
+                logger.error(f"❌ Rating flush failed: {e}")
+
+    def load_stats(self) -> int:
+        """Seed the aggregates from ratings persisted by earlier runs; returns rows read."""
+        with self._conn_lock:
+            rows = self._connect().execute("SELECT chat_id, search_query, rating FROM ratings").fetchall()
+        with self._lock:
+            for chat_id, search_query, rating in rows:
+                if (chat_id, search_query) not in self._pending:
+                    self.stats.record((chat_id, search_query), rating)
+        return len(rows)
+
+    def snapshot(self, top_k: int = 5, min_count: int = 1, search_query: Optional[str] = None) -> Dict:
+        """Stats for /ratings/stats, optionally with one query's own summary."""
+        with self._lock:
+            result = self.stats.snapshot(top_k, min_count)
+            if search_query is not None:
+                result = dict(result, query=self.stats.query_summary(search_query))
+        return result
+
+    def start(self) -> None:
+        """Load existing aggregates and start the background flusher (idempotent)."""
+        if self._thread is None:
+            self.load_stats()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="rating-flusher", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Stop the flusher, write what is left and fsync."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self.checkpoint()
+        with self._conn_lock:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, chat_id: str, search_query: str) -> Optional[RatingRecord]:
+        """Read back one rating, pending or persisted."""
+        with self._lock:
+            record = self._pending.get((chat_id, search_query))
+        if record is not None:
+            return record
+        with self._conn_lock:
+            row = self._connect().execute(
+                "SELECT chat_id, search_query, rating, session_id, updated_at FROM ratings"
+                " WHERE chat_id = ? AND search_query = ?", (chat_id, search_query)
+            ).fetchone()
+        return RatingRecord(*row) if row else None
+
+    def count(self) -> int:
+        """Rows persisted so far (excludes pending ratings)."""
+        with self._conn_lock:
+            return self._connect().execute("SELECT COUNT(*) FROM ratings").fetchone()[0]
@@ -0,0 +1,246 @@
+"""
+Record-and-replay of /stream SSE transcripts
+Captured transcripts live in a fixtures directory, keyed by a normalized hash of
+(search_query, topNDocuments), and replay with their original frame timings.
+Large transcripts are memory-mapped instead of read into RAM.
+
+Capture a fixture from any SSE endpoint:
+
+    python -m mock_replay --url https://example.com/stream --query "How to ..." --top-n 5 \\
+        --header "Cookie: codesess=..." --dir fixtures/transcripts
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+REPLAY_DIR = os.getenv("MOCK_REPLAY_DIR", "")                                 # Fixtures directory; unset disables replay
+REPLAY_SPEED = float(os.getenv("MOCK_REPLAY_SPEED", "1.0"))                   # 2 = twice as fast, 0 = no delays
+REPLAY_FALLBACK = os.getenv("MOCK_REPLAY_FALLBACK", "synthetic")              # "synthetic" or "404" when no fixture matches
+MMAP_THRESHOLD = int(os.getenv("MOCK_REPLAY_MMAP_BYTES", str(1024 * 1024)))  # Files at least this big are memory-mapped
+MAX_OPEN = 256                                                                # Transcripts kept open at once
+
+MAGIC = b"MOCKSSE1 "
+SUFFIX = ".sse"
+
+
+def normalize_query(search_query: str) -> str:
+    """Case-fold and collapse whitespace so trivially different spellings share a fixture."""
+    return " ".join(search_query.casefold().split())
+
+
+def transcript_key(search_query: str, topNDocuments: int) -> str:
+    """Fixture file stem for a query: sha256 of the normalized query and topNDocuments."""
+    raw = f"{normalize_query(search_query)}\x00{topNDocuments}".encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def write_transcript(path: str, frames: Sequence[Tuple[float, bytes]], meta: Dict) -> None:
+    """
+    Atomically write a transcript file.
+
+    Layout: a "MOCKSSE1 <json meta>" line, then per frame a
+    "<seconds since previous frame> <byte length>" line followed by the
+    raw SSE frame bytes and a newline.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + json.dumps(dict(meta, frames=len(frames))).encode() + b"\n")
+            for gap, frame in frames:
+                f.write(f"{gap:.6f} {len(frame)}\n".encode())
+                f.write(frame)
+                f.write(b"\n")
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Transcript:
+    """
+    A captured stream: frame byte ranges plus the gap before each frame.
+
+    Small files are read into memory; files of at least `mmap_threshold`
+    bytes are memory-mapped and each frame is copied out of the mapping as
+    it is streamed, so only the pages actually streamed are paged in.
+    Frames are always bytes: older Starlette versions only pass bytes
+    chunks through StreamingResponse. Only the compact offset/gap index is
+    parsed up front; a malformed file raises ValueError.
+    """
+
+    def __init__(self, path: str, mmap_threshold: int = MMAP_THRESHOLD):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.mapped = size >= mmap_threshold and size > 0
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.mapped else f.read()
+        self._data = data
+        self._view = memoryview(data)
+
+        end = data.find(b"\n")
+        if data[:len(MAGIC)] != MAGIC or end < 0:
+            raise ValueError(f"{path} is not a mock SSE transcript")
+        self.meta = json.loads(data[len(MAGIC):end])
+        self._starts = array("Q")
+        self._ends = array("Q")
+        self._gaps = array("d")
+        pos = end + 1
+        while pos < size:
+            line_end = data.find(b"\n", pos)
+            try:
+                gap, length = data[pos:line_end if line_end >= 0 else size].split()
+                gap, length = float(gap), int(length)
+            except ValueError:
+                raise ValueError(f"{path}: bad record header at byte {pos}") from None
+            start = line_end + 1
+            if line_end < 0 or length < 0 or start + length >= size or data[start + length] != b"\n"[0]:
+                raise ValueError(f"{path}: frame length {length} at byte {pos} does not end on a record boundary")
+            self._gaps.append(gap)
+            self._starts.append(start)
+            self._ends.append(start + length)
+            pos = start + length + 1
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def frame(self, index: int) -> bytes:
+        return self._view[self._starts[index]:self._ends[index]].tobytes()
+
+    def frames(self, speed: float = REPLAY_SPEED) -> Iterator[Tuple[bytes, float]]:
+        """
+        Yield (frame, delay after it), the delay being the captured gap
+        before the next frame scaled by 1/speed. The first frame is sent
+        at once; the captured time to it included connection setup.
+        """
+        scale = 0.0 if speed <= 0 else 1.0 / speed
+        count = len(self._starts)
+        for index in range(count):
+            delay = self._gaps[index + 1] * scale if index + 1 < count else 0.0
+            yield self.frame(index), delay
+
+
+class TranscriptLibrary:
+    """Fixture directory lookup with a bounded LRU of open transcripts."""
+
+    def __init__(self, directory: str, mmap_threshold: int = MMAP_THRESHOLD, max_open: int = MAX_OPEN):
+        self.directory = directory
+        self.mmap_threshold = mmap_threshold
+        self.max_open = max_open
+        self._open: "OrderedDict[str, Transcript]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, search_query: str, topNDocuments: int) -> str:
+        return os.path.join(self.directory, transcript_key(search_query, topNDocuments) + SUFFIX)
+
+    def find(self, search_query: str, topNDocuments: int) -> Optional[Transcript]:
+        """The transcript captured for this query, or None. New fixtures are picked up without a restart."""
+        key = transcript_key(search_query, topNDocuments)
+        with self._lock:
+            transcript = self._open.get(key)
+            if transcript is not None:
+                self._open.move_to_end(key)
+                self.hits += 1
+                return transcript
+        path = os.path.join(self.directory, key + SUFFIX)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        transcript = Transcript(path, self.mmap_threshold)
+        with self._lock:
+            self._open[key] = transcript
+            while len(self._open) > self.max_open:
+                # Dropped, not closed: frames being streamed may still reference the mapping
+                self._open.popitem(last=False)
+            self.hits += 1
+        return transcript
+
+
+def make_library(directory: str = REPLAY_DIR) -> Optional[TranscriptLibrary]:
+    """The library named by MOCK_REPLAY_DIR, or None when replay is off."""
+    return TranscriptLibrary(directory) if directory else None
+
+
+# --- Capture ---
+async def capture(url: str, search_query: str, topNDocuments: int, directory: str,
+                  headers: Optional[Dict[str, str]] = None, extra_params: Optional[Dict[str, str]] = None,
+                  client=None) -> str:
+    """
+    Record one SSE response from `url` into `directory`; returns the fixture path.
+
+    Frames are split on blank lines as they arrive and timed on arrival, so
+    the transcript keeps the source's pacing. `client` may be an existing
+    httpx.AsyncClient (e.g. one wired to an in-process app).
+    """
+    import httpx
+
+    params = {"search_query": search_query, "topNDocuments": topNDocuments, **(extra_params or {})}
+    frames: List[Tuple[float, bytes]] = []
+    own_client = client is None
+    client = client or httpx.AsyncClient(timeout=httpx.Timeout(None))
+    try:
+        started = last = time.perf_counter()
+        buffer = b""
+        async with client.stream("GET", url, params=params, headers=headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                buffer += chunk.replace(b"\r\n", b"\n")
+                while True:
+                    end = buffer.find(b"\n\n")
+                    if end < 0:
+                        break
+                    now = time.perf_counter()
+                    frames.append((now - last, buffer[:end + 2]))
+                    last = now
+                    buffer = buffer[end + 2:]
+        if buffer.strip():
+            frames.append((time.perf_counter() - last, buffer + b"\n\n"))
+    finally:
+        if own_client:
+            await client.aclose()
+
+    path = os.path.join(directory, transcript_key(search_query, topNDocuments) + SUFFIX)
+    write_transcript(path, frames, {
+        "search_query": search_query,
+        "topNDocuments": topNDocuments,
+        "source": url,
+        "captured_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration": round(last - started, 6),
+    })
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Capture an SSE /stream response as a replay fixture")
+    parser.add_argument("--url", required=True, help="SSE endpoint, e.g. https://host/stream")
+    parser.add_argument("--query", required=True, help="search_query to request and index the fixture by")
+    parser.add_argument("--top-n", type=int, default=5, help="topNDocuments to request and index by")
+    parser.add_argument("--dir", default=REPLAY_DIR or "fixtures/transcripts", help="Fixtures directory")
+    parser.add_argument("--header", action="append", default=[], metavar="NAME: VALUE",
+                        help="Extra request header, e.g. a session cookie (repeatable)")
+    parser.add_argument("--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra query parameter (repeatable)")
+    args = parser.parse_args()
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    params = dict(p.split("=", 1) for p in args.param)
+    path = asyncio.run(capture(args.url, args.query, args.top_n, args.dir, headers, params))
+    transcript = Transcript(path)
+    print(f"Captured {len(transcript)} frames over {transcript.meta['duration']:.2f}s to {path}")
+
+
+if __name__ == "__main__":
+    main()
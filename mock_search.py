@@ -0,0 +1,283 @@
+"""
+BM25 document index behind /stream citations
+Built at startup from a directory of text documents (e.g. the repo's docs/),
+split into passages; topNDocuments then returns the best-scoring passages as
+real snippets instead of the synthetic "Citation N" strings.
+
+Postings live in flat typed arrays (uint32 passage ids, uint16 term
+frequencies), and the index can be saved to one file that is memory-mapped
+on later starts, so a large corpus costs no parse time and little RAM:
+
+    python -m mock_search --dir docs --index docs.bm25 --query "azure ad login"
+"""
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from mock_frames import encode_frame
+from mock_metrics import REGISTRY
+
+DOCS_DIR = os.getenv("MOCK_DOCS_DIR", "")           # Documents to index; unset keeps synthetic citations
+INDEX_PATH = os.getenv("MOCK_INDEX_PATH", "")       # Saved index (memory-mapped); rebuilt when the docs are newer
+EXTENSIONS = (".md", ".txt", ".rst")
+PASSAGE_WORDS = 120                                 # Passages are paragraphs grouped up to about this many words
+SNIPPET_CHARS = 320                                 # Citation snippet length
+K1 = 1.2
+B = 0.75
+
+MAGIC = b"MOCKBM25"
+_HEADER = struct.Struct("<8sQ")                     # Magic, JSON header length
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in into is it its of on or that the their then "
+    "there these this to was we were what when which will with you your".split()
+)
+
+SEARCH_LATENCY = REGISTRY.histogram("mock_search_seconds", "BM25 lookups for /stream citations.")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric runs, minus stopwords and single characters."""
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def split_passages(text: str, words: int = PASSAGE_WORDS) -> Iterator[str]:
+    """Blank-line separated paragraphs, merged until a passage has about `words` words."""
+    chunk: List[str] = []
+    count = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        chunk.append(paragraph)
+        count += len(paragraph.split())
+        if count >= words:
+            yield "\n\n".join(chunk)
+            chunk, count = [], 0
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+def snippet(text: str, limit: int = SNIPPET_CHARS) -> str:
+    """Whitespace-collapsed passage text, cut at a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit] + "…"
+
+
+class Hit(NamedTuple):
+    score: float
+    source: str
+    snippet: str
+
+
+class SearchIndex:
+    """
+    BM25 over passages.
+
+    terms maps a term to (start, df): its postings are doc_ids[start:start+df]
+    with matching tfs. Passage lengths are folded into `norms`
+    (k1 * (1 - b + b * len / avgdl)) once at build time, so scoring a
+    posting is one multiply-add. Passage text sits in one UTF-8 blob and is
+    decoded only for the hits returned.
+    """
+
+    def __init__(self, terms: Dict[str, Tuple[int, int]], doc_ids: Sequence[int], tfs: Sequence[int],
+                 norms: Sequence[float], sources: List[str], passage_source: Sequence[int],
+                 text_offsets: Sequence[int], text: bytes, mapped: bool = False):
+        self.terms = terms
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.norms = norms
+        self.sources = sources
+        self.passage_source = passage_source
+        self.text_offsets = text_offsets
+        self.text = text
+        self.mapped = mapped
+        self.n = len(norms)
+
+    def __len__(self) -> int:
+        return self.n
+
+    # --- Build ---
+    @classmethod
+    def build(cls, directory: str, extensions: Sequence[str] = EXTENSIONS) -> "SearchIndex":
+        """Index every matching file under `directory` (sources are paths relative to it)."""
+        sources: List[str] = []
+        passage_source = array("I")
+        text_offsets = array("Q", [0])
+        lengths: List[int] = []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        blob = bytearray()
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.lower().endswith(tuple(extensions)):
+                    continue
+                path = os.path.join(root, name)
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    content = f.read()
+                sources.append(os.path.relpath(path, directory).replace(os.sep, "/"))
+                for passage in split_passages(content):
+                    tokens = tokenize(passage)
+                    if not tokens:
+                        continue
+                    doc = len(lengths)
+                    for term, tf in Counter(tokens).items():
+                        postings.setdefault(term, []).append((doc, min(tf, 0xFFFF)))
+                    lengths.append(len(tokens))
+                    passage_source.append(len(sources) - 1)
+                    blob += passage.encode("utf-8")
+                    text_offsets.append(len(blob))
+
+        avgdl = sum(lengths) / len(lengths) if lengths else 1.0
+        norms = array("f", (K1 * (1.0 - B + B * length / avgdl) for length in lengths))
+        terms: Dict[str, Tuple[int, int]] = {}
+        doc_ids = array("I")
+        tfs = array("H")
+        for term in sorted(postings):
+            entries = postings[term]
+            terms[term] = (len(doc_ids), len(entries))
+            doc_ids.extend(doc for doc, _ in entries)
+            tfs.extend(tf for _, tf in entries)
+        return cls(terms, doc_ids, tfs, norms, sources, passage_source, text_offsets, bytes(blob))
+
+    # --- Persist ---
+    def save(self, path: str) -> None:
+        """Write the index atomically: magic, JSON header, then 8-byte aligned raw arrays."""
+        sections = [("doc_ids", self.doc_ids), ("tfs", self.tfs), ("norms", self.norms),
+                    ("passage_source", self.passage_source), ("text_offsets", self.text_offsets)]
+        layout = {}
+        offset = 0
+        for name, values in sections:
+            layout[name] = [offset, values.typecode, len(values)]
+            offset += -(-len(values) * values.itemsize // 8) * 8
+        layout["text"] = [offset, "B", len(self.text)]
+        header = json.dumps({"terms": self.terms, "sources": self.sources, "layout": layout}).encode()
+        header += b" " * (-(_HEADER.size + len(header)) % 8)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(MAGIC, len(header)) + header)
+                for name, values in sections:
+                    raw = values.tobytes() if isinstance(values, array) else bytes(values)
+                    f.write(raw + b"\0" * (-len(raw) % 8))
+                f.write(self.text)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "SearchIndex":
+        """Memory-map a saved index; arrays are zero-copy views into the mapping."""
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a mock BM25 index")
+        header = json.loads(data[_HEADER.size:_HEADER.size + header_size])
+        base = _HEADER.size + header_size
+        view = memoryview(data)
+
+        def section(name: str):
+            start, typecode, count = header["layout"][name]
+            size = count * array(typecode).itemsize
+            chunk = view[base + start:base + start + size]
+            return chunk if typecode == "B" else chunk.cast(typecode)
+
+        terms = {term: tuple(entry) for term, entry in header["terms"].items()}
+        return cls(terms, section("doc_ids"), section("tfs"), section("norms"), header["sources"],
+                   section("passage_source"), section("text_offsets"), section("text"), mapped=True)
+
+    # --- Query ---
+    def search(self, query: str, k: int) -> List[Hit]:
+        """The `k` best passages for `query` by BM25 (fewer if fewer match)."""
+        if k <= 0 or not self.n:
+            return []
+        started = time.perf_counter()
+        scores: Dict[int, float] = {}
+        get = scores.get
+        norms = self.norms
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            start, df = entry
+            idf = math.log(1.0 + (self.n - df + 0.5) / (df + 0.5))
+            weight = idf * (K1 + 1.0)
+            for doc, tf in zip(self.doc_ids[start:start + df], self.tfs[start:start + df]):
+                scores[doc] = get(doc, 0.0) + weight * tf / (tf + norms[doc])
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        hits = [Hit(round(score, 4), self.sources[self.passage_source[doc]], snippet(self.passage(doc)))
+                for doc, score in best]
+        SEARCH_LATENCY.observe(time.perf_counter() - started)
+        return hits
+
+    def passage(self, doc: int) -> str:
+        return bytes(self.text[self.text_offsets[doc]:self.text_offsets[doc + 1]]).decode("utf-8")
+
+    def citation_frames(self, search_query: str, topNDocuments: int) -> List[bytes]:
+        """SSE citation frames for the top hits, in the synthetic frames' "Citation N: ..." shape."""
+        return [encode_frame({"type": "citation", "data": f"Citation {rank}: {hit.snippet}",
+                              "source": hit.source, "score": hit.score})
+                for rank, hit in enumerate(self.search(search_query, topNDocuments), 1)]
+
+
+def _newest_mtime(directory: str) -> float:
+    newest = 0.0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(EXTENSIONS):
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+    return newest
+
+
+def make_index(directory: str = DOCS_DIR, path: str = INDEX_PATH) -> Optional[SearchIndex]:
+    """
+    The index for MOCK_DOCS_DIR, or None when it is unset. With
+    MOCK_INDEX_PATH the saved index is mapped if it is newer than every
+    document, and otherwise rebuilt, saved and mapped.
+    """
+    if not directory:
+        return None
+    if path:
+        if not os.path.exists(path) or os.path.getmtime(path) < _newest_mtime(directory):
+            SearchIndex.build(directory).save(path)
+        return SearchIndex.load(path)
+    return SearchIndex.build(directory)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or query the BM25 index behind /stream citations")
+    parser.add_argument("--dir", default=DOCS_DIR or "docs", help="Documents directory")
+    parser.add_argument("--index", default=INDEX_PATH, help="Index file to (re)build and map")
+    parser.add_argument("--query", help="Search and print the top hits")
+    parser.add_argument("--top-n", type=int, default=5, help="Hits to print")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = make_index(args.dir, args.index)
+    print(f"{len(index)} passages, {len(index.terms)} terms from {len(index.sources)} files "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms" + (f" (mapped from {args.index})" if index.mapped else ""))
+    if args.query:
+        for rank, hit in enumerate(index.search(args.query, args.top_n), 1):
+            print(f"{rank}. [{hit.score:.2f}] {hit.source}\n   {hit.snippet}")
+
+
+if __name__ == "__main__":
+    main()
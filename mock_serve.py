@@ -0,0 +1,169 @@
+"""
+Serve the mock API with tuned uvicorn settings
+Named server profiles bundle worker count, event loop, HTTP parser, socket
+backlog, keep-alive and shutdown drain; individual flags override them:
+
+    python -m mock_serve --profile throughput --port 8000
+    python -m mock_serve --profile streaming --workers 4 --drain-timeout 60
+
+The mock API is not part of the teamcenter-mcp-server distribution; run
+this from a checkout. APP is imported from this file's directory, not the
+current one, so another project's main.py is never served by mistake.
+
+On shutdown the server stops accepting connections and lets in-flight streams
+finish for up to --drain-timeout seconds; streams still running then end with
+a final {"type": "cancelled", "reason": "shutdown"} event.
+
+More than one worker needs sessions every worker can see: the multi-worker
+profiles use the SQLite session backend, and the per-worker "memory" backend
+(or "signed" without a shared MOCK_SESSION_SECRET) is refused.
+"""
+import argparse
+import importlib.util
+import os
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional
+
+APP = "main:app"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LOOPS = ("auto", "asyncio", "uvloop")
+HTTP_PARSERS = ("auto", "h11", "httptools")
+
+
+@dataclass(frozen=True)
+class ServeProfile:
+    """uvicorn settings for one way of running the mock API."""
+    name: str
+    workers: int = 1                # 0 = one per CPU
+    loop: str = "auto"              # "auto" picks uvloop when installed
+    http: str = "auto"              # "auto" picks httptools when installed
+    backlog: int = 2048             # listen() queue for connections not yet accepted
+    keep_alive: float = 5.0         # Seconds an idle keep-alive connection stays open
+    drain_timeout: Optional[float] = 30.0  # Seconds in-flight streams may run on after shutdown; None = no limit
+    access_log: bool = True         # uvicorn's own access log (the app's MOCK_ACCESS_LOG is separate)
+    env: Dict[str, str] = field(default_factory=dict)  # MOCK_* defaults for the app; the environment wins
+
+    def __post_init__(self):
+        if self.loop not in LOOPS:
+            raise ValueError(f"Unknown loop '{self.loop}', expected one of {LOOPS}")
+        if self.http not in HTTP_PARSERS:
+            raise ValueError(f"Unknown HTTP parser '{self.http}', expected one of {HTTP_PARSERS}")
+
+
+PROFILES: Dict[str, ServeProfile] = {
+    # Pure-Python asyncio loop and h11 parser with no shutdown drain, as the comparison baseline
+    # (a bare `uvicorn main:app` would pick uvloop/httptools when they are installed)
+    "compat": ServeProfile("compat", loop="asyncio", http="h11", drain_timeout=None),
+    # One worker with the fast loop/parser when they are installed
+    "default": ServeProfile("default"),
+    # Request/response load: a worker per core sharing sessions through SQLite, deep backlog,
+    # clients reuse connections
+    "throughput": ServeProfile(
+        "throughput", workers=0, backlog=4096, keep_alive=30.0, access_log=False,
+        env={"MOCK_ACCESS_LOG": "off", "MOCK_SESSION_BACKEND": "sqlite"},
+    ),
+    # Many long-lived SSE streams: also give streams time to finish on redeploys
+    "streaming": ServeProfile(
+        "streaming", workers=0, backlog=4096, keep_alive=75.0, drain_timeout=120.0, access_log=False,
+        env={"MOCK_ACCESS_LOG": "sampled", "MOCK_SESSION_BACKEND": "sqlite"},
+    ),
+}
+
+DEFAULT_PROFILE = "default"
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def resolve_loop(loop: str) -> str:
+    """The concrete event loop for a setting; raises ValueError if uvloop is asked for but missing."""
+    if loop == "auto":
+        return "uvloop" if _installed("uvloop") else "asyncio"
+    if loop == "uvloop" and not _installed("uvloop"):
+        raise ValueError("uvloop is not installed (pip install uvloop)")
+    return loop
+
+
+def resolve_http(http: str) -> str:
+    """The concrete HTTP parser for a setting; raises ValueError if httptools is asked for but missing."""
+    if http == "auto":
+        return "httptools" if _installed("httptools") else "h11"
+    if http == "httptools" and not _installed("httptools"):
+        raise ValueError("httptools is not installed (pip install httptools)")
+    return http
+
+
+def uvicorn_options(profile: ServeProfile) -> Dict:
+    """Keyword arguments for uvicorn.run() implementing `profile`."""
+    return {
+        "workers": profile.workers or os.cpu_count() or 1,
+        "loop": resolve_loop(profile.loop),
+        "http": resolve_http(profile.http),
+        "backlog": profile.backlog,
+        "timeout_keep_alive": profile.keep_alive,
+        # uvicorn cancels whatever is still running after this many seconds
+        "timeout_graceful_shutdown": profile.drain_timeout,
+        "access_log": profile.access_log,
+    }
+
+
+def check_session_backend(workers: int, env: Dict[str, str]) -> None:
+    """Raise ValueError if `workers` processes could not share the sessions configured in `env`."""
+    if workers <= 1:
+        return
+    backend = env.get("MOCK_SESSION_BACKEND", "memory")
+    if backend == "memory":
+        raise ValueError(f"{workers} workers cannot share the per-worker 'memory' session backend; "
+                         "set MOCK_SESSION_BACKEND=sqlite (or signed with MOCK_SESSION_SECRET)")
+    if backend == "signed" and not env.get("MOCK_SESSION_SECRET"):
+        raise ValueError(f"{workers} workers need a shared MOCK_SESSION_SECRET for signed sessions")
+
+
+def build_profile(name: str, workers: Optional[int] = None, loop: Optional[str] = None,
+                  http: Optional[str] = None, backlog: Optional[int] = None, keep_alive: Optional[float] = None,
+                  drain_timeout: Optional[float] = None, access_log: Optional[bool] = None) -> ServeProfile:
+    """A named profile with any explicitly given settings replaced."""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile '{name}', expected one of {tuple(PROFILES)}")
+    overrides = {key: value for key, value in {
+        "workers": workers, "loop": loop, "http": http, "backlog": backlog, "keep_alive": keep_alive,
+        "drain_timeout": drain_timeout, "access_log": access_log,
+    }.items() if value is not None}
+    return replace(PROFILES[name], **overrides)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the mock Teamcenter API")
+    parser.add_argument("--profile", default=os.getenv("MOCK_SERVE_PROFILE", DEFAULT_PROFILE),
+                        choices=sorted(PROFILES), help="Named server profile (default: %(default)s)")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8000, help="Bind port")
+    parser.add_argument("--workers", type=int, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--loop", choices=LOOPS, help="Event loop")
+    parser.add_argument("--http", choices=HTTP_PARSERS, help="HTTP parser")
+    parser.add_argument("--backlog", type=int, help="Socket listen backlog")
+    parser.add_argument("--keep-alive", type=float, help="Idle keep-alive timeout in seconds")
+    parser.add_argument("--drain-timeout", type=float, help="Seconds to let in-flight streams finish on shutdown")
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false", default=None,
+                        help="Disable uvicorn's access log")
+    parser.add_argument("--log-level", default="info", help="uvicorn log level")
+    args = parser.parse_args()
+
+    try:
+        profile = build_profile(args.profile, args.workers, args.loop, args.http, args.backlog,
+                                args.keep_alive, args.drain_timeout, args.access_log)
+        options = uvicorn_options(profile)
+        check_session_backend(options["workers"], {**profile.env, **os.environ})
+    except ValueError as e:
+        parser.error(str(e))
+    for key, value in profile.env.items():
+        os.environ.setdefault(key, value)  # Inherited by worker processes
+
+    import uvicorn
+    print(f"Serving {APP} with profile '{profile.name}': " + ", ".join(f"{k}={v}" for k, v in options.items()))
+    uvicorn.run(APP, app_dir=APP_DIR, host=args.host, port=args.port, log_level=args.log_level, **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,558 @@
+"""
+Session storage for the mock API
+Pluggable backends: a lock-striped in-memory store (per worker), a SQLite WAL
+store that every uvicorn worker on the host shares, and stateless HMAC-signed
+session cookies that need no storage at all, plus a background sweeper.
+Repeated logins with the same access token get the session already issued
+for it (see SessionBackend.login)
+"""
+import asyncio
+import base64
+import hashlib
+import heapq
+import hmac
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = float(os.getenv("MOCK_SESSION_TTL", "3300"))             # 55 minutes, matches Azure AD token lifetime
+MAX_SESSIONS = int(os.getenv("MOCK_SESSION_MAX", "100000"))            # LRU-evict beyond this many live sessions
+SWEEP_INTERVAL = float(os.getenv("MOCK_SESSION_SWEEP_INTERVAL", "30"))  # Seconds between background sweeps
+SWEEP_BATCH = 10000                                                     # Max expiries handled per lock hold
+SESSION_BACKEND = os.getenv("MOCK_SESSION_BACKEND", "memory")           # "memory", "sqlite" or "signed"
+SESSION_STRIPES = int(os.getenv("MOCK_SESSION_STRIPES", "16"))          # Lock stripes for the memory backend
+SESSION_DB = os.getenv("MOCK_SESSION_DB", "mock_sessions.db")           # SQLite file shared by all workers
+SESSION_SECRET = os.getenv("MOCK_SESSION_SECRET", "")                   # HMAC key for "signed"; random if unset
+SESSION_REUSE = os.getenv("MOCK_SESSION_REUSE", "1") != "0"             # Repeated logins reuse the token's session
+REFRESH_FRACTION = 0.5                                                  # Re-login extends a session past this much of its TTL
+
+
+def token_digest(access_token: str) -> bytes:
+    """SHA-256 of an access token, the key that finds its session on a repeated login."""
+    return hashlib.sha256(access_token.encode()).digest()
+
+
+class SessionInfo:
+    """A login session; timestamps are time.monotonic() seconds."""
+    __slots__ = ("session_id", "access_token", "expires_at", "created_at")
+
+    def __init__(self, session_id: str, access_token: str, expires_at: float, created_at: Optional[float] = None):
+        self.session_id = session_id
+        self.access_token = access_token
+        self.expires_at = expires_at
+        self.created_at = time.monotonic() if created_at is None else created_at
+
+    def __lt__(self, other: "SessionInfo") -> bool:
+        # Lets sessions sit directly in the expiry heap, ordered by expiry
+        return self.expires_at < other.expires_at
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return (time.monotonic() if now is None else now) >= self.expires_at
+
+    def expires_at_datetime(self) -> datetime:
+        """Wall-clock expiry, for API responses."""
+        return datetime.now() + timedelta(seconds=self.expires_at - time.monotonic())
+
+
+class SessionBackend(ABC):
+    """Interface behind create_session()/get_session(); implementations must be thread-safe."""
+
+    evictions = 0    # Sessions dropped by the size cap
+    expirations = 0  # Sessions dropped because they expired
+    reused = 0       # Logins answered with an existing session
+
+    @abstractmethod
+    def create(self, session_id: str, access_token: str) -> SessionInfo:
+        """Store and return a new session that expires after the backend's TTL."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionInfo]:
+        """Return the live session for `session_id`, or None if missing or expired."""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Remove a session; returns whether it existed."""
+
+    @abstractmethod
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop every expired session (`now` is monotonic); returns how many were removed."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of stored sessions (may include not-yet-swept expired ones)."""
+
+    def login(self, access_token: str, new_session_id: Callable[[], str]) -> SessionInfo:
+        """
+        Return the live session already issued for `access_token`, extended to
+        a full TTL once less than REFRESH_FRACTION of it remains, or create one
+        under `new_session_id()`. Backends without a token index always create.
+        """
+        return self.create(new_session_id(), access_token)
+
+
+class TokenIndex:
+    """
+    Access-token digest -> the SessionInfo issued for it, for the in-memory
+    backends' login(). Locks are striped by digest and held across lookup
+    and create, so concurrent logins with one token share a single session.
+
+    Each stripe is kept in login order and capped like the store's LRU, so
+    the index never holds more entries than the store holds sessions.
+    Deleted sessions are discarded right away; an entry whose session was
+    evicted is replaced by the token's next login or pushed out by newer
+    ones, and prune() drops expired entries from the least recently used
+    end. Store locks are only ever taken inside index locks, never the
+    reverse.
+    """
+
+    def __init__(self, stripes: int = SESSION_STRIPES, max_entries: Optional[int] = MAX_SESSIONS):
+        self._maps: List["OrderedDict[bytes, SessionInfo]"] = [OrderedDict() for _ in range(stripes)]
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._reused = [0] * stripes  # Per stripe, so each count is only updated under its own lock
+        self.per_stripe = None if max_entries is None else max(1, -(-max_entries // stripes))
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._maps)
+
+    @property
+    def reused(self) -> int:
+        return sum(self._reused)
+
+    def _stripe(self, key: bytes) -> int:
+        return key[0] % len(self._maps)
+
+    def login(self, store: "SessionStore", access_token: str, new_session_id: Callable[[], str]) -> SessionInfo:
+        key = token_digest(access_token)
+        stripe = self._stripe(key)
+        entries = self._maps[stripe]
+        with self._locks[stripe]:
+            session_info = entries.get(key)
+            if session_info is not None:
+                live = store.get(session_info.session_id)
+                if live is session_info:
+                    now = time.monotonic()
+                    self._reused[stripe] += 1
+                    entries.move_to_end(key)
+                    if session_info.expires_at - now >= store.ttl * REFRESH_FRACTION:
+                        return session_info
+                    # Replaced rather than extended in place: the old object is still in the expiry heap
+                    session_info = store.add(SessionInfo(session_info.session_id, access_token, now + store.ttl,
+                                                         session_info.created_at))
+                    entries[key] = session_info
+                    return session_info
+            session_info = entries[key] = store.create(new_session_id(), access_token)
+            entries.move_to_end(key)
+            if self.per_stripe is not None:
+                while len(entries) > self.per_stripe:
+                    entries.popitem(last=False)
+            return session_info
+
+    def discard(self, session_info: SessionInfo) -> None:
+        """Forget a deleted session, unless its token has since been given another one."""
+        key = token_digest(session_info.access_token)
+        stripe = self._stripe(key)
+        with self._locks[stripe]:
+            if self._maps[stripe].get(key) is session_info:
+                del self._maps[stripe][key]
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop expired entries from the least recently used end; returns how many were removed."""
+        now = time.monotonic() if now is None else now
+        removed = 0
+        for entries, lock in zip(self._maps, self._locks):
+            with lock:
+                while entries and next(iter(entries.values())).expires_at <= now:
+                    entries.popitem(last=False)
+                    removed += 1
+        return removed
+
+
+class SessionStore(SessionBackend):
+    """
+    Sessions keyed by ID in LRU order, plus a min-heap of the same
+    SessionInfo objects ordered by expiry.
+
+    Heap entries are never removed eagerly: an entry whose session was
+    evicted or replaced is skipped when it surfaces, and the heap is
+    rebuilt once stale entries outnumber live ones.
+    """
+
+    def __init__(self, max_sessions: Optional[int] = MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, SessionInfo]" = OrderedDict()
+        self._expiry: List[SessionInfo] = []
+        self._lock = threading.Lock()
+        self._tokens = TokenIndex(1, max_sessions)
+        self.evictions = 0   # Sessions dropped by the LRU cap
+        self.expirations = 0  # Sessions dropped because they expired
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def add(self, session_info: SessionInfo) -> SessionInfo:
+        with self._lock:
+            self._sessions[session_info.session_id] = session_info
+            self._sessions.move_to_end(session_info.session_id)
+            heapq.heappush(self._expiry, session_info)
+            if self.max_sessions is not None:
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            if len(self._expiry) > 2 * len(self._sessions) + 1024:
+                self._expiry = list(self._sessions.values())
+                heapq.heapify(self._expiry)
+        return session_info
+
+    def create(self, session_id: str, access_token: str) -> SessionInfo:
+        now = time.monotonic()
+        return self.add(SessionInfo(session_id, access_token, now + self.ttl, now))
+
+    def get(self, session_id: str) -> Optional[SessionInfo]:
+        """Return the live session for `session_id`, dropping it if it has expired."""
+        with self._lock:
+            session_info = self._sessions.get(session_id)
+            if session_info is None:
+                return None
+            if session_info.is_expired():
+                del self._sessions[session_id]
+                self.expirations += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            return session_info
+
+    @property
+    def reused(self) -> int:
+        return self._tokens.reused
+
+    def pop(self, session_id: str) -> Optional[SessionInfo]:
+        """Remove and return a session without touching the token index (see delete())."""
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def delete(self, session_id: str) -> bool:
+        session_info = self.pop(session_id)
+        if session_info is None:
+            return False
+        self._tokens.discard(session_info)
+        return True
+
+    def login(self, access_token: str, new_session_id: Callable[[], str]) -> SessionInfo:
+        return self._tokens.login(self, access_token, new_session_id)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop every expired session (and its token index entry); returns how many were removed."""
+        now = time.monotonic() if now is None else now
+        self._tokens.prune(now)
+        removed = 0
+        while True:
+            with self._lock:
+                batch = 0
+                while self._expiry and self._expiry[0].expires_at <= now and batch < SWEEP_BATCH:
+                    session_info = heapq.heappop(self._expiry)
+                    batch += 1
+                    if self._sessions.get(session_info.session_id) is session_info:
+                        del self._sessions[session_info.session_id]
+                        self.expirations += 1
+                        removed += 1
+                more = bool(self._expiry) and self._expiry[0].expires_at <= now
+            if not more:
+                return removed
+
+
+class StripedSessionStore(SessionBackend):
+    """
+    In-memory backend split into independently locked SessionStore stripes.
+
+    Session IDs are hashed to a stripe, so threadpool workers touching
+    different sessions rarely contend on the same lock. The LRU cap and
+    expiry index are kept per stripe; the token index used by login() is
+    striped separately, by token digest.
+    """
+
+    def __init__(self, stripes: int = SESSION_STRIPES, max_sessions: Optional[int] = MAX_SESSIONS,
+                 ttl: float = SESSION_TTL):
+        per_stripe = None if max_sessions is None else max(1, -(-max_sessions // stripes))
+        self.ttl = ttl
+        self._stripes = [SessionStore(per_stripe, ttl) for _ in range(stripes)]
+        self._tokens = TokenIndex(stripes, max_sessions)
+
+    def _stripe(self, session_id: str) -> SessionStore:
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    @property
+    def evictions(self) -> int:
+        return sum(stripe.evictions for stripe in self._stripes)
+
+    @property
+    def expirations(self) -> int:
+        return sum(stripe.expirations for stripe in self._stripes)
+
+    def __len__(self) -> int:
+        return sum(len(stripe) for stripe in self._stripes)
+
+    def add(self, session_info: SessionInfo) -> SessionInfo:
+        return self._stripe(session_info.session_id).add(session_info)
+
+    def create(self, session_id: str, access_token: str) -> SessionInfo:
+        return self._stripe(session_id).create(session_id, access_token)
+
+    def get(self, session_id: str) -> Optional[SessionInfo]:
+        return self._stripe(session_id).get(session_id)
+
+    @property
+    def reused(self) -> int:
+        return self._tokens.reused
+
+    def delete(self, session_id: str) -> bool:
+        session_info = self._stripe(session_id).pop(session_id)
+        if session_info is None:
+            return False
+        self._tokens.discard(session_info)
+        return True
+
+    def login(self, access_token: str, new_session_id: Callable[[], str]) -> SessionInfo:
+        return self._tokens.login(self, access_token, new_session_id)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        self._tokens.prune(now)
+        return sum(stripe.sweep(now) for stripe in self._stripes)
+
+
+class SQLiteSessionStore(SessionBackend):
+    """
+    Sessions in a local SQLite database in WAL mode, shared by every worker process.
+
+    Rows hold wall-clock (time.time()) expiries so they stay meaningful
+    across processes and restarts; they are converted to monotonic time on
+    read. The size cap evicts the sessions closest to expiry (the oldest
+    logins, since the TTL is fixed) rather than tracking per-read LRU order,
+    which would turn every lookup into a write. login() finds a token's
+    session through an indexed token_digest column; two workers racing on
+    a token's first login may each create one, and both stay valid.
+    """
+
+    def __init__(self, path: str = SESSION_DB, max_sessions: Optional[int] = MAX_SESSIONS,
+                 ttl: float = SESSION_TTL):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._local = threading.local()
+        self._inserts = 0
+        self._counter_lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+        self.reused = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " access_token TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " token_digest BLOB)"
+            )
+            # Databases created before token reuse lack the column
+            if "token_digest" not in [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]:
+                conn.execute("ALTER TABLE sessions ADD COLUMN token_digest BLOB")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_token_digest ON sessions (token_digest)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared across threads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_monotonic(wall: float) -> float:
+        return time.monotonic() + (wall - time.time())
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def create(self, session_id: str, access_token: str) -> SessionInfo:
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sessions (session_id, access_token, expires_at, created_at, token_digest)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (session_id, access_token, now + self.ttl, now, token_digest(access_token)),
+        )
+        if self.max_sessions is not None:
+            with self._counter_lock:
+                self._inserts += 1
+                check = self._inserts % 256 == 0
+            if check:
+                self._enforce_cap()
+        mono = time.monotonic()
+        return SessionInfo(session_id, access_token, mono + self.ttl, mono)
+
+    def _enforce_cap(self) -> None:
+        """Trim the table back to max_sessions, oldest expiry first (checked every 256 inserts)."""
+        cursor = self._connect().execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            " SELECT session_id FROM sessions ORDER BY expires_at"
+            " LIMIT max(0, (SELECT COUNT(*) FROM sessions) - ?))",
+            (self.max_sessions,),
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+    def get(self, session_id: str) -> Optional[SessionInfo]:
+        row = self._connect().execute(
+            "SELECT access_token, expires_at, created_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        access_token, expires_at, created_at = row
+        if expires_at <= time.time():
+            self.delete(session_id)
+            self.expirations += 1
+            return None
+        return SessionInfo(session_id, access_token, self._to_monotonic(expires_at), self._to_monotonic(created_at))
+
+    def delete(self, session_id: str) -> bool:
+        cursor = self._connect().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        return cursor.rowcount > 0
+
+    def login(self, access_token: str, new_session_id: Callable[[], str]) -> SessionInfo:
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT session_id, expires_at, created_at FROM sessions WHERE token_digest = ? AND expires_at > ?"
+            " ORDER BY expires_at DESC LIMIT 1",
+            (token_digest(access_token), now),
+        ).fetchone()
+        if row is None:
+            return self.create(new_session_id(), access_token)
+        session_id, expires_at, created_at = row
+        if expires_at - now < self.ttl * REFRESH_FRACTION:
+            expires_at = now + self.ttl
+            conn.execute("UPDATE sessions SET expires_at = ? WHERE session_id = ?", (expires_at, session_id))
+        with self._counter_lock:
+            self.reused += 1
+        return SessionInfo(session_id, access_token, self._to_monotonic(expires_at), self._to_monotonic(created_at))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        wall_now = time.time() if now is None else time.time() + (now - time.monotonic())
+        cursor = self._connect().execute("DELETE FROM sessions WHERE expires_at <= ?", (wall_now,))
+        removed = max(cursor.rowcount, 0)
+        self.expirations += removed
+        return removed
+
+
+class SessionSigner:
+    """
+    Issues and verifies self-contained session tokens
+    "<session_id>.<expires_at>.<mac>", where expires_at is whole wall-clock
+    seconds and mac is the unpadded urlsafe-base64 HMAC-SHA256 of the first
+    two fields. Every character is cookie-safe.
+    """
+
+    def __init__(self, secret: bytes):
+        if not secret:
+            raise ValueError("Session signing secret must not be empty")
+        # Keyed once; each sign/verify copies the prepared HMAC state
+        self._mac = hmac.new(secret, digestmod=hashlib.sha256)
+
+    def _digest(self, payload: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(payload)
+        return mac.digest()
+
+    def _encoded_mac(self, payload: str) -> bytes:
+        return base64.urlsafe_b64encode(self._digest(payload.encode())).rstrip(b"=")
+
+    def sign(self, session_id: str, expires_at: int) -> str:
+        payload = f"{session_id}.{expires_at}"
+        return f"{payload}.{self._encoded_mac(payload).decode()}"
+
+    def verify(self, token: str) -> Optional[Tuple[str, int]]:
+        """Return (session_id, expires_at) if the MAC matches, else None; expiry is not checked here."""
+        payload, _, mac = token.rpartition(".")
+        session_id, _, expires_at = payload.partition(".")
+        if not session_id or not expires_at.isdigit():
+            return None
+        # Comparing the encoded form keeps the check constant-time and rejects
+        # non-canonical base64 spellings of a valid MAC
+        if not hmac.compare_digest(mac.encode(), self._encoded_mac(payload)):
+            return None
+        return session_id, int(expires_at)
+
+
+class SignedSessionStore(SessionBackend):
+    """
+    Stateless backend: the session ID handed to the client is a signed token
+    carrying its own expiry, so get() is one HMAC check and no lookup.
+
+    Any worker or instance configured with the same MOCK_SESSION_SECRET
+    accepts the token. There is nothing to sweep, evict or count, the
+    access token is not carried (get() returns it empty), and delete()
+    cannot revoke a token before it expires. Repeated logins sign a fresh
+    token, which costs no storage.
+    """
+
+    def __init__(self, secret: Optional[str] = SESSION_SECRET or None, ttl: float = SESSION_TTL):
+        if secret is None:
+            logger.warning("MOCK_SESSION_SECRET is not set; signed sessions are only valid in this process")
+            secret = secrets.token_hex(32)
+        self.ttl = ttl
+        self.signer = SessionSigner(secret.encode())
+
+    def __len__(self) -> int:
+        return 0
+
+    def create(self, session_id: str, access_token: str) -> SessionInfo:
+        now = time.time()
+        expires_at = int(now + self.ttl)
+        mono = time.monotonic()
+        return SessionInfo(self.signer.sign(session_id, expires_at), access_token, mono + (expires_at - now), mono)
+
+    def get(self, session_id: str) -> Optional[SessionInfo]:
+        verified = self.signer.verify(session_id)
+        if verified is None:
+            return None
+        remaining = verified[1] - time.time()
+        if remaining <= 0:
+            self.expirations += 1
+            return None
+        mono = time.monotonic()
+        return SessionInfo(session_id, "", mono + remaining, mono + remaining - self.ttl)
+
+    def delete(self, session_id: str) -> bool:
+        return False
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        return 0
+
+
+def make_session_store(backend: str = SESSION_BACKEND) -> SessionBackend:
+    """Build the session backend named by MOCK_SESSION_BACKEND."""
+    if backend == "memory":
+        return StripedSessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "signed":
+        return SignedSessionStore()
+    raise ValueError(f"Unknown session backend '{backend}', expected 'memory', 'sqlite' or 'signed'")
+
+
+async def run_sweeper(store: SessionBackend, interval: float = SWEEP_INTERVAL) -> None:
+    """Periodically sweep expired sessions until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        removed = await asyncio.to_thread(store.sweep)
+        if removed:
+            logger.info(f"🧹 Swept {removed} expired sessions ({len(store)} live)")
@@ -0,0 +1,142 @@
+"""
+Cancellation for the mock /stream endpoint
+Open streams are registered per worker under an id so they can be aborted from
+another connection, and every stream watches its own connection so a client
+disconnect stops generation immediately instead of at the next failed write
+"""
+import asyncio
+import time
+import uuid
+from typing import Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+# Sent to the client as the last frame when a stream is cut short by the server
+CANCELLED_FRAME = b'data: {"type": "cancelled"}\n\n'
+SHUTDOWN_FRAME = b'data: {"type": "cancelled", "reason": "shutdown"}\n\n'
+
+DISCONNECTED = "disconnected"   # The client went away
+CANCELLED = "cancelled"         # Aborted through POST /stream/{id}/cancel
+SHUTDOWN = "shutdown"           # Still running when the server's graceful-shutdown drain ran out
+
+FINAL_FRAMES = {CANCELLED: CANCELLED_FRAME, SHUTDOWN: SHUTDOWN_FRAME}
+
+
+class StreamHandle:
+    """One open stream: its owner and, once set, why it was cut short."""
+    __slots__ = ("stream_id", "session_id", "started", "reason", "_task", "_registry")
+
+    def __init__(self, stream_id: str, session_id: str, registry: Optional["StreamRegistry"] = None):
+        self.stream_id = stream_id
+        self.session_id = session_id
+        self.started = time.monotonic()
+        self.reason: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._registry = registry
+
+    def cancel(self, reason: str) -> bool:
+        """Stop the stream's generator; False if it was already finished or cancelled."""
+        if self.reason is not None or self._task is None or self._task.done():
+            return False
+        self.reason = reason
+        self._task.cancel()
+        return True
+
+    def close(self) -> None:
+        """Drop the stream from its registry once the response is over."""
+        if self._registry is not None:
+            self._registry._close(self)
+            self._registry = None
+
+
+class StreamRegistry:
+    """Streams open on this worker, by id."""
+
+    def __init__(self):
+        self._streams: Dict[str, StreamHandle] = {}
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def open(self, session_id: str, stream_id: Optional[str] = None) -> StreamHandle:
+        """Register a stream; raises KeyError if `stream_id` is already open."""
+        stream_id = stream_id or uuid.uuid4().hex
+        if stream_id in self._streams:
+            raise KeyError(stream_id)
+        handle = self._streams[stream_id] = StreamHandle(stream_id, session_id, self)
+        return handle
+
+    def _close(self, handle: StreamHandle) -> None:
+        if self._streams.get(handle.stream_id) is handle:
+            del self._streams[handle.stream_id]
+
+    def get(self, stream_id: str) -> Optional[StreamHandle]:
+        return self._streams.get(stream_id)
+
+
+class CancellableStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body can be cancelled by a client disconnect or
+    through its StreamHandle.
+
+    Starlette only listens for disconnects on ASGI < 2.4 servers and
+    otherwise waits for a write to fail, which a server that drops writes to
+    closed sockets never reports. This response always runs its own
+    listener. A stream cancelled through the handle ends cleanly with
+    CANCELLED_FRAME; a disconnected one just stops. When the server itself
+    cancels the request (uvicorn does once --timeout-graceful-shutdown
+    expires) the stream is ended with SHUTDOWN_FRAME, so drained clients can
+    tell a shutdown from a network error.
+    """
+
+    def __init__(self, handle: Optional[StreamHandle], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handle = handle or StreamHandle("", "")
+
+    async def _listen_for_disconnect(self, receive) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await super().__call__(scope, receive, send)
+            return
+        handle = self.handle
+        body = asyncio.ensure_future(self.stream_response(send))
+        listener = asyncio.ensure_future(self._listen_for_disconnect(receive))
+        handle._task = body
+        try:
+            try:
+                await asyncio.wait((body, listener), return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                # The server gave up waiting for this stream: end it properly and return, since
+                # re-raising after a complete response would only make uvicorn log a traceback
+                handle.cancel(SHUTDOWN)
+                await asyncio.wait((body,))
+                await self._send_final(send)
+                return
+            if not body.done():
+                handle.cancel(DISCONNECTED)
+            try:
+                await body
+            except asyncio.CancelledError:
+                if handle.reason is None or not body.cancelled():
+                    raise  # Not ours: the server is cancelling this request
+                await self._send_final(send)
+        finally:
+            listener.cancel()
+            if not body.done():
+                body.cancel()
+            handle.close()
+        if self.background is not None:
+            await self.background()
+
+    async def _send_final(self, send) -> None:
+        frame = FINAL_FRAMES.get(self.handle.reason)
+        if frame is not None and self.handle._task is not None and self.handle._task.cancelled():
+            try:
+                await send({"type": "http.response.body", "body": frame, "more_body": False})
+            except OSError:
+                pass  # The connection is already gone
@@ -0,0 +1,95 @@
+"""
+Tests for the sampled, structured access-log middleware
+"""
+import io
+import json
+import logging
+import os
+import sys
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from mock_access_log import AccessLogMiddleware, JsonLineFormatter, access_logger, start_access_log
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(JsonLineFormatter().format(record)))
+
+
+def make_client(**options):
+    """A tiny app wrapped in the middleware, plus the handler collecting its lines."""
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    handler = ListHandler()
+    logger = logging.getLogger(f"test.access.{id(app)}")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    app.add_middleware(AccessLogMiddleware, logger=logger, **options)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    return client, handler
+
+
+@pytest.mark.asyncio
+async def test_one_structured_line_per_request():
+    """Each request produces one line with status, latency and size; secrets stay out."""
+    client, handler = make_client(header_allowlist=["user-agent"])
+    async with client:
+        await client.post("/echo", content=b"secret body",
+                          headers={"Cookie": "codesess=abc", "User-Agent": "pytest"})
+
+    assert len(handler.lines) == 1
+    line = handler.lines[0]
+    assert line["method"] == "POST"
+    assert line["path"] == "/echo"
+    assert line["status"] == 200
+    assert line["latency_ms"] >= 0
+    assert line["bytes"] > 0
+    assert line["headers"] == {"user-agent": "pytest"}
+    assert "body" not in line
+
+
+@pytest.mark.asyncio
+async def test_body_logging_is_opt_in():
+    """With log_bodies the request body is captured as the app reads it."""
+    client, handler = make_client(log_bodies=True)
+    async with client:
+        await client.post("/echo", content=b'{"rating": 4}')
+    assert handler.lines[0]["body"] == '{"rating": 4}'
+
+
+@pytest.mark.asyncio
+async def test_sampling():
+    """A zero sample rate logs nothing; the app still answers."""
+    client, handler = make_client(sample_rate=0.0)
+    async with client:
+        responses = [await client.post("/echo", content=b"x") for _ in range(20)]
+    assert all(r.status_code == 200 for r in responses)
+    assert handler.lines == []
+
+
+def test_queue_listener_writes_lines():
+    """Entries are queued as dicts and serialised by the listener thread."""
+    stream = io.StringIO()
+    listener = start_access_log(stream)
+    entry = {"path": "/health"}
+    try:
+        access_logger.info(entry)
+        access_logger.info(json.dumps({"path": "/ready"}))
+    finally:
+        listener.stop()
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [entry, {"path": "/ready"}]
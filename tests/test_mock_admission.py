@@ -0,0 +1,143 @@
+"""
+Tests for /stream admission control and fair queueing
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_admission import AdmissionRejected, StreamAdmission
+
+
+@pytest.mark.asyncio
+async def test_unlimited_by_default():
+    """A limit of 0 admits everything without tracking."""
+    admission = StreamAdmission(limit=0)
+    permits = [await admission.acquire("s") for _ in range(100)]
+    assert admission.active == 0
+    for permit in permits:
+        permit.release()
+
+
+@pytest.mark.asyncio
+async def test_queue_overflow_is_rejected_fast():
+    """Beyond limit + queue_size the caller gets AdmissionRejected immediately."""
+    admission = StreamAdmission(limit=1, queue_size=1, queue_timeout=5)
+    held = await admission.acquire("a")
+    waiter = asyncio.create_task(admission.acquire("b"))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admission.acquire("c")
+    assert rejected.value.retry_after >= 1
+    assert admission.rejected == 1
+
+    held.release()
+    permit = await waiter
+    assert admission.active == 1 and admission.queued == 0
+    permit.release()
+    permit.release()  # Idempotent
+    assert admission.active == 0
+
+
+@pytest.mark.asyncio
+async def test_heavy_session_does_not_starve_others():
+    """Queued streams are granted round-robin across sessions, not in arrival order."""
+    admission = StreamAdmission(limit=1, queue_size=10, queue_timeout=5)
+    held = await admission.acquire("heavy")
+    order = []
+
+    async def stream(key):
+        permit = await admission.acquire(key)
+        order.append(key)
+        await asyncio.sleep(0)
+        permit.release()
+
+    tasks = [asyncio.create_task(stream("heavy")) for _ in range(4)]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(stream("light1")), asyncio.create_task(stream("light2"))]
+    await asyncio.sleep(0)
+    held.release()
+    await asyncio.gather(*tasks)
+    assert order[:3] == ["heavy", "light1", "light2"]
+    assert admission.active == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_pushes_out_the_heaviest_session():
+    """A light session still gets queued when a heavy one holds every queue position."""
+    admission = StreamAdmission(limit=1, queue_size=3, queue_timeout=5)
+    held = await admission.acquire("x")
+    heavy = [asyncio.create_task(admission.acquire("heavy")) for _ in range(3)]
+    await asyncio.sleep(0)
+    light = asyncio.create_task(admission.acquire("light"))
+    await asyncio.sleep(0)
+    assert admission.queued == 3 and admission.rejected == 1
+    with pytest.raises(AdmissionRejected):
+        await heavy[-1]
+
+    # The light session is now a peer of the heavy one and is served right after its first waiter
+    held.release()
+    (await heavy[0]).release()
+    (await light).release()
+    (await heavy[1]).release()
+    assert admission.active == 0 and admission.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_weights_scale_the_share():
+    """A session with weight 2 is served twice as often while both are backlogged."""
+    admission = StreamAdmission(limit=1, queue_size=20, queue_timeout=5)
+    held = await admission.acquire("x")
+    order = []
+
+    async def stream(key, weight):
+        permit = await admission.acquire(key, weight)
+        order.append(key)
+        await asyncio.sleep(0)
+        permit.release()
+
+    tasks = [asyncio.create_task(stream("gold", 2.0)) for _ in range(6)]
+    tasks += [asyncio.create_task(stream("basic", 1.0)) for _ in range(6)]
+    await asyncio.sleep(0)
+    held.release()
+    await asyncio.gather(*tasks)
+    assert order[:6].count("gold") == 4
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout():
+    """Waiting longer than queue_timeout raises and frees the queue position."""
+    admission = StreamAdmission(limit=1, queue_size=5, queue_timeout=0.05)
+    held = await admission.acquire("a")
+    with pytest.raises(AdmissionRejected):
+        await admission.acquire("b")
+    assert admission.timed_out == 1 and admission.queued == 0
+    held.release()
+    assert admission.active == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_returns_429_with_retry_after(monkeypatch):
+    """Over-limit /stream requests get 429 + Retry-After; slots are freed when streams end."""
+    admission = StreamAdmission(limit=1, queue_size=0, queue_timeout=1)
+    monkeypatch.setattr(main, "stream_admission", admission)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer admission_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        params = {"search_query": "q", "latency_profile": "instant"}
+
+        held = await admission.acquire("someone-else")
+        response = await client.get("/stream", params=params)
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+
+        held.release()
+        response = await client.get("/stream", params=params)
+        assert response.status_code == 200
+    assert admission.active == 0
@@ -0,0 +1,81 @@
+"""
+Tests for negotiated, per-event-flushed response compression
+"""
+import os
+import sys
+import zlib
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_compression import CompressionMiddleware, Encoder, choose_encoding
+
+
+def test_choose_encoding_honours_q_values():
+    """The server's preference wins among accepted codings; q=0 and unknown codings are skipped."""
+    supported = ("br", "gzip", "deflate")
+    assert choose_encoding("gzip, deflate", supported) == "gzip"
+    assert choose_encoding("deflate;q=0.5, gzip;q=0.1", supported) == "deflate"
+    assert choose_encoding("br;q=0, *", supported) == "gzip"
+    assert choose_encoding("identity", supported) is None
+    assert choose_encoding("gzip;q=0", supported) is None
+
+
+@pytest.mark.parametrize("encoding,wbits", [("gzip", 16 + zlib.MAX_WBITS), ("deflate", zlib.MAX_WBITS)])
+def test_every_chunk_is_decodable_on_arrival(encoding, wbits):
+    """With a sync flush per chunk the client can decode each event before the next arrives."""
+    encoder = Encoder(encoding)
+    decoder = zlib.decompressobj(wbits)
+    frames = [main.FRAME_CACHE.metadata_frame("q", 5)] + list(main.FRAME_CACHE.response_frames("q"))
+    for frame in frames:
+        assert decoder.decompress(encoder.compress(frame)) == frame
+    assert decoder.decompress(encoder.finish()) == b""
+    assert decoder.eof
+
+
+@pytest.mark.asyncio
+async def test_streamed_events_are_flushed_individually():
+    """Each SSE frame the app sends leaves the middleware as its own compressed, decodable chunk."""
+    frames = [b"data: %d\n\n" % i * 20 for i in range(5)]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        for frame in frames:
+            await send({"type": "http.response.body", "body": frame, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    await CompressionMiddleware(app)(scope, None, send)
+    assert (b"content-encoding", b"gzip") in sent[0]["headers"]
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = [decoder.decompress(message["body"]) for message in sent[1:]]
+    assert chunks[:-1] == frames and chunks[-1] == b""
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_negotiates_compression():
+    """/stream is compressed when asked and decodes to the identity body; small JSON is left alone."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer compression_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        params = {"search_query": "compress me", "topNDocuments": 20, "latency_profile": "instant"}
+
+        plain = await client.get("/stream", params=params, headers={"Accept-Encoding": "identity"})
+        compressed = await client.get("/stream", params=params, headers={"Accept-Encoding": "gzip"})
+        health = await client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == plain.content
+    assert len(zlib.compress(plain.content)) < len(plain.content)
+    assert "content-encoding" not in health.headers
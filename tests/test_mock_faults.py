@@ -0,0 +1,86 @@
+"""
+Tests for fault injection
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_faults import FaultInjector, FaultMiddleware, FaultRule, parse_rules
+
+
+def test_rules_are_validated():
+    """Out-of-range probabilities and unknown settings are rejected."""
+    with pytest.raises(ValueError):
+        FaultRule(error=1.5)
+    with pytest.raises(ValueError):
+        parse_rules({"/stream": {"disconect": 0.1}})
+    assert parse_rules({"*": {"error": 0.5}})["*"].error == 0.5
+
+
+def test_same_seed_same_faults():
+    """A seeded injector reproduces its fault sequence exactly, and reconfiguring restarts it."""
+    rules = parse_rules({"/stream": {"error": 0.2, "stall": 0.3, "disconnect": 0.3}})
+    first = FaultInjector(rules, seed=7)
+    sequence = [first.plan("/stream", True) for _ in range(200)]
+    assert any(sequence) and not all(sequence)
+    second = FaultInjector(rules, seed=7)
+    assert [second.plan("/stream", True) for _ in range(200)] == sequence
+    first.configure(rules, seed=7)
+    assert [first.plan("/stream", True) for _ in range(200)] == sequence
+    assert first.plan("/health", True) is None
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cuts_the_body_and_unwinds_the_app():
+    """The body stops partway, the response is never completed and the app's cleanup runs."""
+    cleaned_up = []
+
+    async def app(scope, receive, send):
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for i in range(10):
+                await send({"type": "http.response.body", "body": b"data: %d\n\n" % i, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            cleaned_up.append(True)
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    injector = FaultInjector(parse_rules({"*": {"disconnect": 1.0, "max_frames": 3}}), seed=1)
+    await FaultMiddleware(app, injector)({"type": "http", "path": "/stream", "headers": []}, None, send)
+    bodies = [m for m in sent if m["type"] == "http.response.body"]
+    assert sent[0]["type"] == "http.response.start"
+    assert len(bodies) < 3 and all(m["more_body"] for m in bodies)
+    assert cleaned_up == [True]
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoint_controls_faults():
+    """Rules set through /admin/faults apply per route; the admin endpoint itself is never faulted."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer faults_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        config = {"seed": 3, "routes": {"/health": {"error": 1.0, "error_status": 502},
+                                        "/stream": {"unauthorized": 1.0}, "*": {"error": 1.0}}}
+        try:
+            assert (await client.put("/admin/faults", json=config)).status_code == 200
+            assert (await client.get("/health")).status_code == 502
+            assert (await client.get("/stream", params={"search_query": "q"})).status_code == 401
+            assert (await client.get("/ratings/stats")).status_code == 503
+            snapshot = (await client.get("/admin/faults")).json()
+            assert snapshot["seed"] == 3 and snapshot["injected"]["unauthorized"] >= 1
+
+            bad = await client.put("/admin/faults", json={"routes": {"/health": {"error": 2}}})
+            assert bad.status_code == 400
+        finally:
+            await client.delete("/admin/faults")
+        assert (await client.get("/health")).status_code == 200
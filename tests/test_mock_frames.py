@@ -0,0 +1,125 @@
+"""
+Tests for the pre-encoded SSE frame cache
+"""
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_frames import FRAME_CACHE, LOREM, Coalescer, merge_response_frames, tag_frame
+
+
+def legacy_frames(search_query, topNDocuments):
+    """The original json.dumps-per-frame implementation, used as the reference output."""
+    frames = [f"data: {json.dumps({'type': 'metadata', 'data': {'query': search_query, 'citations_requested': topNDocuments}})}\n\n"]
+    text = search_query + ". " + LOREM + search_query
+    frames += [f"data: {json.dumps({'type': 'response', 'data': text[i:i+6]})}\n\n" for i in range(0, len(text), 6)]
+    frames += [f"data: {json.dumps({'type': 'citation', 'data': f'Citation {i+1}: ' + str(i+1) * (i+1)})}\n\n"
+               for i in range(min(topNDocuments, 20))]
+    return [frame.encode() for frame in frames]
+
+
+def cached_frames(search_query, topNDocuments):
+    return ([FRAME_CACHE.metadata_frame(search_query, topNDocuments)]
+            + list(FRAME_CACHE.response_frames(search_query))
+            + list(FRAME_CACHE.citation_frames(topNDocuments)))
+
+
+@pytest.mark.parametrize("search_query", [
+    "",
+    "a",
+    "How to implement streaming in FastAPI",
+    'quotes " and \\ backslashes',
+    "unicode ünïcödé 検索  ",
+    "tab\tnewline\n",
+])
+@pytest.mark.parametrize("topNDocuments", [0, 1, 5, 20, 50, -3])
+def test_cache_matches_legacy_encoding(search_query, topNDocuments):
+    """Cached frames are byte-identical to the json.dumps implementation."""
+    assert cached_frames(search_query, topNDocuments) == legacy_frames(search_query, topNDocuments)
+
+
+def test_every_token_alignment():
+    """Query lengths covering all six token alignments produce identical output."""
+    for length in range(0, 13):
+        query = "q" * length
+        assert cached_frames(query, 2) == legacy_frames(query, 2)
+
+
+def test_static_frames_are_shared():
+    """Body and citation frames are reused objects, not rebuilt per request."""
+    first = list(FRAME_CACHE.response_frames("same length"))
+    second = list(FRAME_CACHE.response_frames("SAME LENGTH"))
+    assert any(a is b for a, b in zip(first, second))
+    assert FRAME_CACHE.citation_frames(5) is FRAME_CACHE.citation_frames(5)
+
+
+def events(frames):
+    return [json.loads(frame[len(b"data: "):].decode()) for frame in frames]
+
+
+def response_text(frames):
+    return "".join(event["data"] for event in events(frames) if event["type"] == "response")
+
+
+def test_tag_frame_splices_members():
+    """Tagged frames are the original event plus the new members, whatever buffer type they come in."""
+    for frame in [*FRAME_CACHE.response_frames("tag \"me\""), *FRAME_CACHE.citation_frames(2)]:
+        tagged = tag_frame(memoryview(frame), b'"index": 3')
+        assert json.loads(tagged[6:]) == {"index": 3, **json.loads(frame[6:])}
+    assert json.loads(tag_frame(b": keep-alive\n\n", b'"index": 0')[6:]) == {
+        "index": 0, "type": "raw", "data": ": keep-alive\n\n"}
+
+
+def test_merged_frames_carry_the_same_text():
+    """Splicing escaped token bodies yields one valid event with the concatenated text."""
+    query = 'quotes " and \\ backslashes ünï\n'
+    frames = list(FRAME_CACHE.response_frames(query))
+    merged = merge_response_frames(frames)
+    assert response_text([merged]) == response_text(frames) == query + ". " + LOREM + query
+
+
+def test_coalescer_byte_budget_and_passthrough():
+    """Tokens batch up to the byte budget; metadata and citations flush the batch and pass through."""
+    frames = cached_frames("budget", 5)
+    coalescer = Coalescer(window=0, max_bytes=400)
+    out = [ready for frame in frames for ready in coalescer.push(frame, 0.0)] + coalescer.flush()
+    assert response_text(out) == response_text(frames)
+    assert out[0] == frames[0] and out[-5:] == frames[-5:]
+    assert all(len(frame) < 400 + 60 for frame in out[1:-5])
+    assert coalescer.events == len(out) - 6 < coalescer.tokens // 5
+
+
+def test_coalescer_time_window():
+    """A batch closes when the next token would arrive after the window (virtual clock)."""
+    coalescer = Coalescer(window=0.05, max_bytes=0)
+    token = FRAME_CACHE.response_frame("abcdef")
+    now, sizes = 0.0, []
+    for delay in [0.02, 0.02, 0.02, 0.2, 0.01, 0.01]:
+        ready = coalescer.push(token, delay, now)
+        sizes += [response_text(ready).count("abcdef")] if ready else []
+        now += delay
+    sizes += [response_text([frame]).count("abcdef") for frame in coalescer.flush()]
+    assert sizes == [3, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_stream_coalescing_parameters():
+    """/stream?coalesce_bytes merges tokens into fewer events with identical text."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer coalesce_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        params = {"search_query": "coalesce", "topNDocuments": 3, "latency_profile": "instant"}
+        plain = await client.get("/stream", params=params)
+        merged = await client.get("/stream", params={**params, "coalesce_bytes": 1024})
+        assert (await client.get("/stream", params={**params, "coalesce_ms": -1})).status_code == 422
+
+    split = lambda body: [frame + b"\n\n" for frame in body.split(b"\n\n") if frame]
+    assert response_text(split(merged.content)) == response_text(split(plain.content))
+    assert len(split(merged.content)) * 5 < len(split(plain.content))
@@ -0,0 +1,68 @@
+"""
+Tests for the mock /stream latency profiles
+"""
+import json
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from mock_latency import PROFILES, LatencyProfile, get_profile, make_sampler
+
+
+def test_legacy_profile_matches_historic_delays():
+    """The default profile keeps the flat 0.1s pacing existing clients expect."""
+    sampler = make_sampler("legacy")
+    assert sampler.first_token() == 0.1
+    assert [sampler.token(i) for i in range(5)] == [0.1] * 5
+    assert sampler.citation() == 0.1
+
+
+def test_same_seed_gives_same_delays():
+    """Seeded samplers must be repeatable so load-test percentiles are comparable."""
+    first = make_sampler("production", seed=42)
+    second = make_sampler("production", seed=42)
+    assert [first.token(i) for i in range(50)] == [second.token(i) for i in range(50)]
+    assert first.first_token() == second.first_token()
+
+
+def test_production_profile_is_bursty():
+    """Every burst boundary adds the burst pause on top of the token delay."""
+    profile = PROFILES["production"]
+    sampler = make_sampler("production", seed=1)
+    delays = [sampler.token(i) for i in range(profile.burst_size * 20)]
+    boundaries = delays[profile.burst_size - 1::profile.burst_size]
+    assert min(boundaries) > profile.burst_pause * (1 - profile.jitter)
+    assert sampler.first_token() > 1.0
+
+
+def test_profile_from_environment(monkeypatch):
+    """MOCK_LATENCY_PROFILE selects the profile when the request does not."""
+    monkeypatch.setenv("MOCK_LATENCY_PROFILE", "instant")
+    assert get_profile().name == "instant"
+    assert get_profile("degraded").name == "degraded"
+
+
+def test_unknown_profile_and_distribution_rejected():
+    """Bad names fail loudly instead of silently falling back."""
+    with pytest.raises(ValueError):
+        get_profile("does-not-exist")
+    with pytest.raises(ValueError):
+        LatencyProfile("bad", 0.0, 0.0, token_distribution="pareto")
+
+
+@pytest.mark.asyncio
+async def test_event_generator_with_instant_profile():
+    """The instant profile streams the full metadata/response/citation sequence."""
+    from main import event_generator
+
+    frames = [json.loads(frame[len("data: "):])
+              async for frame in event_generator("latency test", 3, make_sampler("instant"))]
+
+    assert frames[0]["type"] == "metadata"
+    assert frames[0]["data"]["query"] == "latency test"
+    assert [f["type"] for f in frames].count("citation") == 3
+    assert "".join(f["data"] for f in frames if f["type"] == "response").startswith("latency test. ")
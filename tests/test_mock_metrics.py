@@ -0,0 +1,78 @@
+"""
+Tests for the Prometheus-style metrics registry and the /metrics endpoint
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_metrics import Registry
+
+
+def test_counter_gauge_and_callback_rendering():
+    """Counters, gauges and callbacks render in the text exposition format."""
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", ("route",))
+    active = registry.gauge("active", "Active.")
+    registry.callback("size", "Size.", "gauge", lambda: 42)
+    requests.inc(1, ("/a",))
+    requests.inc(2, ("/a",))
+    requests.inc(1, ('/b"',))
+    active.inc()
+    active.inc()
+    active.dec()
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'requests_total{route="/b\\""} 1' in text
+    assert "active 1" in text
+    assert "size 42" in text
+    with pytest.raises(ValueError):
+        registry.gauge("active", "Duplicate.")
+
+
+def test_histogram_buckets_are_cumulative():
+    """Each bucket counts every observation <= its bound; +Inf equals _count."""
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value, ("/x",))
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/x",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/x"} 4' in lines
+    assert 'latency_seconds_sum{route="/x"} 5.65' in lines
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_streams_and_routes():
+    """A finished stream shows up in the stream counters and the per-route histogram."""
+    frames_before = main.STREAM_FRAMES.value()
+    completed_before = main.STREAMS.value(("completed",))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer metrics_test_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        response = await client.get("/stream", params={"search_query": "metrics", "topNDocuments": 2,
+                                                        "latency_profile": "instant"})
+        frames = response.text.count("data: ")
+        metrics = await client.get("/metrics")
+
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert main.STREAM_FRAMES.value() - frames_before == frames
+    assert main.STREAMS.value(("completed",)) - completed_before == 1
+    assert main.STREAMS_ACTIVE.value() == 0
+    text = metrics.text
+    assert 'mock_http_request_duration_seconds_count{method="GET",route="/stream"}' in text
+    assert 'mock_http_requests_total{method="POST",route="/api/login",status="200"}' in text
+    assert "mock_stream_first_token_seconds_count" in text
+    assert "mock_sessions " in text
+    assert "mock_ratings_received_total " in text
@@ -0,0 +1,152 @@
+"""
+Tests for multiplexed queries over /stream/ws
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_frames import encode_frame
+from mock_multiplex import QueryMux, tag_frame
+
+
+def login(client: TestClient, token: str = "ws_token") -> dict:
+    response = client.post("/api/login", headers={"Authorization": f"Bearer {token}"})
+    return {"cookie": f"codesess={response.json()['session_id']}"}
+
+
+def receive_until_done(ws, ids) -> dict:
+    """Messages by query id until every id in `ids` has ended."""
+    events = {query_id: [] for query_id in ids}
+    open_ids = set(ids)
+    while open_ids:
+        message = json.loads(ws.receive_text())
+        events[message["id"]].append(message)
+        if message["type"] in ("done", "error"):
+            open_ids.discard(message["id"])
+    return events
+
+
+def test_tag_frame_splices_the_query_id():
+    frame = encode_frame({"type": "response", "data": "Hello"})
+    assert json.loads(tag_frame(frame, b'"q1"')) == {"id": "q1", "type": "response", "data": "Hello"}
+    raw = json.loads(tag_frame(b"event: ping\n\n", b'"q2"'))
+    assert raw == {"id": "q2", "type": "raw", "data": "event: ping\n\n"}
+
+
+def test_handshake_requires_a_session():
+    client = TestClient(main.app)
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with client.websocket_connect("/stream/ws", headers={"cookie": "codesess=unknown"}):
+            pass
+    assert refused.value.code == 1008
+
+
+def test_concurrent_queries_share_one_connection():
+    """Two queries run at once; each gets its own tagged metadata, tokens, citations and done message."""
+    client = TestClient(main.app)
+    with client.websocket_connect("/stream/ws", headers=login(client)) as ws:
+        ws.send_json({"type": "query", "id": "a", "search_query": "first", "topNDocuments": 2,
+                      "latency_profile": "instant"})
+        ws.send_json({"type": "query", "id": "b", "search_query": "second", "topNDocuments": 3,
+                      "latency_profile": "instant"})
+        events = receive_until_done(ws, ["a", "b"])
+    for query_id, query, citations in (("a", "first", 2), ("b", "second", 3)):
+        kinds = [event["type"] for event in events[query_id]]
+        assert kinds[0] == "metadata" and events[query_id][0]["data"]["query"] == query
+        assert kinds.count("citation") == citations
+        assert events[query_id][-1] == {"id": query_id, "type": "done", "outcome": "completed"}
+        answer = "".join(event["data"] for event in events[query_id] if event["type"] == "response")
+        assert answer.startswith(f"{query}. ")
+
+
+def test_per_query_cancellation_and_errors():
+    """A cancel ends only its own query; bad messages get errors without closing the connection."""
+    client = TestClient(main.app)
+    with client.websocket_connect("/stream/ws", headers=login(client)) as ws:
+        ws.send_json({"type": "query", "id": "slow", "search_query": "cancel me", "latency_profile": "legacy"})
+        ws.send_json({"type": "query", "id": "slow", "search_query": "again"})
+        first = sorted((json.loads(ws.receive_text()) for _ in range(2)), key=lambda event: event["type"])
+        assert [event["type"] for event in first] == ["error", "metadata"]
+        assert first[0]["status"] == 409
+        ws.send_text("not json")
+        ws.send_json({"type": "cancel", "id": "missing"})
+        ws.send_json({"type": "query", "id": "bad", "search_query": "q", "coalesce_ms": -1})
+        ws.send_json({"type": "query", "id": "fast", "search_query": "done", "latency_profile": "instant"})
+        ws.send_json({"type": "cancel", "id": "slow"})
+        events = receive_until_done(ws, ["slow", "fast", "missing", "bad", None])
+        ws.send_json({"type": "query", "id": "err", "search_query": "q", "latency_profile": "nope"})
+        assert json.loads(ws.receive_text())["status"] == 400
+    assert events["slow"][-1] == {"id": "slow", "type": "done", "outcome": "cancelled"}
+    assert len(events["slow"]) < 20
+    assert events["fast"][-1]["outcome"] == "completed"
+    assert events["missing"][0]["status"] == 404
+    assert events["bad"][0]["status"] == 422
+    assert events[None][0]["status"] == 400
+
+
+def test_bad_ids_and_failing_queries_keep_the_connection(monkeypatch):
+    """A non-string id gets a 400 and a query that raises gets a 500; the connection keeps serving."""
+    real_frames = main.multiplexed_frames
+
+    async def frames(query, handle):
+        if query.search_query == "corrupt":
+            yield encode_frame({"type": "metadata", "data": {}})
+            raise ValueError("corrupt transcript")
+        async for frame in real_frames(query, handle):
+            yield frame
+
+    monkeypatch.setattr(main, "multiplexed_frames", frames)
+    client = TestClient(main.app)
+    with client.websocket_connect("/stream/ws", headers=login(client)) as ws:
+        ws.send_json({"type": "cancel", "id": ["a"]})
+        ws.send_json({"type": "query", "id": {"x": 1}, "search_query": "q"})
+        errors = [json.loads(ws.receive_text()) for _ in range(2)]
+        assert [(error["id"], error["status"]) for error in errors] == [(None, 400), (None, 400)]
+        ws.send_json({"type": "query", "id": "bad", "search_query": "corrupt"})
+        ws.send_json({"type": "query", "id": "ok", "search_query": "fine", "latency_profile": "instant"})
+        events = receive_until_done(ws, ["bad", "ok"])
+    assert events["bad"][-1]["type"] == "error" and events["bad"][-1]["status"] == 500
+    assert events["ok"][-1] == {"id": "ok", "type": "done", "outcome": "completed"}
+
+
+class ScriptedSocket:
+    """Hands QueryMux its messages without yielding to the loop in between; None pauses to let tasks run."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.sent = []
+
+    async def receive(self) -> dict:
+        message = self.script.pop(0) if self.script else None
+        if message is None:
+            await asyncio.sleep(0.05)
+            return {"type": "websocket.disconnect"} if not self.script else await self.receive()
+        return {"type": "websocket.receive", "text": json.dumps(message)}
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+
+@pytest.mark.asyncio
+async def test_query_cancelled_before_it_starts_is_reported_and_forgotten():
+    """A cancel right behind its query ends it with a done message and frees the id for the next query."""
+    async def frames(query, handle):
+        yield encode_frame({"type": "metadata", "data": {"query": query.search_query}})
+
+    ws = ScriptedSocket([{"type": "query", "id": "q", "search_query": "first"}, {"type": "cancel", "id": "q"}, None,
+                         {"type": "query", "id": "q", "search_query": "second"}, None])
+    mux = QueryMux(ws, "session", frames, max_queries=1)
+    await mux.serve()
+    assert ws.sent == [{"id": "q", "type": "done", "outcome": "cancelled"},
+                       {"id": "q", "type": "metadata", "data": {"query": "second"}},
+                       {"id": "q", "type": "done", "outcome": "completed"}]
+    assert mux.queries == {}
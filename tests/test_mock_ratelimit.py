@@ -0,0 +1,103 @@
+"""
+Tests for per-session token-bucket rate limiting
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_ratelimit import RouteLimit, make_rate_limiter, parse_budget
+
+
+def test_parse_budget():
+    assert parse_budget("0") is None and parse_budget("") is None
+    assert parse_budget("2/10") == (2.0, 10)
+    assert parse_budget("0.5") == (0.5, 1)
+    assert parse_budget("20") == (20.0, 20)
+    for bad in ("-1", "2/0", "fast"):
+        with pytest.raises(ValueError):
+            parse_budget(bad)
+
+
+def test_bucket_bursts_then_refills_at_rate():
+    """A session spends its burst at once, then gets one call per 1/rate seconds."""
+    limit = RouteLimit("stream", rate=2, burst=3)
+    assert [limit.take("s", now=100.0)[0] for _ in range(4)] == [True, True, True, False]
+    assert limit.take("s", now=100.4) == (False, pytest.approx(0.8))
+    assert limit.take("s", now=100.5)[0]
+    assert limit.take("other", now=100.5) == (True, 2)  # Sessions have separate buckets
+    assert limit.take("s", now=1000.0) == (True, 2)      # Refill stops at the burst
+    assert limit.take("s", cost=4, now=2000.0) == (False, 3)  # More than the burst never passes
+
+
+def test_headers_report_the_bucket():
+    limit = RouteLimit("rating", rate=0.5, burst=4)
+    assert limit.headers(2.5) == {"RateLimit-Limit": "4", "RateLimit-Remaining": "2", "RateLimit-Reset": "3",
+                                  "RateLimit-Policy": "4;w=8"}
+    assert limit.headers(0.25)["Retry-After"] == "2"
+
+
+def test_full_buckets_are_pruned():
+    """Idle sessions' buckets do not accumulate."""
+    limit = RouteLimit("stream", rate=10, burst=10)
+    for i in range(1024):
+        limit.take(f"s{i}", now=0.0)
+    assert len(limit) == 1024
+    limit.take("late", now=5.0)
+    assert len(limit) == 1
+
+
+@pytest.mark.asyncio
+async def test_api_throttles_per_session_and_route(monkeypatch):
+    """Over-budget calls get 429 with rate-limit headers; other routes and sessions are unaffected."""
+    monkeypatch.setattr(main, "rate_limiter", make_rate_limiter(stream="0.01/2", rating="0.01/1"))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        async def cookie(token: str) -> dict:
+            response = await client.post("/api/login", headers={"Authorization": f"Bearer {token}"})
+            return {"Cookie": f"codesess={response.json()['session_id']}"}
+
+        runaway, polite = await cookie("ratelimit_runaway"), await cookie("ratelimit_polite")
+        params = {"search_query": "q", "topNDocuments": 0, "latency_profile": "instant"}
+        statuses = [(await client.get("/stream", params=params, headers=runaway)).status_code for _ in range(2)]
+        assert statuses == [200, 200]
+        throttled = await client.get("/stream", params=params, headers=runaway)
+        assert throttled.status_code == 429
+        assert throttled.headers["RateLimit-Limit"] == "2" and throttled.headers["RateLimit-Remaining"] == "0"
+        assert int(throttled.headers["Retry-After"]) > 0
+        assert (await client.post("/stream/batch", json=[{"search_query": "q"}], headers=runaway)).status_code == 429
+
+        assert (await client.get("/stream", params=params, headers=polite)).status_code == 200
+        rating = {"chat_id": "c", "search_query": "q", "rating": 5}
+        assert (await client.post("/add_rating", json=rating, headers=runaway)).status_code == 200
+        assert (await client.post("/add_rating", json=rating, headers=runaway)).status_code == 429
+        assert (await client.get("/ratings/stats", headers=runaway)).status_code == 200
+
+
+def test_websocket_queries_are_charged_to_the_stream_budget(monkeypatch):
+    """Switching to /stream/ws does not get around MOCK_RATE_LIMIT_STREAM: each query takes a token."""
+    from starlette.testclient import TestClient
+    monkeypatch.setattr(main, "rate_limiter", make_rate_limiter(stream="0.01/2"))
+    client = TestClient(main.app)
+    session_id = client.post("/api/login", headers={"Authorization": "Bearer ratelimit_ws"}).json()["session_id"]
+    with client.websocket_connect("/stream/ws", headers={"cookie": f"codesess={session_id}"}) as ws:
+        # A query refused as invalid is not charged
+        ws.send_json({"type": "query", "id": "bad", "search_query": "q", "latency_profile": "nope"})
+        assert ws.receive_json()["status"] == 400
+        for query_id in ("a", "b", "c"):
+            ws.send_json({"type": "query", "id": query_id, "search_query": "q", "topNDocuments": 0,
+                          "latency_profile": "instant"})
+            while True:
+                message = ws.receive_json()
+                if message["type"] in ("done", "error"):
+                    break
+            assert message["type"] == ("error" if query_id == "c" else "done")
+    assert message["status"] == 429
+    # The WebSocket spent the session's budget for plain /stream too
+    response = client.get("/stream", params={"search_query": "q", "latency_profile": "instant"},
+                          headers={"cookie": f"codesess={session_id}"})
+    assert response.status_code == 429
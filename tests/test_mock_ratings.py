@@ -0,0 +1,141 @@
+"""
+Tests for the write-behind rating store
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from mock_ratings import RatingAggregate, RatingStore
+
+
+def test_add_does_not_touch_disk_until_flush(tmp_path):
+    """Ratings sit in memory until the flusher writes them."""
+    store = RatingStore(str(tmp_path / "ratings.db"))
+    store.add("chat1", "query", 4, "sess")
+    assert store.count() == 0
+    assert store.get("chat1", "query").rating == 4
+    assert store.flush() == 1
+    assert store.count() == 1
+    assert store.get("chat1", "query").rating == 4
+
+
+def test_retries_are_idempotent(tmp_path):
+    """Re-sending the same (chat_id, search_query) replaces the rating instead of adding one."""
+    store = RatingStore(str(tmp_path / "ratings.db"))
+    store.add("chat1", "query", 2)
+    store.add("chat1", "query", 3)   # Retry before the flush
+    store.flush()
+    store.add("chat1", "query", 5)   # Retry after the flush
+    store.flush()
+    assert store.count() == 1
+    assert store.get("chat1", "query").rating == 5
+
+
+def test_add_many(tmp_path):
+    """A batch is buffered like individual adds, later duplicates winning."""
+    store = RatingStore(str(tmp_path / "ratings.db"))
+    assert store.add_many([("c1", "q", 2), ("c2", "q", 4), ("c1", "q", 5)], "sess") == 3
+    assert store.received == 3
+    store.flush()
+    assert store.count() == 2
+    assert store.get("c1", "q").rating == 5
+    assert store.stats.snapshot(top_k=1, min_count=1)["global"]["count"] == 2
+
+
+def test_background_flusher_and_close(tmp_path):
+    """The flusher persists ratings on its own and close() drains the rest durably."""
+    path = str(tmp_path / "ratings.db")
+    store = RatingStore(path, flush_interval=0.05, batch_size=100, checkpoint_interval=0.1)
+    store.start()
+    for i in range(250):
+        store.add(f"chat{i}", "query", 1 + i % 5)
+    deadline = time.monotonic() + 5
+    while store.count() < 250 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert store.count() == 250
+    store.add("late", "query", 5)
+    store.close()
+
+    reopened = RatingStore(path)
+    assert reopened.count() == 251
+
+
+def test_concurrent_writers(tmp_path):
+    """Many threads adding at once lose nothing."""
+    store = RatingStore(str(tmp_path / "ratings.db"))
+
+    def writer(n):
+        for i in range(500):
+            store.add(f"chat{n}-{i}", "query", 3)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.flush()
+    assert store.count() == 4000
+    assert store.received == 4000
+
+
+def test_stats_are_incremental_and_handle_replacements(tmp_path):
+    """Aggregates follow each rating, and a retry moves them rather than double counting."""
+    store = RatingStore(str(tmp_path / "ratings.db"))
+    store.add("chat1", "good query", 5)
+    store.add("chat2", "good query", 4)
+    store.add("chat1", "bad query", 1)
+    store.add("chat1", "bad query", 2)  # Replaces the 1
+
+    snapshot = store.snapshot(top_k=1, search_query="bad query")
+    assert snapshot["global"]["count"] == 3
+    assert snapshot["global"]["mean"] == pytest.approx(11 / 3, abs=1e-4)
+    assert snapshot["global"]["histogram"] == {"1": 0, "2": 1, "3": 0, "4": 1, "5": 1}
+    assert snapshot["queries"] == 2
+    assert snapshot["top"] == [{"search_query": "good query", "count": 2, "mean": 4.5}]
+    assert snapshot["bottom"] == [{"search_query": "bad query", "count": 1, "mean": 2.0}]
+    assert snapshot["query"]["histogram"]["2"] == 1
+
+
+def test_streaming_quantiles():
+    """Quantiles come from the bounded sketch and survive removals."""
+    aggregate = RatingAggregate()
+    for i in range(1, 101):
+        aggregate.add(1 + 4 * i / 100)
+    assert aggregate.quantiles() == {"p50": 3.0, "p90": 4.6, "p99": 4.96}
+    aggregate.remove(5.0)
+    assert aggregate.count == 99
+    assert len(aggregate.sketch) == 99
+
+
+def test_snapshot_cached_until_next_rating(tmp_path):
+    """Polling without new ratings returns the cached snapshot."""
+    store = RatingStore(str(tmp_path / "ratings.db"))
+    store.add("chat1", "query", 3)
+    assert store.snapshot() is store.snapshot()
+    first = store.snapshot()
+    store.add("chat2", "query", 5)
+    assert store.snapshot() is not first
+
+
+def test_stats_reloaded_from_disk(tmp_path):
+    """A restarted store seeds its aggregates from persisted ratings."""
+    path = str(tmp_path / "ratings.db")
+    store = RatingStore(path)
+    store.add("chat1", "query", 2)
+    store.add("chat2", "query", 4)
+    store.close()
+
+    restarted = RatingStore(path)
+    restarted.start()
+    try:
+        assert restarted.snapshot()["global"]["count"] == 2
+        restarted.add("chat1", "query", 5)  # Replaces a persisted rating
+        assert restarted.snapshot()["global"]["mean"] == 4.5
+    finally:
+        restarted.close()
@@ -0,0 +1,108 @@
+"""
+Tests for SSE transcript capture and replay
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_replay import Transcript, TranscriptLibrary, capture, transcript_key, write_transcript
+
+FRAMES = [
+    (0.5, b'data: {"type": "metadata", "data": {"query": "q"}}\n\n'),
+    (1.25, b'data: {"type": "response", "data": "Hello"}\n\n'),
+    (0.0, b'data: {"type": "response", "data": "\\n\\n"}\n\n'),
+    (0.75, b'data: {"type": "citation", "data": "Citation 1"}\n\n'),
+]
+
+
+def test_key_normalizes_query():
+    """Case and whitespace differences map to the same fixture; topNDocuments does not."""
+    assert transcript_key("How  to STREAM ", 5) == transcript_key("how to stream", 5)
+    assert transcript_key("how to stream", 5) != transcript_key("how to stream", 3)
+
+
+@pytest.mark.parametrize("mmap_threshold", [0, 1 << 30])
+def test_round_trip_with_and_without_mmap(tmp_path, mmap_threshold):
+    """Frames come back byte-for-byte with the gap before the next frame as their delay."""
+    path = str(tmp_path / "t.sse")
+    write_transcript(path, FRAMES, {"search_query": "q"})
+    transcript = Transcript(path, mmap_threshold=mmap_threshold)
+    assert transcript.mapped == (mmap_threshold == 0)
+    assert transcript.meta["frames"] == 4
+
+    replayed = list(transcript.frames(speed=1.0))
+    assert all(type(frame) is bytes for frame, _ in replayed)
+    assert [frame for frame, _ in replayed] == [frame for _, frame in FRAMES]
+    assert [delay for _, delay in replayed] == [1.25, 0.0, 0.75, 0.0]
+    assert [delay for _, delay in transcript.frames(speed=2.0)] == [0.625, 0.0, 0.375, 0.0]
+    assert [delay for _, delay in transcript.frames(speed=0)] == [0.0] * 4
+
+
+@pytest.mark.parametrize("record", [
+    b"0.1 -8\nabcdefg\n",    # Negative length
+    b"0.1 99\nabcdefg\n",    # Runs past the end of the file
+    b"0.1 3\nabcdefg\n",     # Frame not followed by its newline
+    b"0.1 7\nabcdefg",        # Last frame missing its newline
+    b"0.1\nabcdefg\n",       # No length
+])
+def test_corrupt_records_are_rejected(tmp_path, record):
+    """A length prefix that does not land on a record boundary raises ValueError naming the byte offset."""
+    path = str(tmp_path / "t.sse")
+    write_transcript(path, [], {})
+    with open(path, "ab") as f:
+        offset = f.tell()
+        f.write(record)
+    with pytest.raises(ValueError, match=f"at byte {offset}"):
+        Transcript(path)
+
+
+def test_library_lookup_and_lru(tmp_path):
+    """Fixtures are found by query, picked up when added later, and the open set is bounded."""
+    library = TranscriptLibrary(str(tmp_path), max_open=1)
+    assert library.find("a", 5) is None
+    write_transcript(library.path_for("A ", 5), FRAMES, {})
+    write_transcript(library.path_for("b", 5), FRAMES, {})
+    first = library.find("a", 5)
+    assert first is not None and library.find("a", 5) is first
+    assert library.find("b", 5) is not None
+    assert len(library._open) == 1
+
+
+@pytest.mark.asyncio
+async def test_capture_and_replay_through_the_api(tmp_path, monkeypatch):
+    """A stream captured from the app replays identically from the fixtures directory."""
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer replay_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        path = await capture("/stream", "Replay me", 2, str(tmp_path), extra_params={"latency_profile": "instant"},
+                             client=client)
+        original = await client.get("/stream", params={"search_query": "Replay me", "topNDocuments": 2,
+                                                       "latency_profile": "instant"})
+
+        library = TranscriptLibrary(str(tmp_path), mmap_threshold=0)
+        monkeypatch.setattr(main, "replay_library", library)
+        # A different spelling of the same query hits the same fixture
+        replayed = await client.get("/stream", params={"search_query": "replay  ME", "topNDocuments": 2})
+        assert replayed.content == original.content
+        assert library.hits == 1
+
+        # A corrupt fixture falls back to the synthetic stream, or fails clearly under the 404 fallback
+        with open(library.path_for("corrupt", 2), "wb") as f:
+            f.write(b"MOCKSSE1 {}\nnot a frame index\n")
+        corrupt = {"search_query": "corrupt", "topNDocuments": 2, "latency_profile": "instant"}
+        fallback = await client.get("/stream", params=corrupt)
+        assert fallback.status_code == 200 and b'"metadata"' in fallback.content
+
+        monkeypatch.setattr(main, "REPLAY_FALLBACK", "404")
+        missing = await client.get("/stream", params={"search_query": "never captured", "topNDocuments": 2})
+        assert missing.status_code == 404
+        unreadable = await client.get("/stream", params=corrupt)
+        assert unreadable.status_code == 500 and "unreadable" in unreadable.json()["detail"]
+    assert Transcript(path).meta["search_query"] == "Replay me"
@@ -0,0 +1,79 @@
+"""
+Tests for the BM25 citation index
+"""
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_search import SearchIndex, make_index, split_passages, tokenize
+
+DOCS = {
+    "streaming.md": "# Streaming\n\nFastAPI streams server-sent events from an async generator.\n\n"
+                    "Each event is flushed to the client as soon as it is produced.",
+    "auth/login.md": "# Login\n\nThe login endpoint exchanges a bearer token for a session cookie.",
+    "notes.txt": "Unrelated notes about caching and the cookie jar.",
+    "image.png": "not indexed",
+}
+
+
+@pytest.fixture
+def docs(tmp_path):
+    for name, content in DOCS.items():
+        path = tmp_path / "docs" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    return tmp_path / "docs"
+
+
+def test_tokenize_and_passages():
+    assert tokenize("How to STREAM events, v2!") == ["stream", "events", "v2"]
+    text = "\n\n".join(" ".join(["word"] * 50) for _ in range(5))
+    assert [len(p.split()) for p in split_passages(text, words=120)] == [150, 100]
+
+
+def test_ranking(docs):
+    """Matching passages rank by BM25; rare terms outweigh common ones; no match gives no hits."""
+    index = SearchIndex.build(str(docs))
+    assert sorted(index.sources) == ["auth/login.md", "notes.txt", "streaming.md"]
+    hits = index.search("session cookie login", 3)
+    assert [hit.source for hit in hits[:2]] == ["auth/login.md", "notes.txt"]
+    assert hits[0].score > hits[1].score > 0
+    assert "bearer token" in hits[0].snippet
+    assert index.search("streaming events", 1)[0].source == "streaming.md"
+    assert index.search("kubernetes", 5) == [] and index.search("cookie", 0) == []
+
+
+def test_saved_index_is_mapped_and_identical(docs, tmp_path):
+    """A saved index loads through mmap with the same results, and is rebuilt when documents change."""
+    path = str(tmp_path / "docs.bm25")
+    built = make_index(str(docs), "")
+    mapped = make_index(str(docs), path)
+    assert mapped.mapped and not built.mapped
+    for query in ("session cookie", "async generator events", "caching"):
+        assert mapped.search(query, 5) == built.search(query, 5)
+
+    os.utime(path, (0, 0))  # Older than the documents: rebuilt
+    (docs / "notes.txt").write_text("Kubernetes deployment notes.", encoding="utf-8")
+    assert make_index(str(docs), path).search("kubernetes", 1)[0].source == "notes.txt"
+
+
+@pytest.mark.asyncio
+async def test_stream_cites_indexed_passages(docs, monkeypatch):
+    monkeypatch.setattr(main, "search_index", SearchIndex.build(str(docs)))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer search_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        response = await client.get("/stream", params={"search_query": "session cookie login", "topNDocuments": 2,
+                                                       "latency_profile": "instant"})
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+    citations = [event for event in events if event["type"] == "citation"]
+    assert len(citations) == 2
+    assert citations[0]["data"].startswith("Citation 1: # Login")
+    assert citations[0]["source"] == "auth/login.md"
@@ -0,0 +1,69 @@
+"""
+Tests for the mock_serve entry point and its server profiles
+"""
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import mock_serve
+from mock_serve import PROFILES, build_profile, uvicorn_options
+
+
+def test_profiles_resolve_to_uvicorn_options(monkeypatch):
+    """Every profile maps onto uvicorn.run() keywords; workers=0 means one per CPU."""
+    monkeypatch.setattr(mock_serve.os, "cpu_count", lambda: 4)
+    for name in PROFILES:
+        options = uvicorn_options(PROFILES[name])
+        assert options["loop"] in ("asyncio", "uvloop") and options["http"] in ("h11", "httptools")
+    assert uvicorn_options(PROFILES["throughput"])["workers"] == 4
+    assert uvicorn_options(PROFILES["compat"])["timeout_graceful_shutdown"] is None
+
+
+def test_flags_override_the_profile():
+    """Explicit settings replace the profile's; unset ones keep it."""
+    profile = build_profile("streaming", workers=2, drain_timeout=5.0)
+    assert (profile.workers, profile.drain_timeout) == (2, 5.0)
+    assert profile.keep_alive == PROFILES["streaming"].keep_alive
+    with pytest.raises(ValueError):
+        build_profile("nope")
+
+
+def test_multiple_workers_need_shared_sessions():
+    """Multi-worker profiles share sessions; per-worker session backends are refused."""
+    for profile in PROFILES.values():
+        mock_serve.check_session_backend(uvicorn_options(profile)["workers"], profile.env)
+    mock_serve.check_session_backend(1, {})
+    with pytest.raises(ValueError, match="memory"):
+        mock_serve.check_session_backend(4, {})
+    with pytest.raises(ValueError, match="MOCK_SESSION_SECRET"):
+        mock_serve.check_session_backend(4, {"MOCK_SESSION_BACKEND": "signed"})
+    mock_serve.check_session_backend(4, {"MOCK_SESSION_BACKEND": "signed", "MOCK_SESSION_SECRET": "s"})
+
+
+def test_auto_falls_back_but_explicit_choice_must_be_installed(monkeypatch):
+    """'auto' quietly uses asyncio/h11 without the extras; naming a missing one is an error."""
+    monkeypatch.setattr(mock_serve, "_installed", lambda module: False)
+    assert mock_serve.resolve_loop("auto") == "asyncio"
+    assert mock_serve.resolve_http("auto") == "h11"
+    with pytest.raises(ValueError):
+        mock_serve.resolve_loop("uvloop")
+    with pytest.raises(ValueError):
+        mock_serve.resolve_http("httptools")
+
+
+def test_serves_the_main_module_next_to_mock_serve(monkeypatch, tmp_path):
+    """Run from another project's directory, the launcher still imports this checkout's main.py."""
+    import uvicorn
+    calls = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs)))
+    monkeypatch.setattr(sys, "argv", ["mock_serve", "--profile", "default"])
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "main.py").write_text("raise SystemExit('wrong main.py')\n")
+    mock_serve.main()
+    [(app, kwargs)] = calls
+    assert app == "main:app"
+    assert kwargs["app_dir"] == os.path.dirname(os.path.abspath(mock_serve.__file__))
@@ -0,0 +1,309 @@
+"""
+Tests for the bounded, expiry-indexed session store
+"""
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from mock_sessions import (SessionInfo, SessionSigner, SessionStore, SignedSessionStore, SQLiteSessionStore,
+                           StripedSessionStore, make_session_store)
+
+
+def new_ids(prefix: str = "s"):
+    """A new_session_id factory yielding s0, s1, ..."""
+    counter = iter(range(1 << 30))
+    return lambda: f"{prefix}{next(counter)}"
+
+
+def test_create_and_get():
+    """A fresh session is returned by ID until it expires."""
+    store = SessionStore(ttl=60)
+    session = store.create("abc", "token")
+    assert store.get("abc") is session
+    assert store.get("missing") is None
+    assert session.expires_at - session.created_at == pytest.approx(60)
+
+
+def test_expired_session_removed_on_lookup():
+    """Looking up an expired session drops it, as before."""
+    store = SessionStore(ttl=-1)
+    store.create("old", "token")
+    assert store.get("old") is None
+    assert len(store) == 0
+    assert store.expirations == 1
+
+
+def test_sweep_removes_abandoned_sessions():
+    """Sessions nobody looks up again are still reclaimed by the sweeper."""
+    store = SessionStore(ttl=10)
+    for i in range(100):
+        store.create(f"s{i}", "token")
+    now = time.monotonic()
+    assert store.sweep(now) == 0
+    assert store.sweep(now + 11) == 100
+    assert len(store) == 0
+
+
+def test_sweep_skips_replaced_entries():
+    """A stale heap entry for a re-added session ID must not evict the new session."""
+    store = SessionStore(ttl=10)
+    now = time.monotonic()
+    store.add(SessionInfo("same", "old", now + 1, now))
+    store.add(SessionInfo("same", "new", now + 100, now))
+    assert store.sweep(now + 5) == 0
+    assert store.get("same").access_token == "new"
+
+
+def test_lru_cap_evicts_least_recently_used():
+    """Past max_sessions the least recently used session is dropped."""
+    store = SessionStore(max_sessions=3, ttl=60)
+    for sid in ("a", "b", "c"):
+        store.create(sid, "token")
+    store.get("a")  # "b" is now least recently used
+    store.create("d", "token")
+    assert store.get("b") is None
+    assert {sid for sid in "acd" if store.get(sid)} == {"a", "c", "d"}
+    assert store.evictions == 1
+
+
+def test_expiry_heap_stays_bounded_under_eviction():
+    """Evicted sessions' heap entries are compacted away."""
+    store = SessionStore(max_sessions=10, ttl=60)
+    for i in range(50000):
+        store.create(f"s{i}", "token")
+    assert len(store) == 10
+    assert len(store._expiry) <= 2 * 10 + 1024 + 1
+
+
+def test_session_info_is_compact():
+    """SessionInfo uses __slots__ rather than a per-instance dict."""
+    session = SessionInfo("id", "token", time.monotonic() + 5)
+    assert not hasattr(session, "__dict__")
+    assert session.expires_at_datetime().isoformat()
+
+
+def test_striped_store_spreads_sessions_and_caps_total():
+    """The striped backend behaves like one store while splitting locks."""
+    store = StripedSessionStore(stripes=8, max_sessions=800, ttl=60)
+    for i in range(2000):
+        store.create(f"s{i}", "token")
+    assert len(store) <= 800
+    assert store.evictions == 2000 - len(store)
+    assert store.get("s1999") is not None
+    assert len({id(store._stripe(f"s{i}")) for i in range(100)}) == 8
+    live = len(store)
+    assert store.sweep(time.monotonic() + 61) == live
+    assert len(store) == 0
+
+
+@pytest.mark.parametrize("factory", [lambda: SessionStore(ttl=60), lambda: StripedSessionStore(stripes=4, ttl=60)])
+def test_login_reuses_the_tokens_session(factory):
+    """Repeated logins with one token return the same session object; other tokens get their own."""
+    store = factory()
+    ids = new_ids()
+    first = store.login("token-a", ids)
+    assert store.login("token-a", ids) is first
+    assert store.login("token-b", ids) is not first
+    assert len(store) == 2 and store.reused == 1
+    assert store.get(first.session_id) is first
+
+
+def test_login_refreshes_and_replaces_gone_sessions():
+    """A session past half its TTL is extended under the same ID; a deleted or expired one is replaced."""
+    store = StripedSessionStore(stripes=4, ttl=60)
+    ids = new_ids()
+    first = store.login("token", ids)
+    first.expires_at = time.monotonic() + 10  # Pretend 50 of the 60 seconds have passed
+    refreshed = store.login("token", ids)
+    assert refreshed.session_id == first.session_id
+    assert refreshed.expires_at - time.monotonic() == pytest.approx(60, abs=1)
+    assert store.sweep(time.monotonic() + 30) == 0  # The stale heap entry does not expire the refreshed session
+
+    store.delete(refreshed.session_id)
+    replacement = store.login("token", ids)
+    assert replacement.session_id != first.session_id
+    assert store.sweep(time.monotonic() + 61) == 1
+    assert len(store._tokens) == 0
+    assert store.login("token", ids).session_id not in (first.session_id, replacement.session_id)
+
+
+def test_login_storm_stays_bounded():
+    """Thousands of logins over a few tokens hold one session per token."""
+    store = StripedSessionStore(ttl=60)
+    ids = new_ids()
+    for i in range(5000):
+        store.login(f"agent-{i % 10}", ids)
+    assert len(store) == 10 and len(store._tokens) == 10
+    assert store.reused == 4990
+
+
+def test_token_index_is_bounded_by_the_store():
+    """Distinct tokens past MOCK_SESSION_MAX cannot grow the index beyond the store's cap; deletes drop entries."""
+    store = StripedSessionStore(stripes=4, max_sessions=100, ttl=60)
+    ids = new_ids()
+    for i in range(20000):
+        store.login(f"token-{i}", ids)
+    assert len(store) <= 100 and len(store._tokens) <= 100
+    latest = store.login("token-19999", ids)
+    assert store.reused == 1
+    assert store.delete(latest.session_id)
+    assert store.login("token-19999", ids) is not latest
+
+
+def test_reused_count_is_exact_under_concurrent_logins():
+    """Every reuse is counted even when threads log in with the same token at once."""
+    import threading
+    store = StripedSessionStore(stripes=4, ttl=60)
+    ids = new_ids()
+    store.login("shared", ids)
+    threads = [threading.Thread(target=lambda: [store.login("shared", ids) for _ in range(2000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.reused == 8000 and len(store) == 1
+
+
+def test_sqlite_login_reuses_across_workers(tmp_path):
+    """The token digest column lets any worker find the session another issued."""
+    path = str(tmp_path / "sessions.db")
+    worker_a = SQLiteSessionStore(path, ttl=60)
+    worker_b = SQLiteSessionStore(path, ttl=60)
+    first = worker_a.login("token", new_ids("a"))
+    assert worker_b.login("token", new_ids("b")).session_id == first.session_id
+    assert worker_b.login("other", new_ids("b")).session_id == "b0"
+    assert len(worker_a) == 2
+
+    worker_a._connect().execute("UPDATE sessions SET expires_at = ?", (time.time() + 10,))
+    refreshed = worker_b.login("token", new_ids("b"))
+    assert refreshed.session_id == first.session_id
+    assert refreshed.expires_at - time.monotonic() == pytest.approx(60, abs=1)
+
+
+def test_sqlite_adds_token_digest_to_old_databases(tmp_path):
+    """A sessions table created before token reuse gains the column on open."""
+    import sqlite3
+    path = str(tmp_path / "sessions.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE sessions (session_id TEXT PRIMARY KEY, access_token TEXT NOT NULL,"
+                     " expires_at REAL NOT NULL, created_at REAL NOT NULL)")
+        conn.execute("INSERT INTO sessions VALUES ('old', 'token', ?, ?)", (time.time() + 60, time.time()))
+    store = SQLiteSessionStore(path, ttl=60)
+    assert store.get("old") is not None
+    assert store.login("token", new_ids()).session_id == "s0"  # Old rows have no digest to match
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    """A session created through one connection (worker) is visible to another."""
+    path = str(tmp_path / "sessions.db")
+    worker_a = SQLiteSessionStore(path, ttl=60)
+    worker_b = SQLiteSessionStore(path, ttl=60)
+    created = worker_a.create("shared", "token")
+    found = worker_b.get("shared")
+    assert found is not None
+    assert found.access_token == "token"
+    assert abs(found.expires_at - created.expires_at) < 1.0
+    assert worker_b.delete("shared")
+    assert worker_a.get("shared") is None
+
+
+def test_sqlite_store_expiry_and_sweep(tmp_path):
+    """Expired rows are hidden on lookup and removed by the sweeper."""
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=10)
+    for i in range(20):
+        store.create(f"s{i}", "token")
+    assert store.sweep() == 0
+    assert store.sweep(time.monotonic() + 11) == 20
+    assert len(store) == 0
+    expired = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=-1)
+    expired.create("old", "token")
+    assert expired.get("old") is None
+
+
+def test_sqlite_store_cap(tmp_path):
+    """The SQLite backend trims back to max_sessions, oldest logins first."""
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=100, ttl=60)
+    for i in range(512):
+        store.create(f"s{i:04d}", "token")
+    assert len(store) <= 100 + 256
+    assert store.get("s0511") is not None
+    assert store.get("s0000") is None
+
+
+def test_signed_sessions_need_no_shared_state():
+    """A token from one worker verifies in another that only shares the secret."""
+    issuer = SignedSessionStore("shared-secret", ttl=60)
+    other_worker = SignedSessionStore("shared-secret", ttl=60)
+    token = issuer.create("abc", "token").session_id
+    session = other_worker.get(token)
+    assert session is not None and session.session_id == token
+    assert 55 < session.expires_at - time.monotonic() <= 60
+    assert len(other_worker) == 0
+    assert SignedSessionStore("other-secret").get(token) is None
+
+
+def test_signed_sessions_reject_tampering_and_expiry():
+    """Any change to the ID, expiry or MAC fails; expired tokens are refused."""
+    store = SignedSessionStore("secret", ttl=60)
+    token = store.create("abc", "token").session_id
+    session_id, expires_at, mac = token.split(".")
+    assert store.get(f"abd.{expires_at}.{mac}") is None
+    assert store.get(f"{session_id}.{int(expires_at) + 3600}.{mac}") is None
+    assert store.get(f"{session_id}.{expires_at}.{'B' if mac[0] == 'A' else 'A'}{mac[1:]}") is None
+    for garbage in ("", "abc", "a.b.c", f"{session_id}.{expires_at}.", "abc.123.é" * 5):
+        assert store.get(garbage) is None
+
+    expired = SessionSigner(b"secret").sign("abc", int(time.time()) - 1)
+    assert store.get(expired) is None
+    assert store.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_signed_cookie_accepted_by_require_auth(monkeypatch):
+    """With the signed backend the cookie alone authenticates, across app instances."""
+    import main
+    monkeypatch.setattr(main, "session_store", SignedSessionStore("api-secret"))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer signed_token"})
+        cookie = response.json()["session_id"]
+        assert f"codesess={cookie};" in response.headers["set-cookie"]
+
+        # A fresh store with the same secret stands in for another worker
+        monkeypatch.setattr(main, "session_store", SignedSessionStore("api-secret"))
+        response = await client.get("/stream", params={"search_query": "q", "latency_profile": "instant"},
+                                    headers={"Cookie": f"codesess={cookie}"})
+        assert response.status_code == 200
+        response = await client.get("/ratings/stats", headers={"Cookie": f"codesess={cookie}x"})
+        assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_repeated_api_login_returns_the_same_session(monkeypatch):
+    """/api/login with the same bearer token hands back the live session and its remaining lifetime."""
+    import main
+    monkeypatch.setattr(main, "session_store", StripedSessionStore(ttl=60))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        first = await client.post("/api/login", headers={"Authorization": "Bearer repeat_token"})
+        again = await client.post("/api/login", headers={"Authorization": "Bearer repeat_token"})
+        other = await client.post("/api/login", headers={"Authorization": "Bearer other_token"})
+        assert again.json()["session_id"] == first.json()["session_id"] != other.json()["session_id"]
+        assert "Max-Age=60;" in again.headers["set-cookie"]
+
+        monkeypatch.setattr(main, "SESSION_REUSE", False)
+        fresh = await client.post("/api/login", headers={"Authorization": "Bearer repeat_token"})
+        assert fresh.json()["session_id"] != first.json()["session_id"]
+    assert len(main.session_store) == 3
+
+
+def test_make_session_store():
+    """Backends are selected by name."""
+    assert isinstance(make_session_store("memory"), StripedSessionStore)
+    assert isinstance(make_session_store("signed"), SignedSessionStore)
+    with pytest.raises(ValueError):
+        make_session_store("redis")
@@ -0,0 +1,133 @@
+"""
+Tests for /stream disconnect handling and cancellation
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_metrics import STREAMS
+from mock_streams import (CANCELLED, CANCELLED_FRAME, DISCONNECTED, SHUTDOWN, SHUTDOWN_FRAME,
+                          CancellableStreamingResponse, StreamRegistry)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_stops_generation_promptly():
+    """The generator is cancelled as soon as http.disconnect arrives, not at its next write."""
+    registry = StreamRegistry()
+    handle = registry.open("session")
+    produced, finished = [], []
+
+    async def body():
+        try:
+            for i in range(100):
+                produced.append(i)
+                yield b"data: %d\n\n" % i
+                await asyncio.sleep(0.05)
+        finally:
+            finished.append(True)
+
+    disconnect = asyncio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if len(produced) == 3:
+            disconnect.set()
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    await asyncio.wait_for(CancellableStreamingResponse(handle, body())(scope, receive, send), timeout=2)
+    assert finished == [True] and len(produced) <= 4
+    assert handle.reason == DISCONNECTED
+    assert len(registry) == 0
+
+
+@pytest.mark.asyncio
+async def test_server_cancellation_ends_the_stream_with_a_shutdown_event():
+    """When the server cancels the request (drain timeout) the client still gets a final event."""
+    registry = StreamRegistry()
+    handle = registry.open("session")
+
+    async def body():
+        while True:
+            yield b"data: tick\n\n"
+            await asyncio.sleep(0.01)
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    response = CancellableStreamingResponse(handle, body())
+    task = asyncio.create_task(response({"type": "http"}, receive, send))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await task
+    assert handle.reason == SHUTDOWN
+    assert sent[-1] == {"type": "http.response.body", "body": SHUTDOWN_FRAME, "more_body": False}
+    assert len(registry) == 0
+
+
+async def open_stream(query_string: bytes, cookie: str, messages: asyncio.Queue) -> asyncio.Task:
+    """Run a GET /stream as a raw ASGI call (ASGITransport buffers whole responses)."""
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+             "method": "GET", "scheme": "http", "path": "/stream", "raw_path": b"/stream", "root_path": "",
+             "query_string": query_string, "headers": [(b"host", b"test"), (b"cookie", cookie.encode())],
+             "client": ("127.0.0.1", 1), "server": ("test", 80)}
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    return asyncio.create_task(main.app(scope, receive, messages.put))
+
+
+@pytest.mark.asyncio
+async def test_cancel_endpoint_stops_a_stream_from_another_request():
+    """POST /stream/{id}/cancel ends the stream with a cancelled event and counts it."""
+    asyncio.get_running_loop().set_debug(True)  # Raises if the stream's task is cancelled off the event loop
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer cancel_token"})
+        cookie = f"codesess={response.json()['session_id']}"
+        client.headers["Cookie"] = cookie
+        response = await client.post("/api/login", headers={"Authorization": "Bearer other_token"})
+        other = {"Cookie": f"codesess={response.json()['session_id']}"}
+
+        before = STREAMS.value((CANCELLED,))
+        messages: asyncio.Queue = asyncio.Queue()
+        query = b"search_query=cancel+me&latency_profile=legacy&stream_id=job-1"
+        task = await open_stream(query, cookie, messages)
+        start = await messages.get()
+        assert (b"x-stream-id", b"job-1") in start["headers"]
+        assert (await messages.get())["body"].startswith(b'data: {"type": "metadata"')
+
+        duplicate = await client.get("/stream", params={"search_query": "q", "stream_id": "job-1"})
+        assert duplicate.status_code == 409
+        assert (await client.post("/stream/job-1/cancel", headers=other)).status_code == 404
+        cancelled = await client.post("/stream/job-1/cancel")
+        assert cancelled.json() == {"stream_id": "job-1", "cancelled": True}
+
+        await asyncio.wait_for(task, timeout=2)
+        bodies = []
+        while not messages.empty():
+            bodies.append(await messages.get())
+        assert bodies[-1] == {"type": "http.response.body", "body": CANCELLED_FRAME, "more_body": False}
+        assert len(bodies) < 10
+        assert STREAMS.value((CANCELLED,)) == before + 1
+        assert (await client.post("/stream/job-1/cancel")).status_code == 404
+    assert len(main.stream_registry) == 0
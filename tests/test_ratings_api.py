@@ -0,0 +1,110 @@
+"""
+Tests for the rating endpoints, run in-process against main.app
+"""
+import os
+import sys
+
+import httpx
+import pytest
+import pytest_asyncio
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+from mock_ratings import RatingStore
+
+
+@pytest.fixture
+def rating_store(tmp_path, monkeypatch):
+    """Point the app at a throwaway rating database."""
+    store = RatingStore(str(tmp_path / "ratings.db"))
+    monkeypatch.setattr(main, "rating_store", store)
+    return store
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Logged-in client for main.app."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer ratings_test_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_ratings_stats_endpoint(rating_store, client):
+    """Ratings posted to /add_rating show up in /ratings/stats."""
+    for chat_id, query, rating in [("c1", "streaming", 5), ("c2", "streaming", 4), ("c1", "auth", 2)]:
+        response = await client.post("/add_rating", json={"chat_id": chat_id, "search_query": query, "rating": rating})
+        assert response.status_code == 200
+
+    response = await client.get("/ratings/stats", params={"top_k": 1, "search_query": "auth"})
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["global"]["count"] == 3
+    assert stats["top"][0]["search_query"] == "streaming"
+    assert stats["bottom"][0]["search_query"] == "auth"
+    assert stats["query"]["mean"] == 2.0
+
+
+@pytest.mark.asyncio
+async def test_ratings_stats_requires_auth(rating_store):
+    """Stats are not public."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as anonymous:
+        response = await anonymous.get("/ratings/stats")
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_add_ratings_ndjson(rating_store, client):
+    """NDJSON batches report a status per line; bad lines don't sink the batch."""
+    body = "\n".join([
+        '{"chat_id": "c1", "search_query": "q", "rating": 4}',
+        '{"chat_id": "c2", "search_query": "q", "rating": 9}',
+        "",
+        "not json",
+        '{"chat_id": "c3", "search_query": "q", "rating": 2}',
+    ])
+    response = await client.post("/add_ratings", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["accepted"], result["rejected"]) == (2, 2)
+    assert [item["status"] for item in result["results"]] == ["accepted", "rejected", "rejected", "accepted"]
+    assert result["results"][1]["errors"][0]["field"] == "rating"
+    assert rating_store.get("c3", "q").rating == 2
+    assert rating_store.get("c2", "q") is None
+
+    # Without a Content-Type the format is sniffed from the body
+    response = await client.post("/add_ratings", content=body.encode())
+    assert response.json()["accepted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_add_ratings_json_array(rating_store, client):
+    """A JSON array body is accepted too."""
+    items = [{"chat_id": f"c{i}", "search_query": "q", "rating": 1 + i % 5} for i in range(50)]
+    response = await client.post("/add_ratings", json=items)
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 50
+    assert rating_store.stats.snapshot(top_k=1, min_count=1)["global"]["count"] == 50
+
+
+@pytest.mark.asyncio
+async def test_add_ratings_rejects_bad_batches(rating_store, client, monkeypatch):
+    """Malformed arrays are a 400, oversized batches a 413, and the endpoint needs auth."""
+    response = await client.post("/add_ratings", content=b"[{", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    rating = '{"chat_id": "c", "search_query": "q", "rating": 3}'
+    for body in (rating, rating.replace(", ", ",\n  "), ""):
+        response = await client.post("/add_ratings", content=body, headers={"Content-Type": "application/json"})
+        assert response.status_code == 400, body
+
+    monkeypatch.setattr(main, "BULK_LIMIT", 2)
+    response = await client.post("/add_ratings", json=[{"chat_id": "c", "search_query": "q", "rating": 3}] * 3)
+    assert response.status_code == 413
+    assert rating_store.received == 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as anonymous:
+        response = await anonymous.post("/add_ratings", json=[])
+    assert response.status_code == 401
@@ -0,0 +1,129 @@
+"""
+Tests for POST /stream/batch, run in-process against main.app
+"""
+import json
+import os
+import sys
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main
+import mock_latency
+from mock_admission import StreamAdmission
+from mock_latency import LatencyProfile
+from mock_ratelimit import make_rate_limiter
+
+
+@pytest_asyncio.fixture
+async def client():
+    """Logged-in client for main.app."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        response = await client.post("/api/login", headers={"Authorization": "Bearer batch_test_token"})
+        client.headers["Cookie"] = f"codesess={response.json()['session_id']}"
+        yield client
+
+
+def events(response: httpx.Response) -> list:
+    return [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+
+@pytest.mark.asyncio
+async def test_batch_interleaves_index_tagged_queries(client, monkeypatch):
+    """Every query streams its full answer, tagged with its index, concurrently with the others."""
+    monkeypatch.setitem(mock_latency.PROFILES, "fast", LatencyProfile("fast", time_to_first_token=0.05,
+                                                                      token_delay=0.003, citation_delay=0.003))
+    queries = [{"search_query": "first", "topNDocuments": 1}, {"search_query": "second", "topNDocuments": 3},
+               {"search_query": "third", "topNDocuments": 0}]
+    started = time.perf_counter()
+    response = await client.post("/stream/batch", json=queries, params={"latency_profile": "fast"})
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    received = events(response)
+    for index, query in enumerate(queries):
+        own = [event for event in received if event["index"] == index]
+        assert own[0]["type"] == "metadata" and own[0]["data"]["query"] == query["search_query"]
+        assert [event["type"] for event in own].count("citation") == query["topNDocuments"]
+        assert own[-1] == {"index": index, "type": "done"}
+    order = [event["index"] for event in received]
+    assert sum(a != b for a, b in zip(order, order[1:])) > len(queries)  # Interleaved, not back to back
+
+    # The batch takes about as long as its slowest query, not the sum of all three
+    single = []
+    for query in queries:
+        started = time.perf_counter()
+        await client.get("/stream", params={**query, "latency_profile": "fast"})
+        single.append(time.perf_counter() - started)
+    assert elapsed < 0.75 * sum(single)
+
+
+@pytest.mark.asyncio
+async def test_batch_is_validated_before_streaming(client, monkeypatch):
+    """Empty, invalid and oversized batches are refused before anything is streamed or registered."""
+    assert (await client.post("/stream/batch", json=[])).status_code == 422
+    bad_profile = await client.post("/stream/batch", json=[{"search_query": "q"}], params={"latency_profile": "nope"})
+    assert bad_profile.status_code == 400
+    monkeypatch.setattr(main, "STREAM_BATCH_LIMIT", 2)
+    too_many = await client.post("/stream/batch", json=[{"search_query": "q"}] * 3)
+    assert too_many.status_code == 413
+    assert len(main.stream_registry) == 0
+
+
+@pytest.mark.asyncio
+async def test_every_query_takes_a_stream_slot_and_a_rate_limit_token(client, monkeypatch):
+    """A batch cannot run more generations than MOCK_STREAM_LIMIT or MOCK_RATE_LIMIT_STREAM allow."""
+    admission = StreamAdmission(limit=2, queue_size=0)
+    monkeypatch.setattr(main, "stream_admission", admission)
+    queries = [{"search_query": f"q{i}", "topNDocuments": 1} for i in range(3)]
+    response = await client.post("/stream/batch", json=queries, params={"latency_profile": "instant"})
+    assert response.status_code == 200
+    endings = sorted((event["type"], event.get("status")) for event in events(response)
+                     if event["type"] in ("done", "error"))
+    assert endings == [("done", None), ("done", None), ("error", 429)]
+    assert admission.active == 0 and admission.admitted == 2
+
+    monkeypatch.setattr(main, "stream_admission", StreamAdmission(limit=0))
+    monkeypatch.setattr(main, "rate_limiter", make_rate_limiter(stream="0.01/4"))
+    first = await client.post("/stream/batch", json=queries, params={"latency_profile": "instant"})
+    assert first.status_code == 200
+    second = await client.post("/stream/batch", json=queries, params={"latency_profile": "instant"})
+    assert second.status_code == 429
+    assert second.headers["RateLimit-Remaining"] == "1" and "Retry-After" in second.headers
+
+
+@pytest.mark.asyncio
+async def test_batch_larger_than_the_rate_limit_burst_is_refused(client, monkeypatch):
+    """A batch cannot stream more queries than MOCK_RATE_LIMIT_STREAM's bucket holds."""
+    monkeypatch.setattr(main, "rate_limiter", make_rate_limiter(stream="0.001/2"))
+    queries = [{"search_query": f"q{i}", "topNDocuments": 0} for i in range(16)]
+    response = await client.post("/stream/batch", json=queries, params={"latency_profile": "instant"})
+    assert response.status_code == 413
+    assert len(main.stream_registry) == 0
+    # Nothing was charged: the session's burst is still there for a batch that fits it
+    fits = await client.post("/stream/batch", json=queries[:2], params={"latency_profile": "instant"})
+    assert fits.status_code == 200
+    assert [event["type"] for event in events(fits)].count("done") == 2
+
+
+@pytest.mark.asyncio
+async def test_refused_batches_are_not_charged(client, monkeypatch):
+    """Invalid batches and duplicate stream ids leave the session's MOCK_RATE_LIMIT_STREAM budget alone."""
+    monkeypatch.setattr(main, "rate_limiter", make_rate_limiter(stream="0.001/2"))
+    queries = [{"search_query": "a"}, {"search_query": "b"}]
+    bad_profile = await client.post("/stream/batch", json=queries, params={"latency_profile": "nope"})
+    assert bad_profile.status_code == 400
+    busy = main.stream_registry.open("someone", "busy")
+    try:
+        duplicate = await client.post("/stream/batch", json=queries, params={"stream_id": "busy"})
+        assert duplicate.status_code == 409
+    finally:
+        busy.close()
+    accepted = await client.post("/stream/batch", json=queries, params={"latency_profile": "instant"})
+    assert accepted.status_code == 200
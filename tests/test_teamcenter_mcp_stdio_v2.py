@@ -26,6 +26,25 @@ def test_server_imports_cleanly():
     # WSL2 with Windows mount points is slower, so allow 20 seconds
     assert import_time < 20.0, f"Import took {import_time}s, too slow for VS Code"
 
+def test_import_defers_setup():
+    """Importing the server configures no logging and creates no auth session or HTTP client"""
+    code = ("import logging, sys, auth_mcp_stdio_v2 as m; "
+            "print(len(logging.getLogger().handlers), m._auth_session is None)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, timeout=60)
+    assert result.stdout.split() == ["0", "True"], result.stderr
+
+def test_main_logs_host_without_creating_the_auth_session():
+    """main() reports the API host from the environment; the AuthSession waits for the first tool call"""
+    code = ("import auth_mcp_stdio_v2 as m; m.mcp.run = lambda **kwargs: None; m.main(); "
+            "print(m._auth_session is None)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, TEAMCENTER_API_HOST="http://example.test:9000")
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True,
+                            timeout=60)
+    assert result.stdout.split() == ["True"], result.stderr
+    assert "API Host: http://example.test:9000" in result.stderr
+
 def test_teamcenter_server_identity():
     """Test that server identifies itself correctly"""
     import auth_mcp_stdio_v2